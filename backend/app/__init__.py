@@ -26,12 +26,25 @@ def create_app(config_name):
     migrate.init_app(app, db)
     jwt.init_app(app)
     ma.init_app(app)
-    socketio.init_app(app, cors_allowed_origins="*")
+    from app.services.message_queue import socketio_queue_options
+    socketio.init_app(app, cors_allowed_origins="*", **socketio_queue_options(app.config))
+    from app.services.socket_metrics import socket_metrics
+    socket_metrics.init_app(app)
+    from app.services import attendance_rollup
+    attendance_rollup.init_app(app)
+    from app.services import activity_log
+    activity_log.init_app(app)
+    from app.services import location_pipeline
+    location_pipeline.init_app(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
 
     # Initialize Redis
     global redis_client
     redis_client = redis.from_url(app.config['REDIS_URL'])
+    from app.services.response_cache import response_cache
+    response_cache.init_app(app, redis_client)
+    from app.services.alerts import alert_engine
+    alert_engine.init_app(app)
 
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -45,6 +58,7 @@ def create_app(config_name):
     from app.routes.fees import fees_bp
     from app.routes.dashboard import dashboard_bp
     from app.routes.tracking import tracking_bp
+    from app.routes.reports import reports_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(buses_bp, url_prefix='/api/buses')
@@ -57,6 +71,7 @@ def create_app(config_name):
     app.register_blueprint(fees_bp, url_prefix='/api/fees')
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
     app.register_blueprint(tracking_bp, url_prefix='/api/tracking')
+    app.register_blueprint(reports_bp, url_prefix='/api/reports')
 
     # Error handlers
     @app.errorhandler(404)
@@ -4,13 +4,21 @@ from .driver import Driver
 from .route import Route, RouteStop
 from .student import Student
 from .trip import Trip
+from .trip_stop_visit import TripStopVisit
+from .trip_event import TripEvent
 from .maintenance import Maintenance
 from .attendance import Attendance
+from .attendance_daily import AttendanceDaily
 from .fee import Fee
+from .fee_monthly import FeeMonthly
 from .notification import Notification
 from .document import Document
+from .heatmap_tile import HeatmapTile
+from .alert import Alert
+from .activity_event import ActivityEvent
 
 __all__ = [
     'User', 'Bus', 'Driver', 'Route', 'RouteStop', 'Student', 
-    'Trip', 'Maintenance', 'Attendance', 'Fee', 'Notification', 'Document'
+    'Trip', 'TripStopVisit', 'TripEvent', 'Maintenance', 'Attendance', 'AttendanceDaily', 'Fee', 'FeeMonthly', 'Notification', 'Document',
+    'HeatmapTile', 'Alert', 'ActivityEvent'
 ]
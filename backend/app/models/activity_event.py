@@ -0,0 +1,31 @@
+from datetime import datetime
+from app import db
+
+class ActivityEvent(db.Model):
+    """One entry of the append-only activity feed, written as changes are flushed."""
+    __tablename__ = 'activity_events'
+
+    id = db.Column(db.Integer, primary_key=True)  # increases with time; used as the feed cursor
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    event_type = db.Column(db.String(20), nullable=False)  # trip, attendance or payment
+    entity_id = db.Column(db.Integer)  # id of the trip, attendance record or fee
+    description = db.Column(db.String(255), nullable=False)
+    details = db.Column(db.JSON)
+
+    __table_args__ = (
+        db.Index('idx_activity_events_type_id', 'event_type', 'id'),
+        db.Index('idx_activity_events_occurred_at', 'occurred_at'),
+    )
+
+    def to_dict(self):
+        """Convert activity event to dictionary."""
+        return {
+            'id': self.id,
+            'type': self.event_type,
+            'description': self.description,
+            'timestamp': self.occurred_at.isoformat() if self.occurred_at else None,
+            'details': self.details or {}
+        }
+
+    def __repr__(self):
+        return f'<ActivityEvent {self.id} {self.event_type}>'
@@ -0,0 +1,42 @@
+from datetime import datetime
+from app import db
+
+PRIORITY_RANKS = {'low': 1, 'medium': 2, 'high': 3}
+
+class Alert(db.Model):
+    """An alert raised by the alert engine, kept until its condition clears."""
+    __tablename__ = 'alerts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    alert_key = db.Column(db.String(120), nullable=False, unique=True)  # de-duplicates re-raised alerts
+    source = db.Column(db.String(50), nullable=False)  # evaluator that raised the alert
+
+    alert_type = db.Column(db.String(30), nullable=False)
+    priority = db.Column(db.String(10), nullable=False, default='medium')
+    priority_rank = db.Column(db.SmallInteger, nullable=False, default=2)
+    title = db.Column(db.String(200), nullable=False)
+    message = db.Column(db.String(500))
+    occurred_at = db.Column(db.DateTime, nullable=False)
+
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_alerts_active_rank', 'active', 'priority_rank', 'occurred_at'),
+    )
+
+    def to_dict(self):
+        """Convert alert to dictionary."""
+        return {
+            'id': self.id,
+            'type': self.alert_type,
+            'priority': self.priority,
+            'title': self.title,
+            'message': self.message,
+            'timestamp': self.occurred_at.isoformat() if self.occurred_at else None
+        }
+
+    def __repr__(self):
+        return f'<Alert {self.alert_key} {self.priority}>'
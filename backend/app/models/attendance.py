@@ -54,7 +54,8 @@ class Attendance(db.Model):
     
     # Composite unique constraint to prevent duplicate entries
     __table_args__ = (db.UniqueConstraint('student_id', 'trip_id', 'trip_type', 
-                                         name='unique_student_trip_attendance'),)
+                                         name='unique_student_trip_attendance'),
+                      db.Index('idx_attendance_date_status', 'date', 'status'))
     
     @property
     def duration_minutes(self):
@@ -0,0 +1,40 @@
+from app import db
+
+# class_name of students without a class; NULL would never match the unique key
+UNASSIGNED_CLASS = 'Unassigned'
+
+class AttendanceDaily(db.Model):
+    """Attendance records counted by day, route, bus, class and status.
+
+    Kept in step with attendance by app.services.attendance_rollup, so
+    attendance statistics read a handful of rows per day.
+    """
+    __tablename__ = 'attendance_daily'
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    route_id = db.Column(db.Integer, db.ForeignKey('routes.id'), nullable=False)
+    bus_id = db.Column(db.Integer, db.ForeignKey('buses.id'), nullable=False)
+    class_name = db.Column(db.String(20), nullable=False, default=UNASSIGNED_CLASS)
+    status = db.Column(db.String(20), nullable=False)
+
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('date', 'route_id', 'bus_id', 'class_name', 'status',
+                            name='unique_attendance_daily_group'),
+    )
+
+    def to_dict(self):
+        """Convert attendance rollup row to dictionary."""
+        return {
+            'date': self.date.isoformat() if self.date else None,
+            'route_id': self.route_id,
+            'bus_id': self.bus_id,
+            'class_name': self.class_name,
+            'status': self.status,
+            'record_count': self.record_count
+        }
+
+    def __repr__(self):
+        return f'<AttendanceDaily {self.date} route {self.route_id} bus {self.bus_id} {self.status}: {self.record_count}>'
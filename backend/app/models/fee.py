@@ -54,7 +54,8 @@ class Fee(db.Model):
     
     # Composite unique constraint
     __table_args__ = (db.UniqueConstraint('student_id', 'academic_year', 'month', 'year', 
-                                         name='unique_student_fee_period'),)
+                                         name='unique_student_fee_period'),
+                      db.Index('idx_fee_period_status', 'year', 'month', 'status'))
     
     @property
     def balance_amount(self):
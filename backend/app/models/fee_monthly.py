@@ -0,0 +1,52 @@
+from app import db
+
+# route_id of fees of students off route; NULL would never match the unique key
+NO_ROUTE = 0
+
+class FeeMonthly(db.Model):
+    """Fee amounts billed and collected per billing month, academic year and route.
+
+    Kept in step with fees by app.services.fee_ledger, so collection
+    trends and summaries read one row per month and route.
+    """
+    __tablename__ = 'fee_monthly'
+
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)  # 1-12
+    academic_year = db.Column(db.String(10), nullable=False)
+    route_id = db.Column(db.Integer, nullable=False, default=NO_ROUTE)  # routes.id, or NO_ROUTE off route
+
+    fee_count = db.Column(db.Integer, nullable=False, default=0)
+    billed_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)  # final amount plus late fees
+    collected_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    outstanding_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    overdue_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)  # outstanding on overdue fees
+
+    __table_args__ = (
+        db.UniqueConstraint('year', 'month', 'academic_year', 'route_id', name='unique_fee_monthly_group'),
+    )
+
+    @property
+    def collection_rate(self):
+        """Get percentage of the billed amount collected."""
+        billed = float(self.billed_amount or 0)
+        return round(float(self.collected_amount or 0) / billed * 100, 2) if billed > 0 else 0
+
+    def to_dict(self):
+        """Convert fee rollup row to dictionary."""
+        return {
+            'year': self.year,
+            'month': self.month,
+            'academic_year': self.academic_year,
+            'route_id': self.route_id or None,
+            'fee_count': self.fee_count,
+            'billed_amount': float(self.billed_amount or 0),
+            'collected_amount': float(self.collected_amount or 0),
+            'outstanding_amount': float(self.outstanding_amount or 0),
+            'overdue_amount': float(self.overdue_amount or 0),
+            'collection_rate': self.collection_rate
+        }
+
+    def __repr__(self):
+        return f'<FeeMonthly {self.year}-{self.month:02d} route {self.route_id}: {self.collected_amount}/{self.billed_amount}>'
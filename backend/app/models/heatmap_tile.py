@@ -0,0 +1,33 @@
+from app import db
+
+class HeatmapTile(db.Model):
+    """Daily count of GPS fixes falling inside one z/x/y map tile."""
+    __tablename__ = 'heatmap_tiles'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    zoom = db.Column(db.SmallInteger, nullable=False)
+    tile_x = db.Column(db.Integer, nullable=False)
+    tile_y = db.Column(db.Integer, nullable=False)
+
+    fix_count = db.Column(db.Integer, nullable=False, default=0)
+    idle_count = db.Column(db.Integer, nullable=False, default=0)  # fixes below idle speed
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'zoom', 'tile_x', 'tile_y', name='unique_heatmap_tile_day'),
+        db.Index('ix_heatmap_tiles_zoom_day', 'zoom', 'day'),
+    )
+
+    def to_dict(self):
+        """Convert heatmap tile to dictionary."""
+        return {
+            'day': self.day.isoformat() if self.day else None,
+            'zoom': self.zoom,
+            'x': self.tile_x,
+            'y': self.tile_y,
+            'fix_count': self.fix_count,
+            'idle_count': self.idle_count
+        }
+
+    def __repr__(self):
+        return f'<HeatmapTile {self.day} {self.zoom}/{self.tile_x}/{self.tile_y}: {self.fix_count}>'
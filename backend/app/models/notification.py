@@ -47,6 +47,7 @@ class Notification(db.Model):
     # Template and personalization
     template_name = db.Column(db.String(50))
     template_data = db.Column(db.JSON)  # Data for template variables
+    dedupe_key = db.Column(db.String(100), unique=True, index=True)  # For automated notifications
     
     # Read status (for in-app notifications)
     is_read = db.Column(db.Boolean, default=False)
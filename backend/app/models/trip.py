@@ -26,6 +26,7 @@ class Trip(db.Model):
     start_odometer = db.Column(db.Float)
     end_odometer = db.Column(db.Float)
     fuel_consumed = db.Column(db.Float)
+    total_distance = db.Column(db.Float)  # in kilometers, accumulated from live GPS
     
     # Status
     status = db.Column(db.Enum('Scheduled', 'In Progress', 'Completed', 'Cancelled', 'Delayed', 
@@ -51,7 +52,7 @@ class Trip(db.Model):
         """Calculate distance covered in this trip."""
         if self.start_odometer and self.end_odometer:
             return self.end_odometer - self.start_odometer
-        return 0
+        return self.total_distance or 0
     
     @property
     def duration_minutes(self):
@@ -93,6 +94,7 @@ class Trip(db.Model):
             'actual_end_time': self.actual_end_time.isoformat() if self.actual_end_time else None,
             'start_odometer': self.start_odometer,
             'end_odometer': self.end_odometer,
+            'total_distance': self.total_distance,
             'distance_covered': self.distance_covered,
             'fuel_consumed': self.fuel_consumed,
             'fuel_efficiency': self.fuel_efficiency,
@@ -0,0 +1,54 @@
+from datetime import datetime
+from app import db
+
+class TripEvent(db.Model):
+    """Event detected on the live location stream of a bus."""
+    __tablename__ = 'trip_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trips.id'), nullable=True, index=True)
+    bus_id = db.Column(db.Integer, db.ForeignKey('buses.id'), nullable=False, index=True)
+    route_id = db.Column(db.Integer, db.ForeignKey('routes.id'), nullable=True)
+
+    event_type = db.Column(db.Enum('Route Deviation', 'Idle', 'Overspeed', 'Harsh Acceleration',
+                                   'Harsh Braking', name='trip_event_types'), nullable=False)
+
+    # Extent of the event
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    ended_at = db.Column(db.DateTime)
+    duration_seconds = db.Column(db.Integer)
+    distance_meters = db.Column(db.Float)
+    peak_value = db.Column(db.Float)  # max cross-track meters, max km/h or km/h per second
+
+    # Where the event started
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def is_open(self):
+        """Check if the event is still in progress."""
+        return self.ended_at is None
+
+    def to_dict(self):
+        """Convert trip event to dictionary."""
+        return {
+            'id': self.id,
+            'trip_id': self.trip_id,
+            'bus_id': self.bus_id,
+            'route_id': self.route_id,
+            'event_type': self.event_type,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'duration_seconds': self.duration_seconds,
+            'distance_meters': self.distance_meters,
+            'peak_value': self.peak_value,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'is_open': self.is_open,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<TripEvent {self.event_type} bus {self.bus_id} at {self.started_at}>'
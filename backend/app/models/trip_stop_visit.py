@@ -0,0 +1,34 @@
+from app import db
+
+class TripStopVisit(db.Model):
+    """Detected arrival and departure of a trip at a route stop."""
+    __tablename__ = 'trip_stop_visits'
+
+    id = db.Column(db.Integer, primary_key=True)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trips.id'), nullable=False, index=True)
+    route_stop_id = db.Column(db.Integer, db.ForeignKey('route_stops.id'), nullable=False, index=True)
+    bus_id = db.Column(db.Integer, db.ForeignKey('buses.id'), nullable=False)
+    stop_order = db.Column(db.SmallInteger, nullable=False)
+
+    # Detected timings
+    arrival_time = db.Column(db.DateTime, nullable=False)
+    departure_time = db.Column(db.DateTime)
+    dwell_seconds = db.Column(db.Integer)
+
+    __table_args__ = (db.UniqueConstraint('trip_id', 'route_stop_id', name='unique_trip_stop_visit'),)
+
+    def to_dict(self):
+        """Convert stop visit to dictionary."""
+        return {
+            'id': self.id,
+            'trip_id': self.trip_id,
+            'route_stop_id': self.route_stop_id,
+            'bus_id': self.bus_id,
+            'stop_order': self.stop_order,
+            'arrival_time': self.arrival_time.isoformat() if self.arrival_time else None,
+            'departure_time': self.departure_time.isoformat() if self.departure_time else None,
+            'dwell_seconds': self.dwell_seconds
+        }
+
+    def __repr__(self):
+        return f'<TripStopVisit trip {self.trip_id} stop {self.route_stop_id}>'
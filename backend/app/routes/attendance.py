@@ -1,10 +1,13 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, date
+from sqlalchemy import func
 from app import db
 from app.models.attendance import Attendance
 from app.models.student import Student
 from app.models.trip import Trip
+from app.services.attendance_rollup import PRESENT_STATUSES, attendance_rate
+from app.services.response_cache import response_cache
 from app.utils.helpers import success_response, error_response
 
 attendance_bp = Blueprint('attendance', __name__)
@@ -28,7 +31,7 @@ def get_attendance_records():
         if date_str:
             try:
                 filter_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                query = query.filter(db.func.date(Attendance.timestamp) == filter_date)
+                query = query.filter(Attendance.date == filter_date)
             except ValueError:
                 return error_response("Invalid date format. Use YYYY-MM-DD")
         
@@ -69,6 +72,7 @@ def get_attendance_record(attendance_id):
 
 @attendance_bp.route('/', methods=['POST'])
 @jwt_required()
+@response_cache.invalidates('attendance')
 def create_attendance_record():
     """Create a new attendance record"""
     try:
@@ -111,6 +115,7 @@ def create_attendance_record():
 
 @attendance_bp.route('/<int:attendance_id>', methods=['PUT'])
 @jwt_required()
+@response_cache.invalidates('attendance')
 def update_attendance_record(attendance_id):
     """Update an attendance record"""
     try:
@@ -144,6 +149,7 @@ def update_attendance_record(attendance_id):
 
 @attendance_bp.route('/<int:attendance_id>', methods=['DELETE'])
 @jwt_required()
+@response_cache.invalidates('attendance')
 def delete_attendance_record(attendance_id):
     """Delete an attendance record"""
     try:
@@ -166,31 +172,33 @@ def get_student_attendance_summary(student_id):
         start_date_str = request.args.get('start_date')
         end_date_str = request.args.get('end_date')
         
-        query = Attendance.query.filter_by(student_id=student_id)
+        query = db.session.query(Attendance.status, func.count(Attendance.id)).filter(
+            Attendance.student_id == student_id
+        )
         
         if start_date_str:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(Attendance.timestamp) >= start_date)
+            query = query.filter(Attendance.date >= start_date)
         
         if end_date_str:
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(Attendance.timestamp) <= end_date)
+            query = query.filter(Attendance.date <= end_date)
         
-        records = query.all()
+        counts = dict(query.group_by(Attendance.status).all())
         
         # Calculate summary
-        total_records = len(records)
-        present_count = len([r for r in records if r.status in ['present', 'boarded']])
-        absent_count = len([r for r in records if r.status == 'absent'])
+        total_records = sum(counts.values())
+        present_count = sum(counts.get(status, 0) for status in PRESENT_STATUSES)
+        absent_count = counts.get('Absent', 0)
         
-        attendance_percentage = (present_count / total_records * 100) if total_records > 0 else 0
+        attendance_percentage = attendance_rate(present_count, total_records)
         
         summary_data = {
             'student_id': student_id,
             'total_records': total_records,
             'present_count': present_count,
             'absent_count': absent_count,
-            'attendance_percentage': round(attendance_percentage, 2)
+            'attendance_percentage': attendance_percentage
         }
         
         return success_response(summary_data)
@@ -202,19 +210,21 @@ def get_student_attendance_summary(student_id):
 def get_trip_attendance_summary(trip_id):
     """Get attendance summary for a specific trip"""
     try:
-        records = Attendance.query.filter_by(trip_id=trip_id).all()
+        counts = dict(db.session.query(Attendance.status, func.count(Attendance.id)).filter(
+            Attendance.trip_id == trip_id
+        ).group_by(Attendance.status).all())
         
         # Calculate summary
-        total_students = len(records)
-        present_count = len([r for r in records if r.status in ['present', 'boarded']])
-        absent_count = len([r for r in records if r.status == 'absent'])
+        total_students = sum(counts.values())
+        present_count = sum(counts.get(status, 0) for status in PRESENT_STATUSES)
+        absent_count = counts.get('Absent', 0)
         
         summary_data = {
             'trip_id': trip_id,
             'total_students': total_students,
             'present_count': present_count,
             'absent_count': absent_count,
-            'attendance_rate': round((present_count / total_students * 100), 2) if total_students > 0 else 0
+            'attendance_rate': attendance_rate(present_count, total_students)
         }
         
         return success_response(summary_data)
@@ -6,6 +6,7 @@ from app.models.bus import Bus
 from app.models.driver import Driver
 from app.models.route import Route
 from app.models.document import Document
+from app.services.response_cache import response_cache
 from app.utils.decorators import admin_required, staff_required
 from app.utils.helpers import (
     success_response, error_response, paginate_query,
@@ -82,6 +83,7 @@ def get_bus(bus_id):
 
 @buses_bp.route('', methods=['POST'])
 @admin_required
+@response_cache.invalidates('buses')
 def create_bus(current_user):
     """Create a new bus with AI-powered auto-form fill."""
     try:
@@ -181,6 +183,7 @@ def create_bus(current_user):
 
 @buses_bp.route('/<int:bus_id>', methods=['PUT'])
 @admin_required
+@response_cache.invalidates('buses')
 def update_bus(current_user, bus_id):
     """Update a bus."""
     try:
@@ -272,6 +275,9 @@ def update_bus(current_user, bus_id):
             bus.route_id = route_id
         
         db.session.commit()
+
+        from app.services.location_pipeline import invalidate_bus_context
+        invalidate_bus_context(bus.id)
         
         return success_response('Bus updated successfully', {
             'bus': bus.to_dict()
@@ -283,6 +289,7 @@ def update_bus(current_user, bus_id):
 
 @buses_bp.route('/<int:bus_id>', methods=['DELETE'])
 @admin_required
+@response_cache.invalidates('buses')
 def delete_bus(current_user, bus_id):
     """Delete (deactivate) a bus."""
     try:
@@ -346,16 +353,24 @@ def update_bus_location(current_user, bus_id):
         bus.current_location_lng = longitude
         bus.last_location_update = datetime.utcnow()
 
+        from app.services.location_pipeline import LocationFix, process_fix
+        fix = LocationFix(
+            bus_id=bus_id,
+            latitude=latitude,
+            longitude=longitude,
+            timestamp=bus.last_location_update,
+            speed=data.get('speed'),
+            heading=data.get('heading'),
+            accuracy=data.get('accuracy')
+        )
+        context = process_fix(fix)
+
         db.session.commit()
 
-        # Emit real-time location update via WebSocket
-        from app import socketio
-        socketio.emit('location_update', {
-            'bus_id': bus_id,
-            'latitude': latitude,
-            'longitude': longitude,
-            'timestamp': bus.last_location_update.isoformat()
-        }, room=f'bus_{bus_id}')
+        # Real-time location update goes out with the next broadcast tick
+        from app.services.broadcaster import location_broadcaster
+        from app.services.subscriptions import fix_rooms
+        location_broadcaster.publish(fix, fix_rooms(context))
 
         return success_response('Location updated successfully')
 
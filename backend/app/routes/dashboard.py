@@ -1,4 +1,5 @@
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, date, timedelta
 from sqlalchemy import func
@@ -9,169 +10,98 @@ from app.models.driver import Driver
 from app.models.trip import Trip
 from app.models.attendance import Attendance
 from app.models.fee import Fee
-from app.models.maintenance import Maintenance
+from app.services.activity_log import ACTIVITY_TYPES, recent_activity
+from app.services.alerts import active_alerts, alert_engine
+from app.services.response_cache import response_cache
+from app.services.trends import months_before, trend_series
+from app.services.dashboard_stats import compute_dashboard_stats, dashboard_feed
 from app.utils.helpers import success_response, error_response
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/stats', methods=['GET'])
 @jwt_required()
+@response_cache.cached(('students', 'buses', 'drivers', 'trips', 'attendance', 'fees', 'maintenance'))
 def get_dashboard_stats():
     """Get overall dashboard statistics"""
     try:
-        # Basic counts
-        total_students = Student.query.count()
-        total_buses = Bus.query.count()
-        total_drivers = Driver.query.count()
-        
-        # Active trips today
-        today = date.today()
-        active_trips = Trip.query.filter(
-            func.date(Trip.start_time) == today,
-            Trip.status.in_(['scheduled', 'in_progress'])
-        ).count()
-        
-        # Attendance rate for today
-        today_attendance = Attendance.query.filter(
-            func.date(Attendance.timestamp) == today
-        ).all()
-        
-        if today_attendance:
-            present_count = len([a for a in today_attendance if a.status in ['present', 'boarded']])
-            attendance_rate = round((present_count / len(today_attendance)) * 100, 2)
-        else:
-            attendance_rate = 0
-        
-        # Fee collection stats
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        
-        monthly_fees = Fee.query.filter_by(month=current_month, year=current_year).all()
-        total_monthly_amount = sum([float(f.amount) for f in monthly_fees if f.amount])
-        collected_amount = sum([float(f.amount) for f in monthly_fees if f.status == 'paid' and f.amount])
-        collection_rate = round((collected_amount / total_monthly_amount) * 100, 2) if total_monthly_amount > 0 else 0
-        
-        # Maintenance alerts
-        upcoming_maintenance = Maintenance.query.filter(
-            Maintenance.next_maintenance_date <= (datetime.now() + timedelta(days=7)),
-            Maintenance.status.in_(['scheduled', 'pending'])
-        ).count()
-        
-        stats_data = {
-            'total_students': total_students,
-            'total_buses': total_buses,
-            'total_drivers': total_drivers,
-            'active_trips_today': active_trips,
-            'attendance_rate_today': attendance_rate,
-            'monthly_collection_rate': collection_rate,
-            'upcoming_maintenance_alerts': upcoming_maintenance,
-            'total_monthly_fees': total_monthly_amount,
-            'collected_fees': collected_amount
-        }
-        
-        return success_response(stats_data)
+        return success_response(compute_dashboard_stats())
     except Exception as e:
         return error_response(f"Error fetching dashboard stats: {str(e)}")
 
+@dashboard_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_dashboard_stats():
+    """Stream dashboard statistics as server-sent events.
+    
+    Sends a snapshot on connect, then only the fields that changed. The
+    statistics are computed once per tick for every open stream.
+    """
+    keepalive = current_app.config.get('DASHBOARD_STREAM_KEEPALIVE_SECONDS', 15)
+    subscriber = dashboard_feed.subscribe()
+    
+    def generate():
+        try:
+            yield _sse('snapshot', dashboard_feed.snapshot())
+            while True:
+                changes = subscriber.wait(keepalive)
+                if changes:
+                    yield _sse('stats', changes)
+                else:
+                    yield ': keepalive\n\n'
+        finally:
+            dashboard_feed.unsubscribe(subscriber)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def _sse(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @dashboard_bp.route('/recent-activities', methods=['GET'])
 @jwt_required()
+@response_cache.cached(('trips', 'attendance', 'fees'))
 def get_recent_activities():
-    """Get recent activities for dashboard"""
+    """Get recent activities for dashboard, newest first.
+    
+    Pass the returned next_cursor as cursor to get the following page;
+    type takes a comma-separated list of trip, attendance and payment.
+    """
     try:
-        limit = request.args.get('limit', 10, type=int)
-        
-        # Recent trips
-        recent_trips = Trip.query.order_by(Trip.created_at.desc()).limit(limit).all()
+        limit = min(request.args.get('limit', 10, type=int), 100)
+        cursor = request.args.get('cursor', type=int)
+        types = [t for t in request.args.get('type', '').split(',') if t]
         
-        # Recent attendance records
-        recent_attendance = Attendance.query.order_by(Attendance.created_at.desc()).limit(limit).all()
+        invalid = [t for t in types if t not in ACTIVITY_TYPES]
+        if invalid:
+            return error_response(f"Invalid activity type. Must be one of: {', '.join(ACTIVITY_TYPES)}")
         
-        # Recent fee payments
-        recent_payments = Fee.query.filter_by(status='paid').order_by(Fee.paid_date.desc()).limit(limit).all()
+        activities = recent_activity(limit, before=cursor, types=types)
+        next_cursor = activities[-1].id if len(activities) == limit else None
         
-        activities = []
-        
-        # Add trip activities
-        for trip in recent_trips:
-            activities.append({
-                'type': 'trip',
-                'description': f"Trip {trip.id} - {trip.status}",
-                'timestamp': trip.created_at.isoformat() if trip.created_at else None,
-                'details': {
-                    'trip_id': trip.id,
-                    'bus_id': trip.bus_id,
-                    'status': trip.status
-                }
-            })
-        
-        # Add attendance activities
-        for attendance in recent_attendance:
-            activities.append({
-                'type': 'attendance',
-                'description': f"Student {attendance.student_id} - {attendance.status}",
-                'timestamp': attendance.created_at.isoformat() if attendance.created_at else None,
-                'details': {
-                    'student_id': attendance.student_id,
-                    'status': attendance.status,
-                    'trip_id': attendance.trip_id
-                }
-            })
-        
-        # Add payment activities
-        for payment in recent_payments:
-            activities.append({
-                'type': 'payment',
-                'description': f"Fee payment - Student {payment.student_id}",
-                'timestamp': payment.paid_date.isoformat() if payment.paid_date else None,
-                'details': {
-                    'student_id': payment.student_id,
-                    'amount': float(payment.amount) if payment.amount else None,
-                    'month': payment.month,
-                    'year': payment.year
-                }
-            })
-        
-        # Sort activities by timestamp (most recent first)
-        activities.sort(key=lambda x: x['timestamp'] or '', reverse=True)
-        
-        return success_response(activities[:limit])
+        return success_response([activity.to_dict() for activity in activities], {'next_cursor': next_cursor})
     except Exception as e:
         return error_response(f"Error fetching recent activities: {str(e)}")
 
 @dashboard_bp.route('/attendance-trends', methods=['GET'])
 @jwt_required()
+@response_cache.cached(('attendance',))
 def get_attendance_trends():
     """Get attendance trends for the last 7 days"""
     try:
         end_date = date.today()
         start_date = end_date - timedelta(days=6)  # Last 7 days including today
+        points = trend_series('attendance', start_date, end_date)['series'][0]['points']
         
-        trends = []
-        current_date = start_date
-        
-        while current_date <= end_date:
-            # Get attendance for this date
-            day_attendance = Attendance.query.filter(
-                func.date(Attendance.timestamp) == current_date
-            ).all()
-            
-            if day_attendance:
-                present_count = len([a for a in day_attendance if a.status in ['present', 'boarded']])
-                total_count = len(day_attendance)
-                attendance_rate = round((present_count / total_count) * 100, 2)
-            else:
-                present_count = 0
-                total_count = 0
-                attendance_rate = 0
-            
-            trends.append({
-                'date': current_date.isoformat(),
-                'present_count': present_count,
-                'total_count': total_count,
-                'attendance_rate': attendance_rate
-            })
-            
-            current_date += timedelta(days=1)
+        trends = [{
+            'date': point['period'],
+            'present_count': point['present_count'],
+            'total_count': point['total_count'],
+            'attendance_rate': point['attendance_rate']
+        } for point in points]
         
         return success_response(trends)
     except Exception as e:
@@ -179,107 +109,75 @@ def get_attendance_trends():
 
 @dashboard_bp.route('/fee-collection-trends', methods=['GET'])
 @jwt_required()
+@response_cache.cached(('fees',))
 def get_fee_collection_trends():
     """Get fee collection trends for the last 6 months"""
     try:
-        trends = []
-        current_date = datetime.now()
+        end_date = date.today()
+        start_date = months_before(end_date, 5)  # Last 6 months including this one
+        points = trend_series('fees', start_date, end_date, 'month')['series'][0]['points']
         
-        for i in range(6):
-            # Calculate month and year
-            month = current_date.month
-            year = current_date.year
-            
-            # Get fees for this month
-            monthly_fees = Fee.query.filter_by(month=month, year=year).all()
-            
-            total_amount = sum([float(f.amount) for f in monthly_fees if f.amount])
-            collected_amount = sum([float(f.amount) for f in monthly_fees if f.status == 'paid' and f.amount])
-            collection_rate = round((collected_amount / total_amount) * 100, 2) if total_amount > 0 else 0
-            
+        trends = []
+        for point in points:
+            period = date.fromisoformat(point['period'])
             trends.append({
-                'month': month,
-                'year': year,
-                'month_name': current_date.strftime('%B'),
-                'total_amount': total_amount,
-                'collected_amount': collected_amount,
-                'collection_rate': collection_rate
+                'month': period.month,
+                'year': period.year,
+                'month_name': period.strftime('%B'),
+                'total_amount': point['billed_amount'],
+                'collected_amount': point['collected_amount'],
+                'outstanding_amount': point['outstanding_amount'],
+                'overdue_amount': point['overdue_amount'],
+                'collection_rate': point['collection_rate']
             })
-            
-            # Move to previous month
-            if current_date.month == 1:
-                current_date = current_date.replace(year=current_date.year - 1, month=12)
-            else:
-                current_date = current_date.replace(month=current_date.month - 1)
-        
-        # Reverse to show oldest to newest
-        trends.reverse()
         
         return success_response(trends)
     except Exception as e:
         return error_response(f"Error fetching fee collection trends: {str(e)}")
 
-@dashboard_bp.route('/alerts', methods=['GET'])
+@dashboard_bp.route('/trends', methods=['GET'])
 @jwt_required()
-def get_alerts():
-    """Get system alerts and notifications"""
+@response_cache.cached(('attendance', 'fees'))
+def get_trends():
+    """Get a metric over a date range, bucketed by day, week or month"""
     try:
-        alerts = []
-        
-        # Maintenance alerts
-        upcoming_maintenance = Maintenance.query.filter(
-            Maintenance.next_maintenance_date <= (datetime.now() + timedelta(days=7)),
-            Maintenance.status.in_(['scheduled', 'pending'])
-        ).all()
-        
-        for maintenance in upcoming_maintenance:
-            days_until = (maintenance.next_maintenance_date - datetime.now()).days
-            alerts.append({
-                'type': 'maintenance',
-                'priority': 'high' if days_until <= 2 else 'medium',
-                'title': f"Maintenance Due - Bus {maintenance.bus_id}",
-                'message': f"Maintenance scheduled in {days_until} days",
-                'timestamp': maintenance.next_maintenance_date.isoformat()
-            })
-        
-        # Overdue fees
-        today = date.today()
-        overdue_fees = Fee.query.filter(
-            Fee.due_date < today,
-            Fee.status.in_(['pending', 'overdue'])
-        ).count()
-        
-        if overdue_fees > 0:
-            alerts.append({
-                'type': 'fees',
-                'priority': 'medium',
-                'title': 'Overdue Fees',
-                'message': f"{overdue_fees} fee(s) are overdue",
-                'timestamp': today.isoformat()
-            })
-        
-        # Low attendance alert (if today's attendance is below 80%)
-        today_attendance = Attendance.query.filter(
-            func.date(Attendance.timestamp) == today
-        ).all()
-        
-        if today_attendance:
-            present_count = len([a for a in today_attendance if a.status in ['present', 'boarded']])
-            attendance_rate = (present_count / len(today_attendance)) * 100
-            
-            if attendance_rate < 80:
-                alerts.append({
-                    'type': 'attendance',
-                    'priority': 'medium',
-                    'title': 'Low Attendance',
-                    'message': f"Today's attendance is {attendance_rate:.1f}%",
-                    'timestamp': today.isoformat()
-                })
+        metric = request.args.get('metric', 'attendance')
+        granularity = request.args.get('granularity', 'month' if metric == 'fees' else 'day')
+        try:
+            end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else date.today()
+            start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else end_date - timedelta(days=29)
+        except ValueError:
+            return error_response("Invalid date format. Use YYYY-MM-DD")
+        
+        if (end_date - start_date).days > current_app.config.get('TRENDS_MAX_RANGE_DAYS', 1096):
+            return error_response("Date range is too long")
+        
+        group_by = [name for name in request.args.get('group_by', '').split(',') if name]
+        filters = {
+            'route': request.args.get('route_id', type=int),
+            'bus': request.args.get('bus_id', type=int),
+            'class': request.args.get('class_name'),
+            'academic_year': request.args.get('academic_year')
+        }
+        filters = {name: value for name, value in filters.items() if value}
         
-        # Sort alerts by priority and timestamp
-        priority_order = {'high': 3, 'medium': 2, 'low': 1}
-        alerts.sort(key=lambda x: (priority_order.get(x['priority'], 0), x['timestamp']), reverse=True)
+        try:
+            trends = trend_series(metric, start_date, end_date, granularity, group_by, filters)
+        except ValueError as e:
+            return error_response(str(e))
         
-        return success_response(alerts)
+        return success_response(trends)
+    except Exception as e:
+        return error_response(f"Error fetching trends: {str(e)}")
+
+@dashboard_bp.route('/alerts', methods=['GET'])
+@jwt_required()
+def get_alerts():
+    """Get active system alerts, highest priority first"""
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        alert_engine.ensure_evaluated()
+        alert_engine.ensure_running()
+        return success_response([alert.to_dict() for alert in active_alerts(limit)])
     except Exception as e:
         return error_response(f"Error fetching alerts: {str(e)}")
@@ -5,6 +5,7 @@ from app import db
 from app.models.user import User
 from app.models.driver import Driver
 from app.models.bus import Bus
+from app.services.response_cache import response_cache
 from app.utils.decorators import admin_required, staff_required
 from app.utils.helpers import (
     success_response, error_response, paginate_query,
@@ -87,6 +88,7 @@ def get_driver(driver_id):
 
 @drivers_bp.route('', methods=['POST'])
 @admin_required
+@response_cache.invalidates('drivers')
 def create_driver(current_user):
     """Create a new driver with AI-powered auto-matching."""
     try:
@@ -200,6 +202,7 @@ def create_driver(current_user):
 
 @drivers_bp.route('/<int:driver_id>', methods=['PUT'])
 @admin_required
+@response_cache.invalidates('drivers')
 def update_driver(current_user, driver_id):
     """Update a driver."""
     try:
@@ -273,6 +276,7 @@ def update_driver(current_user, driver_id):
 
 @drivers_bp.route('/<int:driver_id>/status', methods=['PATCH'])
 @admin_required
+@response_cache.invalidates('drivers')
 def update_driver_status(current_user, driver_id):
     """Update driver status."""
     try:
@@ -362,6 +366,7 @@ def get_driver_performance(driver_id):
 
 @drivers_bp.route('/<int:driver_id>', methods=['DELETE'])
 @admin_required
+@response_cache.invalidates('drivers')
 def delete_driver(current_user, driver_id):
     """Delete (deactivate) a driver."""
     try:
@@ -4,10 +4,14 @@ from datetime import datetime, date
 from app import db
 from app.models.fee import Fee
 from app.models.student import Student
-from app.utils.helpers import success_response, error_response
+from app.services.fee_ledger import ledger_dict, ledger_entry, ledger_route, ledger_totals, record_fee_change
+from app.services.response_cache import response_cache
+from app.utils.helpers import success_response, error_response, get_academic_year
 
 fees_bp = Blueprint('fees', __name__)
 
+FEE_STATUSES = ('Pending', 'Paid', 'Partial', 'Overdue', 'Waived')
+
 @fees_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_fees():
@@ -75,6 +79,7 @@ def get_fee(fee_id):
 
 @fees_bp.route('/', methods=['POST'])
 @jwt_required()
+@response_cache.invalidates('fees')
 def create_fee():
     """Create a new fee record"""
     try:
@@ -104,24 +109,32 @@ def create_fee():
             return error_response("Fee record already exists for this student, month, and year")
         
         # Create new fee record
+        base_amount = data['amount']
+        discount_amount = data.get('discount_amount', 0)
         fee = Fee(
             student_id=data['student_id'],
-            amount=data['amount'],
+            academic_year=data.get('academic_year') or get_academic_year(),
             month=data['month'],
             year=data['year'],
-            status=data.get('status', 'pending'),
-            due_date=datetime.fromisoformat(data['due_date']).date() if data.get('due_date') else None,
+            base_amount=base_amount,
+            discount_amount=discount_amount,
+            final_amount=base_amount - discount_amount,
+            paid_amount=0,
+            late_fee_amount=0,
+            status=data.get('status', 'Pending'),
+            due_date=datetime.fromisoformat(data['due_date']).date() if data.get('due_date') else date(data['year'], data['month'], 1),
             payment_method=data.get('payment_method'),
             transaction_id=data.get('transaction_id')
         )
         
         db.session.add(fee)
+        record_fee_change(None, ledger_entry(fee))
         db.session.commit()
         
         return success_response({
             'id': fee.id,
             'student_id': fee.student_id,
-            'amount': float(fee.amount),
+            'amount': float(fee.final_amount),
             'month': fee.month,
             'year': fee.year,
             'message': 'Fee record created successfully'
@@ -133,29 +146,32 @@ def create_fee():
 
 @fees_bp.route('/<int:fee_id>', methods=['PUT'])
 @jwt_required()
+@response_cache.invalidates('fees')
 def update_fee(fee_id):
     """Update a fee record"""
     try:
         fee = Fee.query.get_or_404(fee_id)
         data = request.get_json()
+        before = ledger_entry(fee)
         
         # Update fields if provided
         if 'amount' in data:
-            fee.amount = data['amount']
+            fee.base_amount = data['amount']
+            fee.final_amount = data['amount'] - float(fee.discount_amount or 0)
         if 'status' in data:
-            valid_statuses = ['pending', 'paid', 'overdue', 'cancelled']
-            if data['status'] not in valid_statuses:
-                return error_response(f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
+            if data['status'] not in FEE_STATUSES:
+                return error_response(f"Invalid status. Must be one of: {', '.join(FEE_STATUSES)}")
             fee.status = data['status']
-        if 'due_date' in data:
-            fee.due_date = datetime.fromisoformat(data['due_date']).date() if data['due_date'] else None
+        if 'due_date' in data and data['due_date']:
+            fee.due_date = datetime.fromisoformat(data['due_date']).date()
         if 'paid_date' in data:
-            fee.paid_date = datetime.fromisoformat(data['paid_date']).date() if data['paid_date'] else None
+            fee.payment_date = datetime.fromisoformat(data['paid_date']).date() if data['paid_date'] else None
         if 'payment_method' in data:
             fee.payment_method = data['payment_method']
         if 'transaction_id' in data:
             fee.transaction_id = data['transaction_id']
         
+        record_fee_change(before, ledger_entry(fee))
         db.session.commit()
         
         return success_response({
@@ -170,10 +186,12 @@ def update_fee(fee_id):
 
 @fees_bp.route('/<int:fee_id>', methods=['DELETE'])
 @jwt_required()
+@response_cache.invalidates('fees')
 def delete_fee(fee_id):
     """Delete a fee record"""
     try:
         fee = Fee.query.get_or_404(fee_id)
+        record_fee_change(ledger_entry(fee), None)
         db.session.delete(fee)
         db.session.commit()
         
@@ -185,23 +203,36 @@ def delete_fee(fee_id):
 
 @fees_bp.route('/<int:fee_id>/pay', methods=['POST'])
 @jwt_required()
+@response_cache.invalidates('fees')
 def pay_fee(fee_id):
     """Mark a fee as paid"""
     try:
         fee = Fee.query.get_or_404(fee_id)
-        data = request.get_json()
+        data = request.get_json() or {}
+        before = ledger_entry(fee)
         
-        fee.status = 'paid'
-        fee.paid_date = date.today()
-        fee.payment_method = data.get('payment_method', 'cash')
+        # Pays the remaining balance unless a part payment is given
+        balance = fee.balance_amount
+        try:
+            amount = float(data.get('amount', balance))
+        except (TypeError, ValueError):
+            return error_response("Amount must be a number")
+        if not (0 < amount <= balance):
+            return error_response(f"Amount must be more than 0 and at most the balance of {balance:.2f}")
+        fee.paid_amount = float(fee.paid_amount or 0) + amount
+        fee.payment_date = date.today()
+        fee.payment_method = data.get('payment_method', 'Cash')
         fee.transaction_id = data.get('transaction_id')
+        fee.update_status()
         
+        record_fee_change(before, ledger_entry(fee))
         db.session.commit()
         
         return success_response({
             'id': fee.id,
             'status': fee.status,
-            'paid_date': fee.paid_date.isoformat(),
+            'paid_amount': float(fee.paid_amount),
+            'paid_date': fee.payment_date.isoformat(),
             'message': 'Fee payment recorded successfully'
         })
         
@@ -266,3 +297,26 @@ def get_overdue_fees():
         return success_response(fees_data)
     except Exception as e:
         return error_response(f"Error fetching overdue fees: {str(e)}")
+
+@fees_bp.route('/summary', methods=['GET'])
+@jwt_required()
+@response_cache.cached(('fees', 'routes'))
+def get_fee_summary():
+    """Get billed, collected and outstanding fee totals, with a per-route breakdown"""
+    try:
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        academic_year = request.args.get('academic_year')
+        
+        periods = [(year, month)] if year and month else None
+        filters = {'periods': periods, 'academic_year': academic_year}
+        
+        totals = ledger_totals(**filters)[0]
+        by_route = ledger_totals((ledger_route,), **filters)
+        
+        summary_data = ledger_dict(totals)
+        summary_data['routes'] = [dict(ledger_dict(row), route_id=row.route_id) for row in by_route]
+        
+        return success_response(summary_data)
+    except Exception as e:
+        return error_response(f"Error fetching fee summary: {str(e)}")
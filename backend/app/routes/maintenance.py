@@ -4,6 +4,7 @@ from datetime import datetime
 from app import db
 from app.models.maintenance import Maintenance
 from app.models.bus import Bus
+from app.services.response_cache import response_cache
 from app.utils.helpers import success_response, error_response
 
 maintenance_bp = Blueprint('maintenance', __name__)
@@ -54,6 +55,7 @@ def get_maintenance_record(maintenance_id):
 
 @maintenance_bp.route('/', methods=['POST'])
 @jwt_required()
+@response_cache.invalidates('maintenance')
 def create_maintenance_record():
     """Create a new maintenance record"""
     try:
@@ -92,6 +94,7 @@ def create_maintenance_record():
 
 @maintenance_bp.route('/<int:maintenance_id>', methods=['PUT'])
 @jwt_required()
+@response_cache.invalidates('maintenance')
 def update_maintenance_record(maintenance_id):
     """Update a maintenance record"""
     try:
@@ -126,6 +129,7 @@ def update_maintenance_record(maintenance_id):
 
 @maintenance_bp.route('/<int:maintenance_id>', methods=['DELETE'])
 @jwt_required()
+@response_cache.invalidates('maintenance')
 def delete_maintenance_record(maintenance_id):
     """Delete a maintenance record"""
     try:
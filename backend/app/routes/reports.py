@@ -0,0 +1,92 @@
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required
+from datetime import datetime, date
+from app.services.reports import (
+    analytics_report, attendance_report, bus_report, financial_report, performance_report, safety_report
+)
+from app.services.response_cache import response_cache
+from app.utils.helpers import success_response, error_response
+
+reports_bp = Blueprint('reports', __name__)
+
+def _report_period():
+    """Read start_date and end_date, defaulting to the academic year (from April) to date.
+
+    Raises ValueError for a bad date or an inverted range.
+    """
+    end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else date.today()
+    if request.args.get('start_date'):
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+    else:
+        start_date = date(end_date.year if end_date.month >= 4 else end_date.year - 1, 4, 1)
+    if start_date > end_date:
+        raise ValueError("start_date must not be after end_date")
+    return start_date, end_date
+
+def _report(name, build):
+    """Build a report for the requested period and wrap it in the usual response."""
+    try:
+        start_date, end_date = _report_period()
+    except ValueError as e:
+        return error_response(f"Invalid period: {str(e)}. Use YYYY-MM-DD")
+    return success_response(f"{name} report", build(start_date, end_date))
+
+@reports_bp.route('/attendance', methods=['GET'])
+@jwt_required()
+@response_cache.cached(('attendance', 'students', 'buses', 'routes'))
+def get_attendance_reports():
+    """Get attendance overall and per month, class, route and bus"""
+    try:
+        return _report('Attendance', attendance_report)
+    except Exception as e:
+        return error_response(f"Error building attendance report: {str(e)}")
+
+@reports_bp.route('/buses', methods=['GET'])
+@jwt_required()
+@response_cache.cached(('trips', 'buses', 'maintenance'))
+def get_bus_reports():
+    """Get per-bus utilization and a maintenance summary"""
+    try:
+        return _report('Bus', bus_report)
+    except Exception as e:
+        return error_response(f"Error building bus report: {str(e)}")
+
+@reports_bp.route('/financial', methods=['GET'])
+@jwt_required()
+@response_cache.cached(('fees', 'maintenance', 'drivers', 'routes'))
+def get_financial_reports():
+    """Get fee collection, expenses and monthly profit"""
+    try:
+        return _report('Financial', financial_report)
+    except Exception as e:
+        return error_response(f"Error building financial report: {str(e)}")
+
+@reports_bp.route('/performance', methods=['GET'])
+@jwt_required()
+@response_cache.cached(('trips', 'drivers', 'buses', 'maintenance', 'routes'))
+def get_performance_reports():
+    """Get driver, route and bus performance"""
+    try:
+        return _report('Performance', performance_report)
+    except Exception as e:
+        return error_response(f"Error building performance report: {str(e)}")
+
+@reports_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+@response_cache.cached(('attendance', 'trips', 'maintenance'))
+def get_analytics_reports():
+    """Get month-on-month trends and upcoming maintenance"""
+    try:
+        return _report('Analytics', analytics_report)
+    except Exception as e:
+        return error_response(f"Error building analytics report: {str(e)}")
+
+@reports_bp.route('/safety', methods=['GET'])
+@jwt_required()
+@response_cache.cached(('trips', 'maintenance', 'drivers', 'buses'))
+def get_safety_reports():
+    """Get incidents, driving events and document compliance"""
+    try:
+        return _report('Safety', safety_report)
+    except Exception as e:
+        return error_response(f"Error building safety report: {str(e)}")
@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required
 from datetime import datetime, time
 from app import db
 from app.models.route import Route, RouteStop
+from app.services.response_cache import response_cache
+from app.services.route_geometry import invalidate_route_geometry
 from app.utils.decorators import admin_required, staff_required
 from app.utils.helpers import (
     success_response, error_response, paginate_query,
@@ -80,6 +82,7 @@ def get_route(route_id):
 
 @routes_bp.route('', methods=['POST'])
 @admin_required
+@response_cache.invalidates('routes')
 def create_route(current_user):
     """Create a new route with AI-powered optimization."""
     try:
@@ -172,6 +175,7 @@ def create_route(current_user):
 
 @routes_bp.route('/<int:route_id>', methods=['PUT'])
 @admin_required
+@response_cache.invalidates('routes')
 def update_route(current_user, route_id):
     """Update a route."""
     try:
@@ -246,6 +250,7 @@ def get_route_stops(route_id):
 
 @routes_bp.route('/<int:route_id>/stops', methods=['POST'])
 @admin_required
+@response_cache.invalidates('routes')
 def add_route_stop(current_user, route_id):
     """Add a new stop to a route."""
     try:
@@ -299,6 +304,7 @@ def add_route_stop(current_user, route_id):
         
         db.session.add(stop)
         db.session.commit()
+        invalidate_route_geometry(route_id)
         
         return success_response('Route stop added successfully', {
             'stop': stop.to_dict()
@@ -310,6 +316,7 @@ def add_route_stop(current_user, route_id):
 
 @routes_bp.route('/<int:route_id>/stops/<int:stop_id>', methods=['PUT'])
 @admin_required
+@response_cache.invalidates('routes')
 def update_route_stop(current_user, route_id, stop_id):
     """Update a route stop."""
     try:
@@ -354,6 +361,7 @@ def update_route_stop(current_user, route_id, stop_id):
             stop.departure_time = parse_time_string(data['departure_time'])
         
         db.session.commit()
+        invalidate_route_geometry(route_id)
         
         return success_response('Route stop updated successfully', {
             'stop': stop.to_dict()
@@ -365,6 +373,7 @@ def update_route_stop(current_user, route_id, stop_id):
 
 @routes_bp.route('/<int:route_id>/stops/<int:stop_id>', methods=['DELETE'])
 @admin_required
+@response_cache.invalidates('routes')
 def delete_route_stop(current_user, route_id, stop_id):
     """Delete a route stop."""
     try:
@@ -385,6 +394,7 @@ def delete_route_stop(current_user, route_id, stop_id):
         
         db.session.delete(stop)
         db.session.commit()
+        invalidate_route_geometry(route_id)
         
         return success_response('Route stop deleted successfully')
         
@@ -394,34 +404,89 @@ def delete_route_stop(current_user, route_id, stop_id):
 
 @routes_bp.route('/<int:route_id>/optimize', methods=['POST'])
 @admin_required
+@response_cache.invalidates('routes')
 def optimize_route(current_user, route_id):
-    """AI-powered route optimization."""
+    """Suggest route timings from historical segment travel times."""
     try:
         route = Route.query.filter_by(id=route_id, is_active=True).first()
         
         if not route:
             return error_response('Route not found', 404)
         
-        # This is a placeholder for AI-powered route optimization
-        # In a real implementation, this would:
-        # 1. Use Google Maps API to get real-time traffic data
-        # 2. Apply optimization algorithms to minimize travel time
-        # 3. Consider factors like traffic patterns, road conditions, etc.
-        # 4. Update route timings and suggest alternative paths
+        from app.services.segment_profiles import (
+            PROFILE_VERSION, segment_key, merge_histograms, histogram_percentiles
+        )
+        
+        # Hours of the pattern are in school time, like route.start_time
+        profile = route.traffic_pattern
+        if not profile or profile.get('version') != PROFILE_VERSION or not profile.get('segments'):
+            return error_response('No travel-time history available for this route yet')
+        
+        stops = RouteStop.query.filter_by(route_id=route_id).order_by(RouteStop.stop_order).all()
+        segments = list(zip(stops, stops[1:]))
+        dwell_minutes = sum(stop.stop_duration or 0 for stop in stops[1:-1])
+        
+        # Median travel time of each segment per departure hour, pooled over weekdays
+        hourly_segment_seconds = {}
+        for hour in range(24):
+            per_segment = []
+            for from_stop, to_stop in segments:
+                buckets = profile['segments'].get(segment_key(from_stop.id, to_stop.id), {})
+                histograms = [entry['h'] for key, entry in buckets.items() if key.endswith(f':{hour}')]
+                median = histogram_percentiles(merge_histograms(histograms), [50]) if histograms else []
+                if not median:
+                    break
+                per_segment.append(median[0])
+            else:
+                hourly_segment_seconds[hour] = per_segment
+        
+        if not hourly_segment_seconds:
+            return error_response('Not enough travel-time history to cover every segment of this route')
+        
+        hourly_duration = {
+            hour: round(sum(seconds) / 60 + dwell_minutes)
+            for hour, seconds in hourly_segment_seconds.items()
+        }
+        
+        scheduled_hour = route.start_time.hour if route.start_time else min(hourly_duration)
+        candidate_hours = [h for h in hourly_duration if abs(h - scheduled_hour) <= 2]
+        best_hour = min(candidate_hours or hourly_duration, key=hourly_duration.get)
+        current_duration = hourly_duration.get(scheduled_hour, route.estimated_duration)
+        optimized_duration = hourly_duration[best_hour]
+        time_saved = max((current_duration or 0) - optimized_duration, 0)
+        
+        fastest = min(hourly_duration.values())
+        peak_hours = sorted(h for h, d in hourly_duration.items() if d > fastest * 1.15)
+        low_traffic = sorted(h for h, d in hourly_duration.items() if d <= fastest * 1.05)
+        
+        suggestions = []
+        if best_hour != scheduled_hour and time_saved > 0:
+            suggestions.append(
+                f'Departing at {best_hour:02d}:00 instead of {scheduled_hour:02d}:00 '
+                f'is expected to save {time_saved} minutes'
+            )
+        if scheduled_hour in hourly_segment_seconds:
+            seconds = hourly_segment_seconds[scheduled_hour]
+            slowest = max(range(len(seconds)), key=seconds.__getitem__)
+            from_stop, to_stop = segments[slowest]
+            suggestions.append(
+                f'{from_stop.stop_name} → {to_stop.stop_name} is the slowest segment at '
+                f'{scheduled_hour:02d}:00 (median {round(seconds[slowest] / 60, 1)} minutes)'
+            )
         
         optimization_result = {
             'original_duration': route.estimated_duration,
-            'optimized_duration': route.estimated_duration - 5,  # Placeholder improvement
-            'time_saved': 5,
-            'suggestions': [
-                'Consider avoiding Main Street during peak hours',
-                'Alternative route via Highway 101 could save 3 minutes',
-                'Adjust departure time by 10 minutes to avoid traffic'
-            ],
+            'current_duration': current_duration,
+            'optimized_duration': optimized_duration,
+            'time_saved': time_saved,
+            'recommended_start_hour': best_hour,
+            'hourly_duration': {f'{h:02d}:00': d for h, d in sorted(hourly_duration.items())},
+            'suggestions': suggestions,
             'traffic_pattern': {
-                'peak_hours': ['07:00-09:00', '17:00-19:00'],
-                'low_traffic': ['10:00-16:00', '20:00-06:00']
-            }
+                'peak_hours': [f'{h:02d}:00-{h + 1:02d}:00' for h in peak_hours],
+                'low_traffic': [f'{h:02d}:00-{h + 1:02d}:00' for h in low_traffic]
+            },
+            'history_through': profile.get('refreshed_through')
         }
         
         # Store optimization data for future reference
@@ -436,6 +501,7 @@ def optimize_route(current_user, route_id):
 
 @routes_bp.route('/<int:route_id>', methods=['DELETE'])
 @admin_required
+@response_cache.invalidates('routes')
 def delete_route(current_user, route_id):
     """Delete (deactivate) a route."""
     try:
@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.student import Student
 from app.models.user import User
+from app.services.proximity_triggers import proximity_trigger_engine
+from app.services.response_cache import response_cache
 from app.utils.helpers import success_response, error_response
 
 students_bp = Blueprint('students', __name__)
@@ -51,6 +53,7 @@ def get_student(student_id):
 
 @students_bp.route('/', methods=['POST'])
 @jwt_required()
+@response_cache.invalidates('students')
 def create_student():
     """Create a new student"""
     try:
@@ -79,6 +82,7 @@ def create_student():
         
         db.session.add(student)
         db.session.commit()
+        proximity_trigger_engine.invalidate_route(student.route_id)
         
         return success_response({
             'id': student.id,
@@ -93,6 +97,7 @@ def create_student():
 
 @students_bp.route('/<int:student_id>', methods=['PUT'])
 @jwt_required()
+@response_cache.invalidates('students')
 def update_student(student_id):
     """Update a student"""
     try:
@@ -108,10 +113,13 @@ def update_student(student_id):
             student.phone = data['phone']
         if 'address' in data:
             student.address = data['address']
+        previous_route_id = student.route_id
         if 'route_id' in data:
             student.route_id = data['route_id']
         
         db.session.commit()
+        proximity_trigger_engine.invalidate_route(previous_route_id)
+        proximity_trigger_engine.invalidate_route(student.route_id)
         
         return success_response({
             'id': student.id,
@@ -126,12 +134,14 @@ def update_student(student_id):
 
 @students_bp.route('/<int:student_id>', methods=['DELETE'])
 @jwt_required()
+@response_cache.invalidates('students')
 def delete_student(student_id):
     """Delete a student"""
     try:
         student = Student.query.get_or_404(student_id)
         db.session.delete(student)
         db.session.commit()
+        proximity_trigger_engine.invalidate_route(student.route_id)
         
         return success_response({'message': 'Student deleted successfully'})
         
@@ -1,12 +1,30 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
+from datetime import datetime, date
 from sqlalchemy import func
 from app import db, socketio
 from app.models.bus_location import BusLocation
 from app.models.bus import Bus
 from app.models.trip import Trip
+from app.models.user import User
+from app.models.trip_event import TripEvent
+from app.models.heatmap_tile import HeatmapTile
+from app.services.location_pipeline import LocationFix, process_fix
+from app.services.eta_engine import eta_engine
+from app.services.bus_snapshots import bus_snapshots, create_share_token, verify_share_token
+from app.services.broadcaster import (
+    location_broadcaster, client_room, binary_room, set_client_format, forget_client,
+    TRACKING_FORMATS, BINARY_ROOM_SUFFIX
+)
+from app.services.frame_codec import FRAME_VERSION
+from app.services.subscriptions import (
+    subscriptions, can_subscribe, fix_rooms, room_name, socket_user_id,
+    ROOM_TYPES, FLEET_ROOM, FLEET_ROLES
+)
+from app.services.driving_events import driving_event_summary
+from app.services.socket_metrics import socket_metrics
 from app.utils.helpers import success_response, error_response
+from app.utils.decorators import admin_required
 
 tracking_bp = Blueprint('tracking', __name__)
 
@@ -126,17 +144,22 @@ def update_bus_location():
         )
         
         db.session.add(location)
+        
+        fix = LocationFix(
+            bus_id=location.bus_id,
+            latitude=location.latitude,
+            longitude=location.longitude,
+            timestamp=location.timestamp,
+            speed=location.speed,
+            heading=location.heading,
+            accuracy=location.accuracy
+        )
+        context = process_fix(fix)
+        
         db.session.commit()
         
-        # Emit real-time update via WebSocket
-        socketio.emit('location_update', {
-            'bus_id': location.bus_id,
-            'latitude': float(location.latitude),
-            'longitude': float(location.longitude),
-            'speed': float(location.speed) if location.speed else None,
-            'heading': float(location.heading) if location.heading else None,
-            'timestamp': location.timestamp.isoformat()
-        }, room='tracking')
+        # Real-time update goes out with the next broadcast tick
+        location_broadcaster.publish(fix, fix_rooms(context))
         
         return success_response({
             'id': location.id,
@@ -148,6 +171,201 @@ def update_bus_location():
         db.session.rollback()
         return error_response(f"Error updating bus location: {str(e)}")
 
+@tracking_bp.route('/share-token', methods=['POST'])
+@jwt_required()
+def create_bus_share_token():
+    """Issue a signed link to the live snapshot of one bus"""
+    try:
+        data = request.get_json() or {}
+        bus_id = data.get('bus_id')
+        if not bus_id:
+            return error_response("Missing required field: bus_id")
+        
+        user = User.query.get(get_jwt_identity())
+        if not can_subscribe(user, 'bus', int(bus_id)):
+            return error_response("Not allowed to share this bus", 403)
+        
+        token = create_share_token(int(bus_id))
+        return success_response({
+            'token': token,
+            'url': f'/api/tracking/live/{token}',
+            'expires_in': current_app.config.get('SHARE_TOKEN_MAX_AGE_SECONDS', 86400)
+        }, 201)
+    except Exception as e:
+        return error_response(f"Error creating share token: {str(e)}")
+
+@tracking_bp.route('/live/<token>', methods=['GET'])
+def get_shared_bus_snapshot(token):
+    """Serve the cached live snapshot of a bus to a share-link holder
+    
+    Authorized by the signed token alone: no user lookup and no query on
+    the hot path, and clients revalidate cheaply with If-None-Match.
+    """
+    bus_id = verify_share_token(token)
+    if bus_id is None:
+        return error_response("Invalid or expired share link", 401)
+    
+    snapshot = bus_snapshots.get(bus_id)
+    if snapshot is None:
+        return error_response("No live location for this bus", 404)
+    
+    etag, body = snapshot
+    max_age = current_app.config.get('BUS_SNAPSHOT_MAX_AGE_SECONDS', 2)
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': f'public, max-age={max_age}'}
+    if request.headers.get('If-None-Match') == f'"{etag}"':
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='application/json', headers=headers)
+
+@tracking_bp.route('/eta', methods=['GET'])
+@jwt_required()
+def get_stop_etas():
+    """Get cached arrival predictions for a stop or for a bus"""
+    try:
+        stop_id = request.args.get('stop_id', type=int)
+        bus_id = request.args.get('bus_id', type=int)
+        
+        if stop_id:
+            predictions = eta_engine.for_stop(stop_id)
+        elif bus_id:
+            predictions = eta_engine.for_bus(bus_id)
+        else:
+            return error_response("Missing required parameter: stop_id or bus_id")
+        
+        return success_response([{
+            'stop_id': prediction['stop_id'],
+            'stop_order': prediction['stop_order'],
+            'bus_id': prediction['bus_id'],
+            'trip_id': prediction['trip_id'],
+            'route_id': prediction['route_id'],
+            'eta': prediction['eta'].isoformat(),
+            'eta_seconds': prediction['seconds']
+        } for prediction in predictions])
+    except Exception as e:
+        return error_response(f"Error fetching ETA predictions: {str(e)}")
+
+@tracking_bp.route('/events', methods=['GET'])
+@jwt_required()
+def get_trip_events():
+    """Get events detected on the live location stream"""
+    try:
+        bus_id = request.args.get('bus_id', type=int)
+        trip_id = request.args.get('trip_id', type=int)
+        event_type = request.args.get('event_type')
+        open_only = request.args.get('open_only', 'false').lower() == 'true'
+        limit = request.args.get('limit', 100, type=int)
+        
+        query = TripEvent.query
+        
+        if bus_id:
+            query = query.filter_by(bus_id=bus_id)
+        if trip_id:
+            query = query.filter_by(trip_id=trip_id)
+        if event_type:
+            query = query.filter_by(event_type=event_type)
+        if open_only:
+            query = query.filter(TripEvent.ended_at.is_(None))
+        
+        events = query.order_by(TripEvent.started_at.desc()).limit(limit).all()
+        
+        return success_response([event.to_dict() for event in events])
+    except Exception as e:
+        return error_response(f"Error fetching trip events: {str(e)}")
+
+@tracking_bp.route('/driving-summary', methods=['GET'])
+@jwt_required()
+def get_driving_summary():
+    """Get idle, overspeed and harsh-speed totals per bus or driver"""
+    try:
+        group_by = request.args.get('group_by', 'bus')
+        start_date_str = request.args.get('start_date')
+        end_date_str = request.args.get('end_date')
+        
+        if group_by not in ('bus', 'driver'):
+            return error_response("group_by must be 'bus' or 'driver'")
+        
+        try:
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else date.today()
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else end_date
+        except ValueError:
+            return error_response("Invalid date format. Use YYYY-MM-DD")
+        
+        return success_response({
+            'group_by': group_by,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'rows': driving_event_summary(start_date, end_date, group_by)
+        })
+    except Exception as e:
+        return error_response(f"Error fetching driving summary: {str(e)}")
+
+@tracking_bp.route('/socket-metrics', methods=['GET'])
+@admin_required
+def get_socket_metrics(current_user):
+    """Get fan-out metrics of the Socket.IO server in this process"""
+    try:
+        return success_response(socket_metrics.snapshot())
+    except Exception as e:
+        return error_response(f"Error fetching socket metrics: {str(e)}")
+
+@tracking_bp.route('/heatmap', methods=['GET'])
+@jwt_required()
+def get_heatmap_tiles():
+    """Get pre-aggregated fix counts per map tile for a date range"""
+    try:
+        zoom = request.args.get('zoom', 15, type=int)
+        start_date_str = request.args.get('start_date')
+        end_date_str = request.args.get('end_date')
+        
+        zoom_levels = current_app.config.get('HEATMAP_ZOOM_LEVELS', (12, 15, 18))
+        if zoom not in zoom_levels:
+            return error_response(f"Zoom must be one of: {', '.join(str(z) for z in zoom_levels)}")
+        
+        try:
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else date.today()
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else end_date
+        except ValueError:
+            return error_response("Invalid date format. Use YYYY-MM-DD")
+        
+        query = db.session.query(
+            HeatmapTile.tile_x,
+            HeatmapTile.tile_y,
+            func.sum(HeatmapTile.fix_count).label('fix_count'),
+            func.sum(HeatmapTile.idle_count).label('idle_count')
+        ).filter(
+            HeatmapTile.zoom == zoom,
+            HeatmapTile.day >= start_date,
+            HeatmapTile.day <= end_date
+        )
+        
+        # Optional tile bounding box
+        min_x = request.args.get('min_x', type=int)
+        max_x = request.args.get('max_x', type=int)
+        min_y = request.args.get('min_y', type=int)
+        max_y = request.args.get('max_y', type=int)
+        
+        if min_x is not None:
+            query = query.filter(HeatmapTile.tile_x >= min_x)
+        if max_x is not None:
+            query = query.filter(HeatmapTile.tile_x <= max_x)
+        if min_y is not None:
+            query = query.filter(HeatmapTile.tile_y >= min_y)
+        if max_y is not None:
+            query = query.filter(HeatmapTile.tile_y <= max_y)
+        
+        tiles = query.group_by(HeatmapTile.tile_x, HeatmapTile.tile_y).all()
+        
+        return success_response({
+            'zoom': zoom,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'tiles': [
+                {'x': tile.tile_x, 'y': tile.tile_y, 'fix_count': int(tile.fix_count), 'idle_count': int(tile.idle_count)}
+                for tile in tiles
+            ]
+        })
+    except Exception as e:
+        return error_response(f"Error fetching heatmap tiles: {str(e)}")
+
 @tracking_bp.route('/active-trips', methods=['GET'])
 @jwt_required()
 def get_active_trips_with_locations():
@@ -245,16 +463,153 @@ def check_geofence():
         return error_response(f"Error checking geofence: {str(e)}")
 
 # WebSocket events for real-time tracking
+@socketio.on('connect')
+def on_connect(auth=None):
+    """Authenticate a client from the access token it connects with"""
+    socket_metrics.ensure_monitor()
+    token = (auth or {}).get('token') or request.args.get('token')
+    if not token:
+        return
+    try:
+        subscriptions.connect(request.sid, socket_user_id(token))
+    except Exception:
+        return False
+
+def _subscribe(room):
+    """Count a subscription and join the room on the first one"""
+    from flask_socketio import join_room
+    if subscriptions.add(request.sid, room):
+        join_room(client_room(request.sid, room))
+
+def _unsubscribe(room):
+    """Drop a subscription and leave the room with the last one"""
+    from flask_socketio import leave_room
+    if subscriptions.remove(request.sid, room):
+        leave_room(room)
+        leave_room(binary_room(room))
+
 @socketio.on('join_tracking')
 def on_join_tracking():
-    """Join the tracking room for real-time updates"""
-    from flask_socketio import join_room
-    join_room('tracking')
-    socketio.emit('tracking_joined', {'message': 'Joined tracking updates'})
+    """Join the fleet-wide tracking room for real-time updates"""
+    from flask_socketio import emit
+    user = subscriptions.user(request.sid)
+    if not user or not user.is_active or user.role not in FLEET_ROLES:
+        emit('tracking_error', {'message': 'Fleet tracking requires a staff account'})
+        return
+    
+    _subscribe(FLEET_ROOM)
+    emit('tracking_joined', {'message': 'Joined tracking updates'})
 
 @socketio.on('leave_tracking')
 def on_leave_tracking():
-    """Leave the tracking room"""
-    from flask_socketio import leave_room
-    leave_room('tracking')
-    socketio.emit('tracking_left', {'message': 'Left tracking updates'})
+    """Leave the fleet-wide tracking room"""
+    from flask_socketio import emit
+    _unsubscribe(FLEET_ROOM)
+    emit('tracking_left', {'message': 'Left tracking updates'})
+
+def _subscription_target(data):
+    """Read and validate the room type and id of a subscription request"""
+    data = data or {}
+    room_type = data.get('type')
+    if room_type not in ROOM_TYPES:
+        raise ValueError(f"Type must be one of: {', '.join(ROOM_TYPES)}")
+    try:
+        return room_type, int(data.get('id'))
+    except (TypeError, ValueError):
+        raise ValueError('A numeric id is required')
+
+@socketio.on('subscribe')
+def on_subscribe(data):
+    """Follow live updates of one bus, route or trip"""
+    from flask_socketio import emit
+    try:
+        room_type, target_id = _subscription_target(data)
+    except ValueError as e:
+        emit('tracking_error', {'message': str(e)})
+        return
+    
+    if not can_subscribe(subscriptions.user(request.sid), room_type, target_id):
+        emit('tracking_error', {'message': f'Not allowed to follow {room_type} {target_id}'})
+        return
+    
+    room = room_name(room_type, target_id)
+    _subscribe(room)
+    emit('subscribed', {'type': room_type, 'id': target_id, 'room': room})
+
+@socketio.on('unsubscribe')
+def on_unsubscribe(data):
+    """Stop following a bus, route or trip"""
+    from flask_socketio import emit
+    try:
+        room_type, target_id = _subscription_target(data)
+    except ValueError as e:
+        emit('tracking_error', {'message': str(e)})
+        return
+    
+    room = room_name(room_type, target_id)
+    _unsubscribe(room)
+    emit('unsubscribed', {'type': room_type, 'id': target_id, 'room': room})
+
+@socketio.on('set_tracking_protocol')
+def on_set_tracking_protocol(data):
+    """Negotiate JSON or binary location frames for this client"""
+    from flask_socketio import emit, join_room, leave_room, rooms
+    fmt = (data or {}).get('format', 'json')
+    if fmt not in TRACKING_FORMATS:
+        emit('tracking_error', {'message': f"Format must be one of: {', '.join(TRACKING_FORMATS)}"})
+        return
+    
+    set_client_format(request.sid, fmt)
+    
+    # Move existing subscriptions to the rooms of the new protocol
+    for room in rooms():
+        if room == request.sid:
+            continue
+        plain = room[:-len(BINARY_ROOM_SUFFIX)] if room.endswith(BINARY_ROOM_SUFFIX) else room
+        target = client_room(request.sid, plain)
+        if target != room:
+            leave_room(room)
+            join_room(target)
+    
+    emit('tracking_protocol', {'format': fmt, 'version': FRAME_VERSION})
+
+@socketio.on('tracking_resync')
+def on_tracking_resync(data):
+    """Send a keyframe to a binary client whose frame sequence broke"""
+    from flask_socketio import emit, rooms
+    room = (data or {}).get('room', 'tracking')
+    if binary_room(room) not in rooms():
+        emit('tracking_error', {'message': f'Not subscribed to {room} with binary frames'})
+        return
+    
+    emit('location_frame', {'room': room, 'frame': location_broadcaster.keyframe(room)})
+
+@socketio.on('resume_tracking')
+def on_resume_tracking(data):
+    """Catch a reconnected client up on a room it has re-subscribed to
+    
+    The client sends the last seq it applied; it receives the missed
+    frames, or a snapshot of the room if the replay log no longer
+    reaches back that far.
+    """
+    from flask_socketio import emit
+    data = data or {}
+    room = data.get('room')
+    if room not in subscriptions.rooms(request.sid):
+        emit('tracking_error', {'message': f'Subscribe to {room} before resuming it'})
+        return
+    
+    try:
+        last_seq = int(data.get('last_seq'))
+    except (TypeError, ValueError):
+        emit('tracking_error', {'message': 'A numeric last_seq is required'})
+        return
+    
+    binary = client_room(request.sid, room) != room
+    emit('location_resume', location_broadcaster.resume(room, last_seq, binary))
+
+@socketio.on('disconnect')
+def on_disconnect():
+    """Drop per-client tracking state"""
+    subscriptions.disconnect(request.sid)
+    forget_client(request.sid)
@@ -5,6 +5,11 @@ from app import db
 from app.models.trip import Trip
 from app.models.bus import Bus
 from app.models.route import Route
+from app.models.trip_stop_visit import TripStopVisit
+from app.services.deviation_detector import deviation_detector
+from app.services.location_pipeline import ACTIVE_TRIP_STATUSES, invalidate_bus_context
+from app.services.odometry import trip_odometer
+from app.services.response_cache import response_cache
 from app.utils.helpers import success_response, error_response
 
 trips_bp = Blueprint('trips', __name__)
@@ -55,6 +60,7 @@ def get_trip(trip_id):
 
 @trips_bp.route('/', methods=['POST'])
 @jwt_required()
+@response_cache.invalidates('trips')
 def create_trip():
     """Create a new trip"""
     try:
@@ -93,6 +99,7 @@ def create_trip():
 
 @trips_bp.route('/<int:trip_id>', methods=['PUT'])
 @jwt_required()
+@response_cache.invalidates('trips')
 def update_trip(trip_id):
     """Update a trip"""
     try:
@@ -112,10 +119,13 @@ def update_trip(trip_id):
             trip.end_time = datetime.fromisoformat(data['end_time']) if data['end_time'] else None
         if 'status' in data:
             trip.status = data['status']
+            if trip.status not in ACTIVE_TRIP_STATUSES:
+                deviation_detector.finish_trip(trip.bus_id, trip.id, trip.end_time or datetime.utcnow())
         if 'trip_type' in data:
             trip.trip_type = data['trip_type']
         
         db.session.commit()
+        invalidate_bus_context(trip.bus_id)
         
         return success_response({
             'id': trip.id,
@@ -129,12 +139,14 @@ def update_trip(trip_id):
 
 @trips_bp.route('/<int:trip_id>', methods=['DELETE'])
 @jwt_required()
+@response_cache.invalidates('trips')
 def delete_trip(trip_id):
     """Delete a trip"""
     try:
         trip = Trip.query.get_or_404(trip_id)
         db.session.delete(trip)
         db.session.commit()
+        invalidate_bus_context(trip.bus_id)
         
         return success_response({'message': 'Trip deleted successfully'})
         
@@ -144,6 +156,7 @@ def delete_trip(trip_id):
 
 @trips_bp.route('/<int:trip_id>/start', methods=['POST'])
 @jwt_required()
+@response_cache.invalidates('trips')
 def start_trip(trip_id):
     """Start a trip"""
     try:
@@ -152,6 +165,7 @@ def start_trip(trip_id):
         trip.start_time = datetime.utcnow()
         
         db.session.commit()
+        invalidate_bus_context(trip.bus_id)
         
         return success_response({
             'id': trip.id,
@@ -164,21 +178,43 @@ def start_trip(trip_id):
         db.session.rollback()
         return error_response(f"Error starting trip: {str(e)}")
 
+@trips_bp.route('/<int:trip_id>/stop-visits', methods=['GET'])
+@jwt_required()
+def get_trip_stop_visits(trip_id):
+    """Get detected stop arrivals, departures and dwell times for a trip"""
+    try:
+        visits = TripStopVisit.query.filter_by(trip_id=trip_id).order_by(TripStopVisit.stop_order).all()
+        return success_response([visit.to_dict() for visit in visits])
+    except Exception as e:
+        return error_response(f"Error fetching trip stop visits: {str(e)}")
+
 @trips_bp.route('/<int:trip_id>/complete', methods=['POST'])
 @jwt_required()
+@response_cache.invalidates('trips')
 def complete_trip(trip_id):
     """Complete a trip"""
     try:
         trip = Trip.query.get_or_404(trip_id)
+        # Completing twice would add the distance to the driver again
+        if trip.status in ('Completed', 'completed'):
+            return error_response("Trip is already completed")
         trip.status = 'completed'
         trip.end_time = datetime.utcnow()
+        deviation_detector.finish_trip(trip.bus_id, trip.id, trip.end_time)
+        
+        # total_distance was accumulated from live fixes during the trip
+        if trip.total_distance and trip.driver:
+            trip.driver.total_distance = (trip.driver.total_distance or 0) + trip.total_distance
         
         db.session.commit()
+        trip_odometer.reset(trip.bus_id)
+        invalidate_bus_context(trip.bus_id)
         
         return success_response({
             'id': trip.id,
             'status': trip.status,
             'end_time': trip.end_time.isoformat(),
+            'total_distance': trip.total_distance,
             'message': 'Trip completed successfully'
         })
         
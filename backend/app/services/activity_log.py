@@ -0,0 +1,118 @@
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models.activity_event import ActivityEvent
+from app.models.attendance import Attendance
+from app.models.fee import Fee
+from app.models.trip import Trip
+
+ACTIVITY_TYPES = ('trip', 'attendance', 'payment')
+
+def _previous(record, name):
+    """Get the value an attribute had before the pending change, if any."""
+    history = inspect(record).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return None if history.added else getattr(record, name)
+
+def _keep_replaced(target, value, oldvalue, initiator):
+    """Listener that only makes the ORM load the value being replaced."""
+
+def trip_event(trip):
+    """Describe a trip that was created or changed status."""
+    return {
+        'event_type': 'trip',
+        'entity_id': trip.id,
+        'description': f"Trip {trip.id} - {trip.status}",
+        'details': {'trip_id': trip.id, 'bus_id': trip.bus_id, 'status': trip.status}
+    }
+
+def attendance_event(record):
+    """Describe a new attendance record."""
+    return {
+        'event_type': 'attendance',
+        'entity_id': record.id,
+        'description': f"Student {record.student_id} - {record.status}",
+        'details': {'student_id': record.student_id, 'status': record.status, 'trip_id': record.trip_id}
+    }
+
+def payment_event(fee, amount):
+    """Describe a payment of amount towards a fee."""
+    return {
+        'event_type': 'payment',
+        'entity_id': fee.id,
+        'description': f"Fee payment - Student {fee.student_id}",
+        'details': {'student_id': fee.student_id, 'amount': amount, 'month': fee.month, 'year': fee.year}
+    }
+
+def activity_events(session):
+    """Build the feed entries for the writes of a flush that just ran."""
+    events = []
+    for record in session.new:
+        if isinstance(record, Trip):
+            events.append(trip_event(record))
+        elif isinstance(record, Attendance):
+            events.append(attendance_event(record))
+        elif isinstance(record, Fee) and record.paid_amount:
+            events.append(payment_event(record, float(record.paid_amount)))
+    for record in session.dirty:
+        if isinstance(record, Trip) and inspect(record).attrs.status.history.has_changes():
+            events.append(trip_event(record))
+        elif isinstance(record, Fee):
+            paid = float(record.paid_amount or 0) - float(_previous(record, 'paid_amount') or 0)
+            if paid > 0:
+                events.append(payment_event(record, paid))
+    return events
+
+def _log_flush(session, flush_context):
+    """Append feed entries in the transaction that made the changes."""
+    events = activity_events(session)
+    if events:
+        now = datetime.utcnow()
+        session.execute(ActivityEvent.__table__.insert(), [dict(entry, occurred_at=now) for entry in events])
+
+def init_app(app):
+    """Log trips, attendance and payments as they are written."""
+    if event.contains(Session, 'after_flush', _log_flush):
+        return
+    # A payment is the increase of paid_amount, which needs the old value
+    # even when the fee was expired by an earlier commit
+    event.listen(Fee.paid_amount, 'set', _keep_replaced, active_history=True)
+    event.listen(Session, 'after_flush', _log_flush)
+
+def recent_activity(limit=10, before=None, types=None):
+    """Get feed entries newest first, starting below the cursor before.
+
+    One range scan of the primary key, or of (event_type, id) when
+    types are given; pass the id of the last entry as before to get
+    the next page.
+    """
+    query = ActivityEvent.query
+    if types:
+        query = query.filter(ActivityEvent.event_type.in_(types))
+    if before:
+        query = query.filter(ActivityEvent.id < before)
+    return query.order_by(ActivityEvent.id.desc()).limit(limit).all()
+
+def backfill_activity_events(since):
+    """Seed the feed with trips, attendance and payments since a date.
+
+    Entries are appended oldest first so ids keep following time; run
+    once after creating the table, on an empty feed.
+    """
+    start = datetime.combine(since, datetime.min.time())
+    entries = []
+    for trip in Trip.query.filter(Trip.created_at >= start).yield_per(1000):
+        entries.append(dict(trip_event(trip), occurred_at=trip.created_at))
+    for record in Attendance.query.filter(Attendance.created_at >= start).yield_per(1000):
+        entries.append(dict(attendance_event(record), occurred_at=record.created_at))
+    for fee in Fee.query.filter(Fee.payment_date >= since, Fee.paid_amount > 0).yield_per(1000):
+        entries.append(dict(payment_event(fee, float(fee.paid_amount)),
+                            occurred_at=datetime.combine(fee.payment_date, datetime.min.time())))
+
+    entries.sort(key=lambda entry: entry['occurred_at'])
+    for i in range(0, len(entries), 1000):
+        db.session.execute(ActivityEvent.__table__.insert(), entries[i:i + 1000])
+    db.session.commit()
+    return len(entries)
@@ -0,0 +1,222 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_
+from app import db, socketio
+from app.models.alert import Alert, PRIORITY_RANKS
+from app.models.fee import Fee
+from app.models.maintenance import Maintenance
+from app.services.attendance_rollup import attendance_rate, daily_attendance
+from app.services.response_cache import tags_invalidated
+
+OPEN_MAINTENANCE_STATUSES = ('Scheduled', 'In Progress')
+UNPAID_FEE_STATUSES = ('Pending', 'Partial', 'Overdue')
+
+_sources = {}
+
+def alert_source(name, tags=()):
+    """Register a generator of alerts, re-run when any of tags is written.
+
+    The generator takes today's date and yields dicts with key, type,
+    priority, title, message and occurred_at. Keys identify an alert
+    across runs; an alert whose key is no longer yielded is resolved.
+    """
+    def decorator(f):
+        _sources[name] = (f, tuple(tags))
+        return f
+    return decorator
+
+@alert_source('maintenance_due', tags=('maintenance',))
+def maintenance_due_alerts(today):
+    """Maintenance due within the lookahead window or already late."""
+    lookahead = current_app.config.get('ALERT_MAINTENANCE_LOOKAHEAD_DAYS', 7)
+    records = Maintenance.query.filter(
+        Maintenance.next_maintenance_date <= today + timedelta(days=lookahead),
+        Maintenance.status.in_(OPEN_MAINTENANCE_STATUSES)
+    ).all()
+    for maintenance in records:
+        days_until = (maintenance.next_maintenance_date - today).days
+        yield {
+            'key': f'maintenance:{maintenance.id}',
+            'type': 'maintenance',
+            'priority': 'high' if days_until <= 2 else 'medium',
+            'title': f"Maintenance Due - Bus {maintenance.bus_id}",
+            'message': (f"Maintenance scheduled in {days_until} days" if days_until >= 0
+                        else f"Maintenance overdue by {-days_until} days"),
+            'occurred_at': datetime.combine(maintenance.next_maintenance_date, datetime.min.time())
+        }
+
+@alert_source('overdue_fees', tags=('fees',))
+def overdue_fee_alerts(today):
+    """One alert counting unpaid fees past their due date."""
+    overdue = Fee.query.filter(
+        Fee.due_date < today,
+        Fee.status.in_(UNPAID_FEE_STATUSES)
+    ).count()
+    if overdue:
+        yield {
+            'key': 'fees:overdue',
+            'type': 'fees',
+            'priority': 'medium',
+            'title': 'Overdue Fees',
+            'message': f"{overdue} fee(s) are overdue",
+            'occurred_at': datetime.combine(today, datetime.min.time())
+        }
+
+@alert_source('low_attendance', tags=('attendance',))
+def low_attendance_alerts(today):
+    """Today's attendance rate below ALERT_LOW_ATTENDANCE_PERCENT."""
+    present, total = daily_attendance(today, today).get(today, (0, 0))
+    rate = attendance_rate(present, total)
+    if total and rate < current_app.config.get('ALERT_LOW_ATTENDANCE_PERCENT', 80):
+        yield {
+            'key': f'attendance:low:{today.isoformat()}',
+            'type': 'attendance',
+            'priority': 'medium',
+            'title': 'Low Attendance',
+            'message': f"Today's attendance is {rate:.1f}%",
+            'occurred_at': datetime.combine(today, datetime.min.time())
+        }
+
+def evaluate_alerts(names=None):
+    """Run alert sources and store their results in the alerts table.
+
+    Alerts are upserted by key, so re-raising one updates it in place,
+    and active alerts of the evaluated sources that were not raised
+    again are resolved. Returns (raised, resolved) counts.
+    """
+    names = [name for name in (names or _sources) if name in _sources]
+    today = date.today()
+    now = datetime.utcnow()
+
+    fresh = {}
+    for name in names:
+        generate, _ = _sources[name]
+        for spec in generate(today):
+            fresh[spec['key']] = (name, spec)
+
+    existing = {alert.alert_key: alert for alert in Alert.query.filter(
+        Alert.source.in_(names),
+        or_(Alert.active.is_(True), Alert.alert_key.in_(list(fresh)))
+    ).all()}
+
+    for key, (name, spec) in fresh.items():
+        alert = existing.get(key)
+        if alert is None:
+            alert = Alert(alert_key=key, source=name)
+            db.session.add(alert)
+        alert.alert_type = spec['type']
+        alert.priority = spec['priority']
+        alert.priority_rank = PRIORITY_RANKS.get(spec['priority'], 0)
+        alert.title = spec['title']
+        alert.message = spec['message']
+        alert.occurred_at = spec['occurred_at']
+        alert.active = True
+        alert.resolved_at = None
+
+    resolved = 0
+    for key, alert in existing.items():
+        if alert.active and key not in fresh:
+            alert.active = False
+            alert.resolved_at = now
+            resolved += 1
+
+    db.session.commit()
+    return len(fresh), resolved
+
+def active_alerts(limit=50):
+    """Get active alerts, highest priority and most recent first."""
+    return Alert.query.filter(Alert.active.is_(True)).order_by(
+        Alert.priority_rank.desc(), Alert.occurred_at.desc()
+    ).limit(limit).all()
+
+class AlertEngine:
+    """Evaluate alert sources in the background.
+
+    Every source runs on a fixed interval; a write invalidating one of
+    a source's tags queues that source, and queued sources run after a
+    short debounce so a burst of writes costs one evaluation. Requests
+    only read the alerts table, except the first ones of a process,
+    which evaluate every source if the loop has not done so yet.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._first_pass_lock = threading.Lock()
+        self._pending = set()
+        self._task = None
+        self._app = None
+        self._evaluated = False
+
+    def init_app(self, app):
+        """Re-evaluate sources whenever their tags are invalidated."""
+        self._app = app
+        tags_invalidated.connect(self._on_invalidated, weak=False)
+
+    def _on_invalidated(self, sender, tags=()):
+        self.request_evaluation(*tags)
+
+    def request_evaluation(self, *tags):
+        """Queue the sources depending on any of tags."""
+        names = {name for name, (_, source_tags) in _sources.items() if set(source_tags) & set(tags)}
+        if names:
+            with self._lock:
+                self._pending.update(names)
+            self.ensure_running()
+
+    def ensure_running(self):
+        """Start the evaluation loop once per process."""
+        if self._task is not None:
+            return
+        with self._lock:
+            if self._task is None:
+                self._app = self._app or current_app._get_current_object()
+                self._task = socketio.start_background_task(self._run)
+
+    def ensure_evaluated(self):
+        """Evaluate every source once in this request if no pass has completed yet.
+
+        Until then the alerts table may predate the current data, and an
+        empty list would read as nothing being wrong.
+        """
+        if self._evaluated:
+            return
+        with self._first_pass_lock:
+            if self._evaluated:
+                return
+            try:
+                evaluate_alerts()
+                self._evaluated = True
+            except Exception as e:
+                # Usually the loop or another worker raising the same alert first
+                db.session.rollback()
+                current_app.logger.warning(f'Alert evaluation failed: {e}')
+
+    def _run(self):
+        """Evaluate queued sources after each debounce, and all on the interval."""
+        interval = self._app.config.get('ALERTS_EVALUATE_INTERVAL_SECONDS', 60)
+        debounce = self._app.config.get('ALERTS_DEBOUNCE_SECONDS', 2)
+        next_full = time.monotonic() + interval if self._evaluated else 0
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, set()
+            full = time.monotonic() >= next_full
+            if full or pending:
+                try:
+                    with self._app.app_context():
+                        evaluate_alerts(None if full else pending)
+                        db.session.remove()
+                    if full:
+                        self._evaluated = True
+                except Exception as e:
+                    # Another worker may have raised the same alert first;
+                    # the sources run again on the next tick
+                    self._app.logger.warning(f'Alert evaluation failed: {e}')
+                    with self._lock:
+                        self._pending.update(pending)
+                if full:
+                    next_full = time.monotonic() + interval
+            socketio.sleep(debounce)
+
+alert_engine = AlertEngine()
@@ -0,0 +1,158 @@
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import case, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+from app import db
+from app.models.attendance import Attendance
+from app.models.attendance_daily import UNASSIGNED_CLASS, AttendanceDaily
+from app.models.student import Student
+from app.utils.sql import insert_adding_counts
+
+# Attendance statuses that mean the student rode the bus
+PRESENT_STATUSES = ('Present', 'Late', 'Left Early')
+
+# Attendance columns that decide which rollup row a record counts in
+GROUP_COLUMNS = ('date', 'route_id', 'bus_id', 'student_id', 'status')
+
+def _committed(record, name):
+    """Get the value of an attribute as it stands in the database."""
+    history = inspect(record).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(record, name)
+
+def _group(record, value):
+    """Get (date, route, bus, student, status) of a record via value()."""
+    day, route_id, bus_id, student_id, status = (value(record, name) for name in GROUP_COLUMNS)
+    return day or date.today(), route_id, bus_id, student_id, status or 'Present'
+
+def _keep_replaced(target, value, oldvalue, initiator):
+    """Listener that only makes the ORM load the value being replaced."""
+
+def attendance_deltas(session):
+    """Count the attendance rows a pending flush adds and removes per group."""
+    deltas = defaultdict(int)
+    for record in session.new:
+        if isinstance(record, Attendance):
+            deltas[_group(record, getattr)] += 1
+    for record in session.deleted:
+        if isinstance(record, Attendance):
+            deltas[_group(record, _committed)] -= 1
+    for record in session.dirty:
+        if isinstance(record, Attendance) and session.is_modified(record):
+            before, after = _group(record, _committed), _group(record, getattr)
+            if before != after:
+                deltas[before] -= 1
+                deltas[after] += 1
+    return {group: delta for group, delta in deltas.items() if delta}
+
+def apply_deltas(session, deltas):
+    """Add per-group deltas to attendance_daily in the current transaction.
+
+    New counts are upserted, so two writers creating the same group
+    cannot collide on its unique key and fail the attendance write.
+    """
+    student_ids = {student_id for _, _, _, student_id, _ in deltas}
+    classes = dict(session.query(Student.id, Student.class_name).filter(Student.id.in_(student_ids)).all())
+
+    counts = defaultdict(int)
+    for (day, route_id, bus_id, student_id, status), delta in deltas.items():
+        counts[(day, route_id, bus_id, classes.get(student_id) or UNASSIGNED_CLASS, status)] += delta
+
+    added = []
+    for (day, route_id, bus_id, class_name, status), delta in counts.items():
+        if delta > 0:
+            added.append({'date': day, 'route_id': route_id, 'bus_id': bus_id,
+                          'class_name': class_name, 'status': status, 'record_count': delta})
+        elif delta < 0:
+            session.query(AttendanceDaily).filter(
+                AttendanceDaily.date == day,
+                AttendanceDaily.route_id == route_id,
+                AttendanceDaily.bus_id == bus_id,
+                AttendanceDaily.class_name == class_name,
+                AttendanceDaily.status == status
+            ).update({
+                'record_count': AttendanceDaily.record_count + delta
+            }, synchronize_session=False)
+
+    insert_adding_counts(session.connection(), AttendanceDaily.__table__, added,
+                         ('date', 'route_id', 'bus_id', 'class_name', 'status'), ('record_count',))
+
+def _roll_up_flush(session, flush_context, instances):
+    """Fold attendance writes into the rollup as part of the same flush."""
+    deltas = attendance_deltas(session)
+    if deltas:
+        apply_deltas(session, deltas)
+
+def init_app(app):
+    """Keep attendance_daily in step with every attendance write."""
+    if event.contains(Session, 'before_flush', _roll_up_flush):
+        return
+    # Records are usually updated after a commit expired them, and the
+    # rollup row they leave can only be found from their old values
+    for name in GROUP_COLUMNS:
+        event.listen(getattr(Attendance, name), 'set', _keep_replaced, active_history=True)
+    event.listen(Session, 'before_flush', _roll_up_flush)
+
+def rebuild_attendance_days(start_date, end_date):
+    """Recompute the rollup for [start_date, end_date] from attendance.
+
+    Catches up on writes that bypassed the ORM (bulk loads, manual
+    fixes) and on students who changed class; run nightly over the
+    last few days, or over all history to backfill.
+    """
+    AttendanceDaily.query.filter(
+        AttendanceDaily.date >= start_date,
+        AttendanceDaily.date <= end_date
+    ).delete(synchronize_session=False)
+
+    class_name = func.coalesce(Student.class_name, UNASSIGNED_CLASS)
+    grouped = select(
+        Attendance.date, Attendance.route_id, Attendance.bus_id, class_name,
+        Attendance.status, func.count(Attendance.id)
+    ).outerjoin(
+        Student, Student.id == Attendance.student_id
+    ).where(
+        Attendance.date >= start_date,
+        Attendance.date <= end_date
+    ).group_by(
+        Attendance.date, Attendance.route_id, Attendance.bus_id, class_name, Attendance.status
+    )
+
+    result = db.session.execute(insert(AttendanceDaily).from_select(
+        ['date', 'route_id', 'bus_id', 'class_name', 'status', 'record_count'], grouped
+    ))
+    db.session.commit()
+    return result.rowcount
+
+def rollup_filters(start_date, end_date, route_id=None, bus_id=None, class_name=None):
+    """Build filter clauses over attendance_daily."""
+    filters = [AttendanceDaily.date >= start_date, AttendanceDaily.date <= end_date]
+    if route_id:
+        filters.append(AttendanceDaily.route_id == route_id)
+    if bus_id:
+        filters.append(AttendanceDaily.bus_id == bus_id)
+    if class_name:
+        filters.append(AttendanceDaily.class_name == class_name)
+    return filters
+
+def present_count():
+    """Aggregate of rollup rows whose status counts as present."""
+    return func.coalesce(func.sum(case(
+        (AttendanceDaily.status.in_(PRESENT_STATUSES), AttendanceDaily.record_count), else_=0
+    )), 0)
+
+def daily_attendance(start_date, end_date, **filters):
+    """Get {date: (present, total)} for days that have attendance."""
+    rows = db.session.query(
+        AttendanceDaily.date,
+        present_count(),
+        func.coalesce(func.sum(AttendanceDaily.record_count), 0)
+    ).filter(
+        *rollup_filters(start_date, end_date, **filters)
+    ).group_by(AttendanceDaily.date).all()
+    return {day: (int(present), int(total)) for day, present, total in rows}
+
+def attendance_rate(present, total):
+    """Get a percentage rounded for display, 0 without records."""
+    return round(present / total * 100, 2) if total else 0
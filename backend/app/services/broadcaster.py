@@ -0,0 +1,150 @@
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from app import socketio
+from app.services.fanout_store import create_fanout_store
+from app.services.frame_codec import decode_frame
+from app.services.socket_metrics import socket_metrics
+
+TRACKING_FORMATS = ('json', 'binary')
+BINARY_ROOM_SUFFIX = ':bin'
+
+_binary_clients = set()
+
+class LocationBroadcaster:
+    """Coalesce live fixes and emit one batched frame per room per tick.
+
+    Ingest endpoints only record the latest fix of a bus for each room
+    it is published to; a background task flushes the pending fixes on
+    a fixed interval, so request latency does not depend on fan-out and
+    a bus reporting faster than the tick costs subscribers nothing.
+    With a shared store, one worker at a time flushes for all of them
+    and the message queue carries its emits to every other worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._task = None
+        self._logger = None
+        self.store = None
+        self.interval = 0.5
+
+    def publish(self, fix, rooms):
+        """Queue the latest fix of a bus for the given rooms."""
+        self._configure()
+        self.store.put(fix, rooms)
+        if self._task is None:
+            self._start()
+
+    def _configure(self):
+        """Pick the store and tick from app config once per process."""
+        if self.store is not None:
+            return
+        with self._lock:
+            if self.store is None:
+                self.interval = current_app.config.get('LOCATION_BROADCAST_INTERVAL_MS', 500) / 1000
+                self._logger = current_app.logger
+                self.store = create_fanout_store(current_app.config)
+
+    def _start(self):
+        """Start the flush loop on the first published fix."""
+        with self._lock:
+            if self._task is None:
+                self._task = socketio.start_background_task(self._run)
+
+    def _run(self):
+        """Flush pending fixes forever on the configured tick."""
+        lease_ms = max(int(self.interval * 4000), 2000)
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                if self.store.acquire_flush(lease_ms):
+                    self.flush()
+            except Exception as e:
+                self._logger.warning(f'Location broadcast failed: {e}')
+
+    def flush(self):
+        """Emit every room's pending fixes as one frame per protocol.
+
+        JSON clients receive location_batch in the room itself; binary
+        clients sit in the room's binary twin and receive location_frame.
+        Clients the slow-consumer monitor marked lagging are skipped.
+        """
+        pending = self.store.take()
+        if not pending:
+            return
+        sent_at = datetime.utcnow().isoformat()
+        base_time = int(time.time())
+        skip = socket_metrics.lagging_sids() or None
+        for room, fixes in pending.items():
+            updates = [location_payload(fix) for fix in fixes]
+            seq, frame = self.store.append(room, fixes, base_time, updates)
+            socket_metrics.timed_emit('location_batch', {
+                'room': room,
+                'seq': seq,
+                'updates': updates,
+                'sent_at': sent_at
+            }, room, skip)
+            socket_metrics.timed_emit('location_frame', {'room': room, 'frame': frame}, binary_room(room), skip)
+
+    def keyframe(self, room):
+        """Encode the full last-known state of a room for a resyncing client."""
+        self._configure()
+        return self.store.keyframe(room, int(time.time()))
+
+    def resume(self, room, last_seq, binary=False):
+        """Build the catch-up message for a client that saw room up to last_seq.
+
+        Missed frames are replayed from the log when it still covers the
+        gap; otherwise the client gets one compact snapshot of the room.
+        """
+        self._configure()
+        entries = self.store.replay(room, last_seq)
+        if entries is not None:
+            if binary:
+                return {'room': room, 'mode': 'replay', 'frames': [frame for _, frame, _ in entries]}
+            return {'room': room, 'mode': 'replay', 'batches': [
+                {'seq': seq, 'updates': updates} for seq, _, updates in entries
+            ]}
+
+        keyframe = self.store.keyframe(room, int(time.time()))
+        if binary:
+            return {'room': room, 'mode': 'snapshot', 'frames': [keyframe]}
+
+        seq, _, updates = decode_frame(keyframe, {})
+        for update in updates:
+            update['timestamp'] = datetime.utcfromtimestamp(update['timestamp']).isoformat()
+        return {'room': room, 'mode': 'snapshot', 'seq': seq, 'updates': updates}
+
+def location_payload(fix):
+    """Convert a fix to the JSON shape sent to tracking clients."""
+    return {
+        'bus_id': fix.bus_id,
+        'latitude': fix.latitude,
+        'longitude': fix.longitude,
+        'speed': fix.speed,
+        'heading': fix.heading,
+        'timestamp': fix.timestamp.isoformat()
+    }
+
+def binary_room(room):
+    """Get the room binary-protocol clients join in place of room."""
+    return room + BINARY_ROOM_SUFFIX
+
+def client_room(sid, room):
+    """Get the room a client should join for room under its protocol."""
+    return binary_room(room) if sid in _binary_clients else room
+
+def set_client_format(sid, fmt):
+    """Record the protocol negotiated by a client."""
+    if fmt == 'binary':
+        _binary_clients.add(sid)
+    else:
+        _binary_clients.discard(sid)
+
+def forget_client(sid):
+    """Drop protocol state of a disconnected client."""
+    _binary_clients.discard(sid)
+
+location_broadcaster = LocationBroadcaster()
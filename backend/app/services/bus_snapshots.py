@@ -0,0 +1,120 @@
+import hashlib
+import json
+import threading
+import time
+import redis
+from flask import current_app
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from app.services.eta_engine import eta_engine
+from app.services.message_queue import shared_redis_url
+
+SHARE_TOKEN_SALT = 'bus-share'
+
+class LocalSnapshotStore:
+    """Latest encoded snapshot of each bus, held in memory."""
+
+    def __init__(self):
+        self._snapshots = {}
+
+    def set(self, bus_id, etag, body, ttl):
+        self._snapshots[bus_id] = (etag, body, time.monotonic() + ttl)
+
+    def get(self, bus_id):
+        snapshot = self._snapshots.get(bus_id)
+        if snapshot is None or snapshot[2] < time.monotonic():
+            return None
+        return snapshot[0], snapshot[1]
+
+class RedisSnapshotStore:
+    """Latest encoded snapshot of each bus, shared by all workers."""
+
+    def __init__(self, url, prefix='fleetflow:snapshot'):
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    def set(self, bus_id, etag, body, ttl):
+        self.client.set(f'{self.prefix}:{bus_id}', etag.encode() + b'\n' + body, ex=ttl)
+
+    def get(self, bus_id):
+        value = self.client.get(f'{self.prefix}:{bus_id}')
+        if value is None:
+            return None
+        etag, body = value.split(b'\n', 1)
+        return etag.decode(), body
+
+class BusSnapshots:
+    """Pre-encoded "where is my bus" responses, rebuilt on every fix.
+
+    Each fix is serialized once into the exact response body together
+    with its ETag, so the public read path only looks the bytes up.
+    """
+
+    def __init__(self):
+        self.store = None
+        self._lock = threading.Lock()
+
+    def _configure(self):
+        if self.store is None:
+            with self._lock:
+                if self.store is None:
+                    url = shared_redis_url(current_app.config)
+                    self.store = RedisSnapshotStore(url) if url else LocalSnapshotStore()
+
+    def process(self, fix, context):
+        """Rebuild the snapshot of a bus from its latest fix."""
+        self._configure()
+        body = json.dumps({'success': True, 'data': {
+            'bus_id': fix.bus_id,
+            'trip_id': context.trip_id,
+            'route_id': context.route_id,
+            'latitude': fix.latitude,
+            'longitude': fix.longitude,
+            'speed': fix.speed,
+            'heading': fix.heading,
+            'timestamp': fix.timestamp.isoformat(),
+            'upcoming_stops': [{
+                'stop_id': prediction['stop_id'],
+                'stop_order': prediction['stop_order'],
+                'eta': prediction['eta'].isoformat(),
+                'eta_seconds': prediction['seconds']
+            } for prediction in eta_engine.for_bus(fix.bus_id)]
+        }}, separators=(',', ':')).encode()
+        etag = hashlib.md5(body).hexdigest()[:16]
+        self.store.set(fix.bus_id, etag, body, current_app.config.get('BUS_SNAPSHOT_TTL_SECONDS', 600))
+
+    def get(self, bus_id):
+        """Get (etag, body) of the latest snapshot of a bus, or None."""
+        self._configure()
+        return self.store.get(bus_id)
+
+bus_snapshots = BusSnapshots()
+
+_verified_tokens = {}
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=SHARE_TOKEN_SALT)
+
+def create_share_token(bus_id):
+    """Sign a token that lets its holder see one bus's live snapshot."""
+    return _serializer().dumps({'b': bus_id})
+
+def verify_share_token(token):
+    """Get the bus id a share token grants, or None if invalid or expired.
+
+    Verified tokens are remembered until they expire, so repeated polls
+    with the same link skip the signature check.
+    """
+    cached = _verified_tokens.get(token)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+
+    max_age = current_app.config.get('SHARE_TOKEN_MAX_AGE_SECONDS', 86400)
+    try:
+        payload, signed_at = _serializer().loads(token, max_age=max_age, return_timestamp=True)
+    except (BadSignature, SignatureExpired):
+        return None
+
+    if len(_verified_tokens) >= 10000:
+        _verified_tokens.clear()
+    _verified_tokens[token] = (payload['b'], signed_at.timestamp() + max_age)
+    return payload['b']
@@ -0,0 +1,163 @@
+import threading
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import func, true
+from app import db, socketio
+from app.models.student import Student
+from app.models.bus import Bus
+from app.models.driver import Driver
+from app.models.trip import Trip
+from app.models.maintenance import Maintenance
+from app.models.attendance_daily import AttendanceDaily
+from app.models.fee_monthly import FeeMonthly
+from app.services.attendance_rollup import present_count
+
+TODAY_TRIP_STATUSES = ('Scheduled', 'In Progress', 'scheduled', 'in_progress')
+OPEN_MAINTENANCE_STATUSES = ('Scheduled', 'In Progress')
+
+def compute_dashboard_stats():
+    """Compute the overall dashboard statistics.
+
+    Every figure is an aggregate evaluated in the database, and all of
+    them are fetched in one round trip: the cost follows the indexed
+    rows for today and this month, not the size of the tables.
+    """
+    today = date.today()
+    
+    # Today's attendance and this month's fees come from their rollups
+    attendance = db.session.query(
+        func.coalesce(func.sum(AttendanceDaily.record_count), 0).label('total'),
+        present_count().label('present')
+    ).filter(AttendanceDaily.date == today).subquery()
+    fees = db.session.query(
+        func.coalesce(func.sum(FeeMonthly.billed_amount), 0).label('total'),
+        func.coalesce(func.sum(FeeMonthly.collected_amount), 0).label('collected')
+    ).filter(FeeMonthly.year == today.year, FeeMonthly.month == today.month).subquery()
+    
+    row = db.session.query(
+        db.session.query(func.count(Student.id)).scalar_subquery().label('total_students'),
+        db.session.query(func.count(Bus.id)).scalar_subquery().label('total_buses'),
+        db.session.query(func.count(Driver.id)).scalar_subquery().label('total_drivers'),
+        db.session.query(func.count(Trip.id)).filter(
+            Trip.trip_date == today,
+            Trip.status.in_(TODAY_TRIP_STATUSES)
+        ).scalar_subquery().label('active_trips'),
+        db.session.query(func.count(Maintenance.id)).filter(
+            Maintenance.next_maintenance_date <= today + timedelta(days=7),
+            Maintenance.status.in_(OPEN_MAINTENANCE_STATUSES)
+        ).scalar_subquery().label('upcoming_maintenance'),
+        attendance.c.total.label('attendance_total'),
+        attendance.c.present.label('attendance_present'),
+        fees.c.total.label('fees_total'),
+        fees.c.collected.label('fees_collected')
+    ).select_from(attendance).join(fees, true()).one()
+    
+    attendance_rate = round(row.attendance_present / row.attendance_total * 100, 2) if row.attendance_total else 0
+    total_monthly_amount = float(row.fees_total)
+    collected_amount = float(row.fees_collected)
+    collection_rate = round(collected_amount / total_monthly_amount * 100, 2) if total_monthly_amount > 0 else 0
+    
+    return {
+        'total_students': row.total_students,
+        'total_buses': row.total_buses,
+        'total_drivers': row.total_drivers,
+        'active_trips_today': row.active_trips,
+        'attendance_rate_today': attendance_rate,
+        'monthly_collection_rate': collection_rate,
+        'upcoming_maintenance_alerts': row.upcoming_maintenance,
+        'total_monthly_fees': total_monthly_amount,
+        'collected_fees': collected_amount
+    }
+
+class _StatsSubscriber:
+    """Changes not yet sent to one open stream, merged until it reads them."""
+    __slots__ = ('changes', 'ready', 'lock')
+
+    def __init__(self):
+        self.changes = {}
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+
+    def push(self, changes):
+        with self.lock:
+            self.changes.update(changes)
+        self.ready.set()
+
+    def wait(self, timeout):
+        """Wait for changes; returns them, or None on timeout."""
+        if not self.ready.wait(timeout):
+            return None
+        with self.lock:
+            changes, self.changes = self.changes, {}
+            self.ready.clear()
+        return changes
+
+class DashboardStatsFeed:
+    """Compute dashboard statistics once per tick for every open stream.
+
+    The statistics are only computed while at least one stream is open,
+    and streams receive just the fields that changed since the previous
+    tick. A stream that falls behind has its pending changes merged, so
+    it costs constant memory however slowly it reads.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._task = None
+        self._app = None
+        self._stats = None
+
+    def subscribe(self):
+        """Register an open stream and make sure the tick is running."""
+        subscriber = _StatsSubscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._task is None:
+                self._app = current_app._get_current_object()
+                self._task = socketio.start_background_task(self._run)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Forget a closed stream."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def snapshot(self):
+        """Get the latest statistics, computing them if none are cached."""
+        if self._stats is None:
+            self._stats = compute_dashboard_stats()
+        return self._stats
+
+    def _run(self):
+        """Recompute and publish changes until no stream is left open."""
+        interval = self._app.config.get('DASHBOARD_STREAM_INTERVAL_SECONDS', 5)
+        while True:
+            socketio.sleep(interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._task = None
+                    self._stats = None
+                    return
+            try:
+                with self._app.app_context():
+                    self.tick()
+            except Exception as e:
+                self._app.logger.warning(f'Dashboard stats refresh failed: {e}')
+
+    def tick(self):
+        """Compute the statistics once and push what changed."""
+        stats = compute_dashboard_stats()
+        db.session.remove()
+        previous = self._stats or {}
+        changes = {key: value for key, value in stats.items() if previous.get(key) != value}
+        self._stats = stats
+        if not changes:
+            return
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(changes)
+
+dashboard_feed = DashboardStatsFeed()
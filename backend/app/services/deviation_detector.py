@@ -0,0 +1,176 @@
+from flask import current_app
+from app import db
+from app.models.trip_event import TripEvent
+from app.services.location_pipeline import emit_after_commit, run_after_commit
+from app.utils.geo import fast_distance_meters
+
+class _DeviationState:
+    """Constant-size deviation state kept for each bus."""
+    __slots__ = ('bus_id', 'trip_id', 'route_id', 'segment_hint', 'off_since', 'off_distance', 'peak_cross_track',
+                 'last_lat', 'last_lng', 'event_id')
+
+    def __init__(self, bus_id, trip_id, route_id):
+        self.bus_id = bus_id
+        self.trip_id = trip_id
+        self.route_id = route_id
+        self.segment_hint = None
+        self.event_id = None
+        self.clear()
+
+    def clear(self):
+        """Reset the off-route run."""
+        self.off_since = None
+        self.off_distance = 0.0
+        self.peak_cross_track = 0.0
+        self.last_lat = None
+        self.last_lng = None
+
+class DeviationDetector:
+    """Raise an event once a bus has been off its route for long enough.
+
+    Each fix is matched against the route's segment index, starting from
+    the segment the bus was last matched to. A deviation is raised after
+    the bus has travelled ROUTE_DEVIATION_MIN_DISTANCE_METERS or spent
+    ROUTE_DEVIATION_MIN_SECONDS further than ROUTE_DEVIATION_THRESHOLD_METERS
+    from the route, and closed when it rejoins it or its trip ends.
+    """
+
+    def __init__(self):
+        self._states = {}
+
+    def process(self, fix, context):
+        """Advance deviation tracking for one fix."""
+        geometry = context.geometry
+        if not geometry or not geometry.segment_count:
+            state = self._states.pop(fix.bus_id, None)
+            if state is not None and state.event_id is not None:
+                self._close_event(state, fix.timestamp)
+            return
+
+        state = self._states.get(fix.bus_id)
+        if state is None or state.trip_id != context.trip_id or state.route_id != context.route_id:
+            if state is not None and state.event_id is not None:
+                self._close_event(state, fix.timestamp)
+            state = _DeviationState(fix.bus_id, context.trip_id, context.route_id)
+            self._states[fix.bus_id] = state
+
+        config = current_app.config
+        threshold = config.get('ROUTE_DEVIATION_THRESHOLD_METERS', 150)
+        match = geometry.match(fix.latitude, fix.longitude, threshold, hint=state.segment_hint)
+
+        if match is not None:
+            state.segment_hint = match[0]
+            if state.event_id is not None:
+                self._close_event(state, fix.timestamp)
+            state.clear()
+            return
+
+        if state.off_since is None:
+            state.off_since = fix.timestamp
+        else:
+            state.off_distance += fast_distance_meters(state.last_lat, state.last_lng, fix.latitude, fix.longitude)
+        state.last_lat, state.last_lng = fix.latitude, fix.longitude
+
+        x, y = geometry.project(fix.latitude, fix.longitude)
+        cross_track = min(geometry.segment_distance(i, x, y)[0] for i in self._nearby_segments(state, geometry))
+        state.peak_cross_track = max(state.peak_cross_track, cross_track)
+
+        if state.event_id is not None:
+            return
+
+        off_seconds = (fix.timestamp - state.off_since).total_seconds()
+        if (state.off_distance >= config.get('ROUTE_DEVIATION_MIN_DISTANCE_METERS', 300) or
+                off_seconds >= config.get('ROUTE_DEVIATION_MIN_SECONDS', 60)):
+            self._open_event(state, fix, context)
+
+    def reset(self, bus_id):
+        """Forget deviation state for a bus."""
+        self._states.pop(bus_id, None)
+
+    def finish_trip(self, bus_id, trip_id, ended_at):
+        """Close deviations still open when a trip ends.
+
+        Open events are closed from the table, so this works on any
+        worker; the bus's in-memory run is dropped once the trip's
+        transaction commits, so a rollback leaves it tracked.
+        """
+        state = self._states.get(bus_id)
+        if state is None or state.trip_id != trip_id:
+            state = None
+        else:
+            run_after_commit(self._forget_trip, bus_id, trip_id)
+
+        for event in TripEvent.query.filter_by(trip_id=trip_id, event_type='Route Deviation', ended_at=None):
+            event.ended_at = ended_at
+            event.duration_seconds = int((ended_at - event.started_at).total_seconds())
+            if state is not None and event.id == state.event_id:
+                event.distance_meters = round(state.off_distance, 1)
+                event.peak_value = round(state.peak_cross_track, 1)
+            emit_after_commit('route_deviation_cleared', {
+                'event_id': event.id,
+                'bus_id': event.bus_id,
+                'trip_id': trip_id,
+                'ended_at': ended_at.isoformat()
+            }, 'tracking')
+
+    def _forget_trip(self, bus_id, trip_id):
+        """Drop the in-memory run of a bus if it still belongs to trip_id."""
+        state = self._states.get(bus_id)
+        if state is not None and state.trip_id == trip_id:
+            self._states.pop(bus_id, None)
+
+    def _nearby_segments(self, state, geometry):
+        """Segments used to estimate cross-track distance while off route."""
+        if state.segment_hint is None:
+            return range(geometry.segment_count)
+        return range(max(state.segment_hint - 1, 0), min(state.segment_hint + 2, geometry.segment_count))
+
+    def _open_event(self, state, fix, context):
+        """Record and broadcast a new route deviation."""
+        event = TripEvent(
+            trip_id=context.trip_id,
+            bus_id=fix.bus_id,
+            route_id=context.route_id,
+            event_type='Route Deviation',
+            started_at=state.off_since,
+            distance_meters=round(state.off_distance, 1),
+            peak_value=round(state.peak_cross_track, 1),
+            latitude=fix.latitude,
+            longitude=fix.longitude
+        )
+        db.session.add(event)
+        db.session.flush()
+        state.event_id = event.id
+
+        emit_after_commit('route_deviation', {
+            'event_id': event.id,
+            'bus_id': fix.bus_id,
+            'trip_id': context.trip_id,
+            'route_id': context.route_id,
+            'latitude': fix.latitude,
+            'longitude': fix.longitude,
+            'cross_track_meters': event.peak_value,
+            'started_at': state.off_since.isoformat()
+        }, 'tracking')
+
+    def _close_event(self, state, ended_at):
+        """Close the open deviation once the bus is back on route or its trip ends."""
+        # Skipped if finish_trip already closed it, possibly on another worker
+        closed = TripEvent.query.filter_by(id=state.event_id, ended_at=None).update({
+            'ended_at': ended_at,
+            'duration_seconds': int((ended_at - state.off_since).total_seconds()),
+            'distance_meters': round(state.off_distance, 1),
+            'peak_value': round(state.peak_cross_track, 1)
+        })
+        event_id, state.event_id = state.event_id, None
+        if not closed:
+            return
+
+        emit_after_commit('route_deviation_cleared', {
+            'event_id': event_id,
+            'bus_id': state.bus_id,
+            'trip_id': state.trip_id,
+            'ended_at': ended_at.isoformat()
+        }, 'tracking')
+
+deviation_detector = DeviationDetector()
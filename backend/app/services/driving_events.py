@@ -0,0 +1,174 @@
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models.trip import Trip
+from app.models.trip_event import TripEvent
+from app.utils.geo import fast_distance_meters
+
+class _DrivingState:
+    """Small per-bus state for idle, overspeed and harsh-speed detection."""
+    __slots__ = ('trip_id', 'last_speed', 'last_timestamp', 'last_lat', 'last_lng',
+                 'idle_since', 'idle_lat', 'idle_lng',
+                 'overspeed_since', 'overspeed_lat', 'overspeed_lng', 'overspeed_peak', 'overspeed_distance')
+
+    def __init__(self, trip_id):
+        self.trip_id = trip_id
+        self.last_speed = None
+        self.last_timestamp = None
+        self.last_lat = None
+        self.last_lng = None
+        self.idle_since = None
+        self.idle_lat = None
+        self.idle_lng = None
+        self.overspeed_since = None
+        self.overspeed_lat = None
+        self.overspeed_lng = None
+        self.overspeed_peak = 0.0
+        self.overspeed_distance = 0.0
+
+class DrivingEventDetector:
+    """Record idle periods, overspeeding and harsh speed changes per trip.
+
+    Idle and overspeed runs are written as one event each when they end,
+    with their duration; harsh acceleration and braking are written as
+    they happen. Events are linked to the active trip so safety reports
+    only aggregate trip_events.
+    """
+
+    def __init__(self):
+        self._states = {}
+
+    def process(self, fix, context):
+        """Advance driving-event detection for one fix."""
+        if not context.trip_id:
+            self._states.pop(fix.bus_id, None)
+            return
+
+        state = self._states.get(fix.bus_id)
+        if state is None or state.trip_id != context.trip_id:
+            state = _DrivingState(context.trip_id)
+            self._states[fix.bus_id] = state
+
+        config = current_app.config
+        elapsed = None
+        moved = 0.0
+        if state.last_timestamp is not None:
+            elapsed = (fix.timestamp - state.last_timestamp).total_seconds()
+            moved = fast_distance_meters(state.last_lat, state.last_lng, fix.latitude, fix.longitude)
+
+        speed = fix.speed
+        if speed is None and elapsed:
+            speed = moved / elapsed * 3.6
+        if speed is None or (elapsed is not None and elapsed <= 0):
+            self._remember(state, fix, speed)
+            return
+
+        self._check_harsh(state, fix, context, speed, elapsed, config)
+        self._check_idle(state, fix, context, speed, config)
+        self._check_overspeed(state, fix, context, speed, moved, config)
+        self._remember(state, fix, speed)
+
+    def _remember(self, state, fix, speed):
+        """Keep the latest fix for the next comparison."""
+        state.last_speed = speed
+        state.last_timestamp = fix.timestamp
+        state.last_lat = fix.latitude
+        state.last_lng = fix.longitude
+
+    def _check_harsh(self, state, fix, context, speed, elapsed, config):
+        """Record a sudden speed change between consecutive fixes."""
+        if state.last_speed is None or not elapsed or elapsed > config.get('HARSH_MAX_INTERVAL_SECONDS', 10):
+            return
+
+        rate = (speed - state.last_speed) / elapsed  # km/h per second
+        limit = config.get('HARSH_SPEED_CHANGE_KMPH_PER_SECOND', 10)
+        if abs(rate) < limit:
+            return
+
+        self._add_event(context, fix, 'Harsh Acceleration' if rate > 0 else 'Harsh Braking',
+                        started_at=state.last_timestamp, ended_at=fix.timestamp,
+                        peak_value=round(abs(rate), 1), latitude=fix.latitude, longitude=fix.longitude)
+
+    def _check_idle(self, state, fix, context, speed, config):
+        """Track a run of fixes below idle speed."""
+        if speed < config.get('IDLE_SPEED_KMPH', 3):
+            if state.idle_since is None:
+                state.idle_since = fix.timestamp
+                state.idle_lat, state.idle_lng = fix.latitude, fix.longitude
+            return
+
+        if state.idle_since is not None:
+            duration = (fix.timestamp - state.idle_since).total_seconds()
+            if duration >= config.get('IDLE_MIN_SECONDS', 180):
+                self._add_event(context, fix, 'Idle', started_at=state.idle_since, ended_at=fix.timestamp,
+                                latitude=state.idle_lat, longitude=state.idle_lng)
+            state.idle_since = None
+
+    def _check_overspeed(self, state, fix, context, speed, moved, config):
+        """Track a run of fixes above the speed limit."""
+        if speed > config.get('OVERSPEED_LIMIT_KMPH', 60):
+            if state.overspeed_since is None:
+                state.overspeed_since = fix.timestamp
+                state.overspeed_lat, state.overspeed_lng = fix.latitude, fix.longitude
+                state.overspeed_peak = 0.0
+                state.overspeed_distance = 0.0
+            else:
+                state.overspeed_distance += moved
+            state.overspeed_peak = max(state.overspeed_peak, speed)
+            return
+
+        if state.overspeed_since is not None:
+            duration = (fix.timestamp - state.overspeed_since).total_seconds()
+            if duration >= config.get('OVERSPEED_MIN_SECONDS', 10):
+                self._add_event(context, fix, 'Overspeed', started_at=state.overspeed_since, ended_at=fix.timestamp,
+                                distance_meters=round(state.overspeed_distance, 1),
+                                peak_value=round(state.overspeed_peak, 1),
+                                latitude=state.overspeed_lat, longitude=state.overspeed_lng)
+            state.overspeed_since = None
+
+    def _add_event(self, context, fix, event_type, started_at, ended_at, **fields):
+        """Add a closed event for the active trip to the session."""
+        db.session.add(TripEvent(
+            trip_id=context.trip_id,
+            bus_id=fix.bus_id,
+            route_id=context.route_id,
+            event_type=event_type,
+            started_at=started_at,
+            ended_at=ended_at,
+            duration_seconds=int((ended_at - started_at).total_seconds()),
+            **fields
+        ))
+
+driving_event_detector = DrivingEventDetector()
+
+DRIVING_EVENT_TYPES = ('Idle', 'Overspeed', 'Harsh Acceleration', 'Harsh Braking')
+
+def driving_event_summary(start_date, end_date, group_by='bus'):
+    """Aggregate driving events per bus or driver over trip dates.
+
+    Returns rows of {id, event_type, count, total_seconds, peak_value},
+    computed in one grouped query over trip_events.
+    """
+    key = Trip.driver_id if group_by == 'driver' else TripEvent.bus_id
+    rows = db.session.query(
+        key.label('id'),
+        TripEvent.event_type,
+        func.count(TripEvent.id),
+        func.coalesce(func.sum(TripEvent.duration_seconds), 0),
+        func.max(TripEvent.peak_value)
+    ).join(Trip, Trip.id == TripEvent.trip_id).filter(
+        TripEvent.event_type.in_(DRIVING_EVENT_TYPES),
+        Trip.trip_date >= start_date,
+        Trip.trip_date <= end_date
+    ).group_by(key, TripEvent.event_type).all()
+
+    return [
+        {
+            'id': row_id,
+            'event_type': event_type,
+            'count': count,
+            'total_seconds': int(total_seconds),
+            'peak_value': peak_value
+        }
+        for row_id, event_type, count, total_seconds, peak_value in rows
+    ]
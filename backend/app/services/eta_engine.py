@@ -0,0 +1,254 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+import redis
+from flask import current_app
+from app.models.route import Route
+from app.services.message_queue import shared_redis_url
+from app.services.segment_profiles import segment_percentile
+from app.utils.helpers import to_school_time
+
+class _EtaState:
+    """Progress and speed of a bus along its current trip."""
+    __slots__ = ('trip_id', 'segment_hint', 'along', 'speed', 'last_along', 'last_timestamp')
+
+    def __init__(self, trip_id):
+        self.trip_id = trip_id
+        self.segment_hint = None
+        self.along = 0.0
+        self.speed = None  # meters per second, smoothed
+        self.last_along = None
+        self.last_timestamp = None
+
+class LocalPredictionStore:
+    """Latest predictions of each bus, held in memory for a single process."""
+
+    def __init__(self):
+        self._by_bus = {}
+        self._by_stop = {}
+        self._lock = threading.Lock()
+
+    def replace(self, bus_id, entries, ttl):
+        with self._lock:
+            for entry in self._by_bus.pop(bus_id, []):
+                self._by_stop.get(entry['stop_id'], {}).pop(bus_id, None)
+            for entry in entries:
+                self._by_stop.setdefault(entry['stop_id'], {})[bus_id] = entry
+            if entries:
+                self._by_bus[bus_id] = entries
+
+    def for_bus(self, bus_id):
+        return list(self._by_bus.get(bus_id, []))
+
+    def for_stop(self, stop_id):
+        return list(self._by_stop.get(stop_id, {}).values())
+
+class RedisPredictionStore:
+    """Latest predictions of each bus, shared by all workers.
+
+    A bus's predictions are one JSON value, and each stop keeps a hash
+    of the entry of every bus heading to it, so either read is a single
+    command. Keys expire with the predictions.
+    """
+
+    def __init__(self, url, prefix='fleetflow:eta'):
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    def replace(self, bus_id, entries, ttl):
+        bus_key = f'{self.prefix}:bus:{bus_id}'
+        previous = self.client.get(bus_key)
+        pipe = self.client.pipeline()
+        for entry in json.loads(previous) if previous else []:
+            pipe.hdel(f'{self.prefix}:stop:{entry["stop_id"]}', bus_id)
+        encoded = [dict(entry, eta=entry['eta'].isoformat()) for entry in entries]
+        for entry in encoded:
+            stop_key = f'{self.prefix}:stop:{entry["stop_id"]}'
+            pipe.hset(stop_key, bus_id, json.dumps(entry))
+            pipe.expire(stop_key, ttl)
+        if encoded:
+            pipe.set(bus_key, json.dumps(encoded), ex=ttl)
+        else:
+            pipe.delete(bus_key)
+        pipe.execute()
+
+    def for_bus(self, bus_id):
+        value = self.client.get(f'{self.prefix}:bus:{bus_id}')
+        return [self._decode(entry) for entry in json.loads(value)] if value else []
+
+    def for_stop(self, stop_id):
+        values = self.client.hvals(f'{self.prefix}:stop:{stop_id}')
+        return [self._decode(json.loads(value)) for value in values]
+
+    @staticmethod
+    def _decode(entry):
+        entry['eta'] = datetime.fromisoformat(entry['eta'])
+        return entry
+
+class EtaEngine:
+    """Predict arrival at every remaining stop of each active trip.
+
+    Each fix is map-matched to the route to get distance along it, the
+    bus's speed is smoothed, and the remaining segments are costed from
+    the route's historical profile (falling back to the live speed). The
+    predictions are stored by stop and by bus, in Redis when workers share
+    it, so reads never compute and any worker can serve them. Speed and
+    progress are per process, so a bus's fixes must reach one ingest
+    worker (see RedisFanoutStore).
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._profiles = {}
+        self.store = None
+        self._lock = threading.Lock()
+
+    def _configure(self):
+        if self.store is None:
+            with self._lock:
+                if self.store is None:
+                    url = shared_redis_url(current_app.config)
+                    self.store = RedisPredictionStore(url) if url else LocalPredictionStore()
+
+    def process(self, fix, context):
+        """Recompute predictions for the bus that sent the fix."""
+        geometry = context.geometry
+        if not context.trip_id or not geometry or not geometry.segment_count:
+            self.clear(fix.bus_id)
+            return
+
+        config = current_app.config
+        state = self._states.get(fix.bus_id)
+        if state is None or state.trip_id != context.trip_id:
+            self.clear(fix.bus_id)
+            state = _EtaState(context.trip_id)
+            self._states[fix.bus_id] = state
+
+        match = geometry.match(fix.latitude, fix.longitude,
+                               config.get('ETA_MATCH_RADIUS_METERS', 300), hint=state.segment_hint)
+        if match is None:
+            return
+
+        segment, _, along = match
+        state.segment_hint = segment
+        # Never move backwards along the route on GPS jitter
+        state.along = max(along, state.along)
+        self._update_speed(state, fix, config)
+
+        predictions = self._predict(state, fix, context, geometry, config)
+        self._store(fix.bus_id, context, predictions)
+
+    def clear(self, bus_id):
+        """Drop predictions and state for a bus."""
+        self._configure()
+        if self._states.pop(bus_id, None) is not None:
+            self.store.replace(bus_id, [], self._max_age())
+
+    def for_stop(self, stop_id):
+        """Get fresh predictions for a stop, soonest first."""
+        self._configure()
+        fresh = self._fresh(self.store.for_stop(stop_id))
+        return sorted(fresh, key=lambda entry: entry['eta'])
+
+    def for_bus(self, bus_id):
+        """Get fresh predictions for every remaining stop of a bus."""
+        self._configure()
+        return self._fresh(self.store.for_bus(bus_id))
+
+    def invalidate_profile(self, route_id):
+        """Reload a route's traffic pattern on next use."""
+        self._profiles.pop(route_id, None)
+
+    def _max_age(self):
+        return current_app.config.get('ETA_MAX_AGE_SECONDS', 300)
+
+    def _fresh(self, entries):
+        """Filter out predictions not refreshed recently."""
+        max_age = self._max_age()
+        now = time.time()
+        return [entry for entry in entries if now - entry['computed_at'] <= max_age]
+
+    def _update_speed(self, state, fix, config):
+        """Smooth reported or derived speed with an exponential moving average."""
+        speed = None
+        if fix.speed is not None:
+            speed = fix.speed / 3.6
+        elif state.last_timestamp is not None:
+            elapsed = (fix.timestamp - state.last_timestamp).total_seconds()
+            if elapsed > 0:
+                speed = max(state.along - state.last_along, 0.0) / elapsed
+
+        if speed is not None:
+            alpha = config.get('ETA_SPEED_SMOOTHING', 0.3)
+            state.speed = speed if state.speed is None else alpha * speed + (1 - alpha) * state.speed
+
+        state.last_along = state.along
+        state.last_timestamp = fix.timestamp
+
+    def _profile(self, route_id):
+        """Get a route's traffic pattern, cached between fixes."""
+        ttl = current_app.config.get('ETA_PROFILE_TTL_SECONDS', 3600)
+        cached = self._profiles.get(route_id)
+        if cached is None or time.monotonic() - cached[0] > ttl:
+            route = Route.query.get(route_id)
+            cached = (time.monotonic(), route.traffic_pattern if route else None)
+            self._profiles[route_id] = cached
+        return cached[1]
+
+    def _predict(self, state, fix, context, geometry, config):
+        """Cost remaining segments and return arrival predictions."""
+        profile = self._profile(context.route_id)
+        default_speed = config.get('ETA_DEFAULT_SPEED_KMPH', 20) / 3.6
+        live_weight = config.get('ETA_LIVE_SPEED_WEIGHT', 0.5)
+        moving = state.speed is not None and state.speed >= 1.0
+
+        # First stop still ahead of the bus
+        next_index = state.segment_hint + 1
+        while next_index < geometry.stop_count and geometry.cumulative[next_index] <= state.along:
+            next_index += 1
+
+        # Traffic patterns are bucketed in school time
+        local_time = to_school_time(fix.timestamp)
+        predictions = []
+        seconds = 0.0
+        for index in range(next_index, geometry.stop_count):
+            from_index = index - 1
+            length = geometry.cumulative[index] - geometry.cumulative[from_index]
+            remaining = geometry.cumulative[index] - max(state.along, geometry.cumulative[from_index])
+            fraction = remaining / length if length > 0 else 0.0
+
+            departure = local_time + timedelta(seconds=seconds)
+            historical = segment_percentile(profile, geometry.stop_ids[from_index], geometry.stop_ids[index],
+                                            departure.weekday(), departure.hour)
+            if historical is not None:
+                estimate = historical * fraction
+                # Live speed only informs the segment the bus is on
+                if index == next_index and moving:
+                    estimate = live_weight * (remaining / state.speed) + (1 - live_weight) * estimate
+            else:
+                estimate = remaining / (state.speed if moving else default_speed)
+
+            seconds += estimate
+            predictions.append({
+                'stop_id': geometry.stop_ids[index],
+                'stop_order': geometry.stop_orders[index],
+                'seconds': int(seconds),
+                'eta': fix.timestamp + timedelta(seconds=seconds)
+            })
+            seconds += geometry.dwell_seconds[index]
+
+        return predictions
+
+    def _store(self, bus_id, context, predictions):
+        """Replace stored predictions of a bus."""
+        self._configure()
+        # Wall-clock time, so workers can judge freshness of each other's entries
+        computed_at = time.time()
+        self.store.replace(bus_id, [
+            dict(prediction, bus_id=bus_id, trip_id=context.trip_id,
+                 route_id=context.route_id, computed_at=computed_at)
+            for prediction in predictions
+        ], self._max_age())
+
+eta_engine = EtaEngine()
@@ -0,0 +1,208 @@
+import base64
+import json
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+import redis
+from app.services.frame_codec import FrameEncoder
+from app.services.location_pipeline import LocationFix
+from app.services.message_queue import shared_redis_url
+
+# Renew the lease if this worker holds it, else take it if it is free
+_ACQUIRE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+class LocalFanoutStore:
+    """Pending fixes and frame state of the broadcaster, held in memory.
+
+    Used when a single process serves every socket, and with the
+    in-process message queue in tests.
+    """
+
+    def __init__(self, replay_frames=120):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._encoders = {}
+        self._logs = {}
+        self._encoder_lock = threading.Lock()
+        self.replay_frames = replay_frames
+
+    def put(self, fix, rooms):
+        """Record the latest fix of a bus for each room."""
+        with self._lock:
+            for room in rooms:
+                self._pending.setdefault(room, {})[fix.bus_id] = fix
+
+    def take(self):
+        """Remove and return pending fixes as {room: [fix, ...]}."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return {room: list(fixes.values()) for room, fixes in pending.items()}
+
+    def append(self, room, fixes, base_time, updates):
+        """Encode the next frame of a room and add it to the replay log.
+
+        Returns (seq, frame); updates is the JSON form of the same batch.
+        """
+        with self._encoder_lock:
+            encoder = self._encoders.setdefault(room, FrameEncoder())
+            frame = encoder.encode(fixes, base_time)
+            log = self._logs.setdefault(room, deque(maxlen=self.replay_frames))
+            log.append((encoder.seq, frame, updates))
+            return encoder.seq, frame
+
+    def replay(self, room, after_seq):
+        """Get logged (seq, frame, updates) entries after after_seq."""
+        with self._encoder_lock:
+            encoder = self._encoders.get(room)
+            entries = list(self._logs.get(room, ()))
+        return entries_after(entries, encoder.seq if encoder else 0, after_seq)
+
+    def keyframe(self, room, base_time):
+        """Encode the full last-known state of a room."""
+        with self._encoder_lock:
+            encoder = self._encoders.setdefault(room, FrameEncoder())
+            return encoder.keyframe(base_time)
+
+    def acquire_flush(self, ttl_ms):
+        """Every process flushes its own fixes when nothing is shared."""
+        return True
+
+class RedisFanoutStore:
+    """Pending fixes and frame state of the broadcaster, shared in Redis.
+
+    Any worker may publish fixes, but only the worker holding a short
+    lease flushes them, so each room has a single frame sequence no
+    matter how many processes feed it. Frame state lives in Redis so a
+    keyframe can be built by whichever worker a client is connected to.
+
+    This covers the fan-out only: the location processors that run
+    before a fix is published keep per-bus state in process, so every
+    fix of a bus must still reach the same ingest worker (see
+    location_pipeline.process_fix).
+    """
+
+    def __init__(self, url, replay_frames=120, prefix='fleetflow:tracking'):
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self.replay_frames = replay_frames
+        self.token = uuid.uuid4().hex
+        self._acquire_lease = self.client.register_script(_ACQUIRE_LEASE)
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def put(self, fix, rooms):
+        """Record the latest fix of a bus for each room."""
+        packed = json.dumps([
+            fix.bus_id, fix.latitude, fix.longitude, fix.speed,
+            fix.heading, fix.accuracy, fix.timestamp.isoformat()
+        ])
+        pipe = self.client.pipeline()
+        for room in rooms:
+            pipe.hset(self._key('pending', room), fix.bus_id, packed)
+            pipe.sadd(self._key('rooms'), room)
+        pipe.execute()
+
+    def take(self):
+        """Remove and return pending fixes as {room: [fix, ...]}."""
+        rooms = [room.decode() for room in self.client.smembers(self._key('rooms'))]
+        if not rooms:
+            return {}
+
+        pipe = self.client.pipeline()
+        for room in rooms:
+            pipe.hgetall(self._key('pending', room))
+            pipe.delete(self._key('pending', room))
+            pipe.srem(self._key('rooms'), room)
+        results = pipe.execute()
+
+        pending = {}
+        for room, packed in zip(rooms, results[::3]):
+            if packed:
+                pending[room] = [self._unpack(value) for value in packed.values()]
+        return pending
+
+    def _unpack(self, value):
+        bus_id, latitude, longitude, speed, heading, accuracy, timestamp = json.loads(value)
+        return LocationFix(bus_id, latitude, longitude, datetime.fromisoformat(timestamp),
+                           speed=speed, heading=heading, accuracy=accuracy)
+
+    def append(self, room, fixes, base_time, updates):
+        """Encode the next frame of a room from its shared state and log it."""
+        bus_ids = [fix.bus_id for fix in fixes]
+        pipe = self.client.pipeline()
+        pipe.get(self._key('seq', room))
+        pipe.hmget(self._key('frames', room), bus_ids)
+        seq, states = pipe.execute()
+
+        encoder = FrameEncoder.restore(
+            int(seq or 0),
+            {bus_id: state for bus_id, state in zip(bus_ids, states) if state}
+        )
+        frame = encoder.encode(fixes, base_time)
+
+        entry = json.dumps({
+            'seq': encoder.seq,
+            'frame': base64.b64encode(frame).decode(),
+            'updates': updates
+        })
+        pipe = self.client.pipeline()
+        pipe.set(self._key('seq', room), encoder.seq)
+        pipe.hset(self._key('frames', room), mapping=encoder.dump(bus_ids))
+        pipe.rpush(self._key('log', room), entry)
+        pipe.ltrim(self._key('log', room), -self.replay_frames, -1)
+        pipe.execute()
+        return encoder.seq, frame
+
+    def replay(self, room, after_seq):
+        """Get logged (seq, frame, updates) entries after after_seq."""
+        pipe = self.client.pipeline()
+        pipe.get(self._key('seq', room))
+        pipe.lrange(self._key('log', room), 0, -1)
+        seq, logged = pipe.execute()
+
+        entries = []
+        for value in logged:
+            entry = json.loads(value)
+            entries.append((entry['seq'], base64.b64decode(entry['frame']), entry['updates']))
+        return entries_after(entries, int(seq or 0), after_seq)
+
+    def keyframe(self, room, base_time):
+        """Encode the full last-known state of a room."""
+        pipe = self.client.pipeline()
+        pipe.get(self._key('seq', room))
+        pipe.hgetall(self._key('frames', room))
+        seq, states = pipe.execute()
+        return FrameEncoder.restore(int(seq or 0), states).keyframe(base_time)
+
+    def acquire_flush(self, ttl_ms):
+        """Take or renew the flush lease; only its holder flushes."""
+        return bool(self._acquire_lease(keys=[self._key('leader')], args=[self.token, ttl_ms]))
+
+def entries_after(entries, current_seq, after_seq):
+    """Pick the log entries a client at after_seq has missed.
+
+    Returns None when the log no longer reaches back to after_seq, or
+    when after_seq is ahead of the room (the sequence restarted), in
+    which case the client needs a full snapshot instead.
+    """
+    if after_seq == current_seq:
+        return []
+    if after_seq > current_seq or not entries or after_seq < entries[0][0] - 1:
+        return None
+    return [entry for entry in entries if entry[0] > after_seq]
+
+def create_fanout_store(config):
+    """Get the store matching the Socket.IO message queue setting."""
+    url = shared_redis_url(config)
+    replay_frames = config.get('TRACKING_REPLAY_FRAMES', 120)
+    return RedisFanoutStore(url, replay_frames) if url else LocalFanoutStore(replay_frames)
@@ -0,0 +1,146 @@
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from sqlalchemy import case, func, insert, select, tuple_
+from app import db
+from app.models.fee import Fee
+from app.models.fee_monthly import NO_ROUTE, FeeMonthly
+from app.models.student import Student
+from app.utils.sql import insert_adding_counts
+
+# Fee statuses that leave nothing outstanding
+SETTLED_STATUSES = ('Paid', 'Waived')
+
+LEDGER_COLUMNS = ('fee_count', 'billed_amount', 'collected_amount', 'outstanding_amount', 'overdue_amount')
+
+LedgerTotals = namedtuple('LedgerTotals', LEDGER_COLUMNS)
+
+# Stands in for a period without fees
+EMPTY_LEDGER = LedgerTotals(*[0] * len(LEDGER_COLUMNS))
+
+# Route of a fee_monthly row as reported, None for students off route
+ledger_route = func.nullif(FeeMonthly.route_id, NO_ROUTE).label('route_id')
+
+def _amount(value):
+    """Convert a fee amount, possibly a float straight from JSON, to Decimal."""
+    return Decimal(str(value)) if value is not None else Decimal('0')
+
+def ledger_entry(fee):
+    """Get the fee_monthly group of a fee and what it adds to each column.
+
+    Taken before and after a fee is changed so the rollup can move the
+    difference; the route is the student's at the time of the change.
+    """
+    route_id = db.session.query(Student.route_id).filter(Student.id == fee.student_id).scalar() or NO_ROUTE
+    billed = _amount(fee.final_amount) + _amount(fee.late_fee_amount)
+    collected = _amount(fee.paid_amount)
+    outstanding = Decimal('0') if fee.status in SETTLED_STATUSES else max(billed - collected, Decimal('0'))
+    overdue = outstanding if fee.status == 'Overdue' else Decimal('0')
+    return (fee.year, fee.month, fee.academic_year, route_id), (1, billed, collected, outstanding, overdue)
+
+def record_fee_change(before, after):
+    """Move a fee's contribution in fee_monthly from before to after.
+
+    Either side may be None for a created or deleted fee. The update is
+    added to the current session and commits with the fee itself.
+    """
+    deltas = defaultdict(lambda: [0] * len(LEDGER_COLUMNS))
+    for entry, sign in ((before, -1), (after, 1)):
+        if entry is None:
+            continue
+        group, values = entry
+        for i, value in enumerate(values):
+            deltas[group][i] += sign * value
+
+    # A group's first fee is upserted, so two writers creating it at once
+    # cannot collide on its unique key and fail the fee write
+    added = []
+    for (year, month, academic_year, route_id), values in deltas.items():
+        if not any(values):
+            continue
+        if values[0] > 0:
+            added.append(dict(zip(LEDGER_COLUMNS, values), year=year, month=month,
+                              academic_year=academic_year, route_id=route_id))
+            continue
+        FeeMonthly.query.filter(
+            FeeMonthly.year == year,
+            FeeMonthly.month == month,
+            FeeMonthly.academic_year == academic_year,
+            FeeMonthly.route_id == route_id
+        ).update({
+            getattr(FeeMonthly, column): getattr(FeeMonthly, column) + value
+            for column, value in zip(LEDGER_COLUMNS, values)
+        }, synchronize_session=False)
+
+    insert_adding_counts(db.session.connection(), FeeMonthly.__table__, added,
+                         ('year', 'month', 'academic_year', 'route_id'), LEDGER_COLUMNS)
+
+def rebuild_fee_ledger(academic_year=None):
+    """Recompute fee_monthly from fees, for one academic year or all of them.
+
+    Catches up on writes made outside the fee endpoints and on fees
+    that turned overdue without being touched.
+    """
+    delete = FeeMonthly.query
+    if academic_year:
+        delete = delete.filter(FeeMonthly.academic_year == academic_year)
+    delete.delete(synchronize_session=False)
+
+    billed = Fee.final_amount + func.coalesce(Fee.late_fee_amount, 0)
+    paid = func.coalesce(Fee.paid_amount, 0)
+    outstanding = case(
+        (Fee.status.in_(SETTLED_STATUSES), 0),
+        (billed > paid, billed - paid),
+        else_=0
+    )
+    route_id = func.coalesce(Student.route_id, NO_ROUTE)
+    grouped = select(
+        Fee.year, Fee.month, Fee.academic_year, route_id,
+        func.count(Fee.id),
+        func.sum(billed),
+        func.sum(paid),
+        func.sum(outstanding),
+        func.sum(case((Fee.status == 'Overdue', outstanding), else_=0))
+    ).outerjoin(
+        Student, Student.id == Fee.student_id
+    ).group_by(
+        Fee.year, Fee.month, Fee.academic_year, route_id
+    )
+    if academic_year:
+        grouped = grouped.where(Fee.academic_year == academic_year)
+
+    result = db.session.execute(insert(FeeMonthly).from_select(
+        ['year', 'month', 'academic_year', 'route_id'] + list(LEDGER_COLUMNS), grouped
+    ))
+    db.session.commit()
+    return result.rowcount
+
+def ledger_totals(group_by=(), periods=None, academic_year=None, route_id=None):
+    """Sum fee_monthly columns, optionally per group_by columns.
+
+    periods limits the rows to (year, month) pairs. Returns rows with
+    the group_by columns followed by one attribute per ledger column.
+    """
+    query = db.session.query(*group_by, *[
+        func.coalesce(func.sum(getattr(FeeMonthly, column)), 0).label(column)
+        for column in LEDGER_COLUMNS
+    ])
+    if periods:
+        query = query.filter(tuple_(FeeMonthly.year, FeeMonthly.month).in_(periods))
+    if academic_year:
+        query = query.filter(FeeMonthly.academic_year == academic_year)
+    if route_id:
+        query = query.filter(FeeMonthly.route_id == route_id)
+    return query.group_by(*group_by).all() if group_by else query.all()
+
+def ledger_dict(row):
+    """Convert summed ledger columns to JSON-friendly figures."""
+    billed = float(row.billed_amount)
+    collected = float(row.collected_amount)
+    return {
+        'fee_count': int(row.fee_count),
+        'billed_amount': billed,
+        'collected_amount': collected,
+        'outstanding_amount': float(row.outstanding_amount),
+        'overdue_amount': float(row.overdue_amount),
+        'collection_rate': round(collected / billed * 100, 2) if billed > 0 else 0
+    }
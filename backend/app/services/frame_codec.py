@@ -0,0 +1,122 @@
+import calendar
+import struct
+
+FRAME_VERSION = 1
+COORD_SCALE = 100000  # 1e-5 degrees, about 1.1 m
+FLAG_KEYFRAME = 1
+RECORD_ABSOLUTE = 1
+NO_VALUE = 0xFFFF
+
+# version, flags, seq, base seq, base unix time, record count
+_HEADER = struct.Struct('<BBIIIH')
+# kind, bus id, lat, lng, speed (0.1 km/h), heading (degrees), time offset (s)
+_ABSOLUTE = struct.Struct('<BIiiHHh')
+_DELTA = struct.Struct('<BIhhHHh')
+# Last-known values of a bus kept between frames, plus their base time
+_STATE = struct.Struct('<iiHHhI')
+_DELTA_LIMIT = 32767
+
+def quantize(fix, base_time):
+    """Quantize a fix to the integers carried in a frame."""
+    offset = calendar.timegm(fix.timestamp.utctimetuple()) - base_time
+    return (
+        int(round(fix.latitude * COORD_SCALE)),
+        int(round(fix.longitude * COORD_SCALE)),
+        min(int(round(fix.speed * 10)), NO_VALUE - 1) if fix.speed is not None else NO_VALUE,
+        int(round(fix.heading)) % 360 if fix.heading is not None else NO_VALUE,
+        max(-32768, min(32767, offset))
+    )
+
+class FrameEncoder:
+    """Encode location batches of one room as delta binary frames.
+
+    Coordinates are sent as differences from the value the room last
+    sent for the same bus. Each frame names the frame it is based on; a
+    client whose last frame differs must request a keyframe, which
+    carries the room's full last-known state.
+    """
+
+    def __init__(self, seq=0):
+        self.seq = seq
+        self._last = {}  # bus id -> (quantized values, base time)
+
+    @classmethod
+    def restore(cls, seq, packed):
+        """Rebuild an encoder from dump() output kept outside the process."""
+        encoder = cls(seq)
+        for bus_id, state in packed.items():
+            values = _STATE.unpack(state)
+            encoder._last[int(bus_id)] = (values[:5], values[5])
+        return encoder
+
+    def dump(self, bus_ids=None):
+        """Pack last-known values of the given buses, or of every bus."""
+        bus_ids = self._last.keys() if bus_ids is None else bus_ids
+        return {
+            bus_id: _STATE.pack(*self._last[bus_id][0], self._last[bus_id][1])
+            for bus_id in bus_ids if bus_id in self._last
+        }
+
+    def encode(self, fixes, base_time):
+        """Encode a batch as the next delta frame of the room."""
+        base_seq = self.seq
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        records = []
+        for fix in fixes:
+            values = quantize(fix, base_time)
+            previous = self._last.get(fix.bus_id)
+            self._last[fix.bus_id] = (values, base_time)
+            if previous is not None:
+                d_lat = values[0] - previous[0][0]
+                d_lng = values[1] - previous[0][1]
+                if abs(d_lat) <= _DELTA_LIMIT and abs(d_lng) <= _DELTA_LIMIT:
+                    records.append(_DELTA.pack(0, fix.bus_id, d_lat, d_lng, *values[2:]))
+                    continue
+            records.append(_ABSOLUTE.pack(RECORD_ABSOLUTE, fix.bus_id, *values))
+
+        header = _HEADER.pack(FRAME_VERSION, 0, self.seq, base_seq, base_time, len(records))
+        return header + b''.join(records)
+
+    def keyframe(self, base_time):
+        """Encode the last-known state of every bus at the current seq."""
+        records = []
+        for bus_id, (values, sent_base) in self._last.items():
+            offset = max(-32768, min(32767, values[4] + sent_base - base_time))
+            records.append(_ABSOLUTE.pack(RECORD_ABSOLUTE, bus_id, *values[:4], offset))
+        header = _HEADER.pack(FRAME_VERSION, FLAG_KEYFRAME, self.seq, self.seq, base_time, len(records))
+        return header + b''.join(records)
+
+def decode_frame(data, state):
+    """Decode a frame into state, a client-side {bus_id: (lat_q, lng_q)} map.
+
+    Returns (seq, base_seq, updates), where updates are dictionaries in
+    the same shape as the JSON protocol with unix timestamps. Reference
+    implementation for clients and benchmarks.
+    """
+    version, flags, seq, base_seq, base_time, count = _HEADER.unpack_from(data, 0)
+    if version != FRAME_VERSION:
+        raise ValueError(f'Unsupported frame version {version}')
+    if flags & FLAG_KEYFRAME:
+        state.clear()
+
+    updates = []
+    offset = _HEADER.size
+    for _ in range(count):
+        if data[offset] & RECORD_ABSOLUTE:
+            _, bus_id, lat, lng, speed, heading, time_offset = _ABSOLUTE.unpack_from(data, offset)
+            offset += _ABSOLUTE.size
+        else:
+            _, bus_id, d_lat, d_lng, speed, heading, time_offset = _DELTA.unpack_from(data, offset)
+            offset += _DELTA.size
+            lat, lng = state[bus_id]
+            lat, lng = lat + d_lat, lng + d_lng
+        state[bus_id] = (lat, lng)
+        updates.append({
+            'bus_id': bus_id,
+            'latitude': lat / COORD_SCALE,
+            'longitude': lng / COORD_SCALE,
+            'speed': speed / 10 if speed != NO_VALUE else None,
+            'heading': heading if heading != NO_VALUE else None,
+            'timestamp': base_time + time_offset
+        })
+    return seq, base_seq, updates
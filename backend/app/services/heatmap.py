@@ -0,0 +1,159 @@
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from app import db, socketio
+from app.models.bus_location import BusLocation
+from app.models.heatmap_tile import HeatmapTile
+from app.services.location_pipeline import run_after_commit
+from app.utils.sql import insert_adding_counts
+
+def tile_xy(lat, lng, zoom):
+    """Get the slippy-map tile containing a coordinate."""
+    n = 2 ** zoom
+    lat_rad = math.radians(max(min(lat, 85.0511), -85.0511))
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def _tile_coordinates(lats, lngs, zoom):
+    """Vectorized fractional tile coordinates for arrays of fixes."""
+    n = 2 ** zoom
+    lat_rad = np.radians(np.clip(lats, -85.0511, 85.0511))
+    xs = (lngs + 180.0) / 360.0 * n
+    ys = (1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n
+    return np.clip(xs, 0, n - 1e-9), np.clip(ys, 0, n - 1e-9)
+
+class HeatmapAggregator:
+    """Bin live fixes into daily tile counts.
+
+    Counts are buffered in memory and added to heatmap_tiles in one pass
+    every HEATMAP_FLUSH_SECONDS by a background task, so a fix costs a
+    few dictionary updates and a quiet worker still writes out what it
+    holds. A full buffer is flushed early, after the ingest commit. The
+    flush is an upsert in a transaction of its own, so workers never
+    collide on a tile and a failed write keeps the counts buffered for
+    the next flush.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: [0, 0])
+        self._task = None
+        self._app = None
+
+    def process(self, fix, context):
+        """Count one fix in every configured zoom level."""
+        config = current_app.config
+        day = fix.timestamp.date()
+        idle = 1 if fix.speed is not None and fix.speed < config.get('IDLE_SPEED_KMPH', 3) else 0
+        if self._task is None:
+            self._start()
+
+        with self._lock:
+            for zoom in config.get('HEATMAP_ZOOM_LEVELS', (12, 15, 18)):
+                x, y = tile_xy(fix.latitude, fix.longitude, zoom)
+                counts = self._counts[(day, zoom, x, y)]
+                counts[0] += 1
+                counts[1] += idle
+            full = len(self._counts) >= config.get('HEATMAP_FLUSH_SIZE', 5000)
+
+        if full:
+            run_after_commit(self.flush)
+
+    def _start(self):
+        """Start the flush loop on the first counted fix."""
+        with self._lock:
+            if self._task is None:
+                self._app = current_app._get_current_object()
+                self._task = socketio.start_background_task(self._run)
+
+    def _run(self):
+        """Flush buffered counts forever on the configured interval."""
+        interval = self._app.config.get('HEATMAP_FLUSH_SECONDS', 30)
+        while True:
+            socketio.sleep(interval)
+            with self._app.app_context():
+                self.flush()
+
+    def flush(self):
+        """Add buffered counts to the tile table, keeping them if the write fails."""
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(lambda: [0, 0])
+        if not counts:
+            return
+
+        rows = [
+            {'day': day, 'zoom': zoom, 'tile_x': x, 'tile_y': y, 'fix_count': fixes, 'idle_count': idle}
+            for (day, zoom, x, y), (fixes, idle) in counts.items()
+        ]
+        try:
+            with db.engine.begin() as connection:
+                insert_adding_counts(connection, HeatmapTile.__table__, rows,
+                                     ('day', 'zoom', 'tile_x', 'tile_y'), ('fix_count', 'idle_count'))
+        except Exception as e:
+            current_app.logger.warning(f'Heatmap flush failed, keeping {len(rows)} tiles buffered: {e}')
+            with self._lock:
+                for key, (fixes, idle) in counts.items():
+                    buffered = self._counts[key]
+                    buffered[0] += fixes
+                    buffered[1] += idle
+
+heatmap_aggregator = HeatmapAggregator()
+
+def rebuild_heatmap_day(day, chunk_size=50000):
+    """Recompute one day of tiles from bus_locations.
+
+    Rows are streamed in chunks and binned with numpy.histogram2d, then
+    the day's tiles are replaced. Used nightly to repair counts lost from
+    a worker's in-memory buffer and to backfill history.
+
+    Live workers keep adding to a day until its last buffers are flushed,
+    which would count those fixes twice, so a day (UTC, like the fixes)
+    can only be rebuilt once HEATMAP_FLUSH_SECONDS have passed after it.
+    """
+    config = current_app.config
+    settled_at = datetime.combine(day + timedelta(days=1), datetime.min.time()) + \
+        timedelta(seconds=config.get('HEATMAP_FLUSH_SECONDS', 30))
+    if datetime.utcnow() < settled_at:
+        raise ValueError(f'{day} is still receiving live heatmap counts; rebuild it after {settled_at}')
+    zooms = config.get('HEATMAP_ZOOM_LEVELS', (12, 15, 18))
+    idle_speed = config.get('IDLE_SPEED_KMPH', 3)
+    start = datetime.combine(day, datetime.min.time())
+    totals = {zoom: defaultdict(lambda: [0, 0]) for zoom in zooms}
+
+    stmt = select(
+        BusLocation.latitude, BusLocation.longitude, BusLocation.speed
+    ).where(
+        BusLocation.timestamp >= start,
+        BusLocation.timestamp < start + timedelta(days=1)
+    ).execution_options(yield_per=chunk_size)
+
+    for rows in db.session.execute(stmt).partitions():
+        lats = np.array([float(r.latitude) for r in rows])
+        lngs = np.array([float(r.longitude) for r in rows])
+        idle = np.array([r.speed is not None and r.speed < idle_speed for r in rows])
+
+        for zoom in zooms:
+            xs, ys = _tile_coordinates(lats, lngs, zoom)
+            x_edges = np.arange(np.floor(xs.min()), np.floor(xs.max()) + 2)
+            y_edges = np.arange(np.floor(ys.min()), np.floor(ys.max()) + 2)
+            fixes, _, _ = np.histogram2d(xs, ys, bins=[x_edges, y_edges])
+            idles, _, _ = np.histogram2d(xs[idle], ys[idle], bins=[x_edges, y_edges])
+
+            for i, j in zip(*np.nonzero(fixes)):
+                counts = totals[zoom][(int(x_edges[i]), int(y_edges[j]))]
+                counts[0] += int(fixes[i, j])
+                counts[1] += int(idles[i, j])
+
+    HeatmapTile.query.filter_by(day=day).delete()
+    db.session.bulk_insert_mappings(HeatmapTile, [
+        {'day': day, 'zoom': zoom, 'tile_x': x, 'tile_y': y, 'fix_count': fixes, 'idle_count': idle}
+        for zoom, tiles in totals.items()
+        for (x, y), (fixes, idle) in tiles.items()
+    ])
+    db.session.commit()
+    return sum(len(tiles) for tiles in totals.values())
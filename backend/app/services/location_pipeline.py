@@ -0,0 +1,153 @@
+import time
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db, socketio
+from app.models.bus import Bus
+from app.models.trip import Trip
+from app.services.route_geometry import get_route_geometry
+
+# Both spellings are written by the API today
+ACTIVE_TRIP_STATUSES = ('In Progress', 'in_progress')
+
+_context_cache = {}
+
+# session.info key of callbacks waiting for the ingest commit
+_AFTER_COMMIT = 'location_pipeline_after_commit'
+
+class LocationFix:
+    """A single GPS fix flowing through the location pipeline."""
+    __slots__ = ('bus_id', 'latitude', 'longitude', 'speed', 'heading', 'accuracy', 'timestamp')
+
+    def __init__(self, bus_id, latitude, longitude, timestamp, speed=None, heading=None, accuracy=None):
+        self.bus_id = bus_id
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.timestamp = timestamp
+        self.speed = float(speed) if speed is not None else None
+        self.heading = float(heading) if heading is not None else None
+        self.accuracy = float(accuracy) if accuracy is not None else None
+
+class BusContext:
+    """Active trip and route of a bus, cached between fixes."""
+    __slots__ = ('bus_id', 'trip_id', 'route_id', 'loaded_at')
+
+    def __init__(self, bus_id, trip_id, route_id):
+        self.bus_id = bus_id
+        self.trip_id = trip_id
+        self.route_id = route_id
+        self.loaded_at = time.monotonic()
+
+    @property
+    def geometry(self):
+        """Get geometry of the route the bus is running."""
+        return get_route_geometry(self.route_id)
+
+def load_bus_context(bus_id):
+    """Resolve the active trip and route of a bus."""
+    trip = Trip.query.filter(
+        Trip.bus_id == bus_id,
+        Trip.status.in_(ACTIVE_TRIP_STATUSES)
+    ).order_by(Trip.id.desc()).first()
+
+    if trip:
+        return BusContext(bus_id, trip.id, trip.route_id)
+
+    bus = Bus.query.get(bus_id)
+    return BusContext(bus_id, None, bus.route_id if bus else None)
+
+def get_bus_context(bus_id):
+    """Get cached context for a bus, reloading it when stale."""
+    ttl = current_app.config.get('TRACKING_CONTEXT_TTL_SECONDS', 60)
+    context = _context_cache.get(bus_id)
+    if context is None or time.monotonic() - context.loaded_at > ttl:
+        context = load_bus_context(bus_id)
+        _context_cache[bus_id] = context
+    return context
+
+def invalidate_bus_context(bus_id):
+    """Drop cached context after a trip or assignment change."""
+    _context_cache.pop(bus_id, None)
+
+def get_processors():
+    """Get fix processors in the order they must run."""
+    from app.services.stop_detector import stop_detector
+    from app.services.deviation_detector import deviation_detector
+    from app.services.heatmap import heatmap_aggregator
+    from app.services.eta_engine import eta_engine
+    from app.services.proximity_triggers import proximity_trigger_engine
+    from app.services.driving_events import driving_event_detector
+    from app.services.odometry import trip_odometer
+    from app.services.bus_snapshots import bus_snapshots
+    return [
+        stop_detector.process,
+        deviation_detector.process,
+        heatmap_aggregator.process,
+        eta_engine.process,
+        proximity_trigger_engine.process,
+        driving_event_detector.process,
+        trip_odometer.process,
+        bus_snapshots.process,
+    ]
+
+def process_fix(fix):
+    """Run a fix through every processor in the pipeline.
+
+    Processors add their writes to the current session, so they are
+    committed together with the fix by the calling endpoint.
+
+    Ingest is bus-affine: the processors keep per-bus state (stop and
+    deviation runs, speed, debounce windows, odometer anchor, heatmap
+    buffer) in the process, so all fixes of a bus must be sent to one
+    worker, e.g. by running location ingest in a single process or
+    hashing on bus_id at the proxy. What they publish (stop visits, trip
+    events, trip distance, ETAs, snapshots, heatmap tiles) is stored in
+    the database or Redis and can be read from any worker.
+    """
+    context = get_bus_context(fix.bus_id)
+    for processor in get_processors():
+        try:
+            processor(fix, context)
+        except Exception as e:
+            current_app.logger.warning(f'Location processor failed for bus {fix.bus_id}: {e}')
+    return context
+
+def run_after_commit(callback, *args, **kwargs):
+    """Call callback once the current transaction commits.
+
+    A callback already queued with the same arguments is not queued
+    again, and everything queued is dropped if the transaction does
+    not commit.
+    """
+    pending = db.session.info.setdefault(_AFTER_COMMIT, [])
+    entry = (callback, args, kwargs)
+    if entry not in pending:
+        pending.append(entry)
+
+def emit_after_commit(event_name, data, room):
+    """Emit a socket event once the current transaction commits.
+
+    Processors use this for rows they just wrote, so clients never see
+    an id the ingest transaction might still roll back.
+    """
+    run_after_commit(socketio.emit, event_name, data, room=room)
+
+def _run_pending(session):
+    """Run the callbacks queued by a transaction that committed."""
+    for callback, args, kwargs in session.info.pop(_AFTER_COMMIT, ()):
+        try:
+            callback(*args, **kwargs)
+        except Exception as e:
+            current_app.logger.warning(f'Post-commit location callback failed: {e}')
+
+def _drop_pending(session, transaction):
+    """Forget callbacks left queued when the outermost transaction ends without committing."""
+    if transaction.parent is None:
+        session.info.pop(_AFTER_COMMIT, None)
+
+def init_app(app):
+    """Run queued processor callbacks when their transaction commits."""
+    if event.contains(Session, 'after_commit', _run_pending):
+        return
+    event.listen(Session, 'after_commit', _run_pending)
+    event.listen(Session, 'after_transaction_end', _drop_pending)
@@ -0,0 +1,57 @@
+import weakref
+import socketio as python_socketio
+
+class InProcessQueueManager(python_socketio.Manager):
+    """Message queue stand-in that links Socket.IO servers in one process.
+
+    Every emit is repeated on the other servers sharing the channel, the
+    way a pub/sub backend would repeat it on other workers. Unlike the
+    pub/sub managers it works with the Flask-SocketIO test client.
+    Peers are held weakly, so a server leaves its channel once its app
+    is discarded.
+    """
+    _peers = {}
+
+    def __init__(self, channel='socketio'):
+        super().__init__()
+        self.channel = channel
+        self._peers.setdefault(channel, weakref.WeakSet()).add(self)
+
+    def emit(self, event, data, namespace=None, room=None, skip_sid=None, callback=None, to=None, **kwargs):
+        room = to or room
+        namespace = namespace or '/'
+        result = super().emit(event, data, namespace, room=room, skip_sid=skip_sid, callback=callback)
+        if not kwargs.get('ignore_queue'):
+            for peer in list(self._peers[self.channel]):
+                if peer is not self and peer.server is not None:
+                    peer.emit(event, data, namespace, room=room, skip_sid=skip_sid, ignore_queue=True)
+        return result
+
+def socketio_queue_options(config):
+    """Get SocketIO.init_app options for the configured message queue.
+
+    SOCKETIO_MESSAGE_QUEUE may be empty (single process), 'redis' to use
+    REDIS_URL, a redis:// URL, or 'memory' for the in-process stand-in.
+    Other python-socketio queues are refused: frame sequences, replay
+    logs and ETAs are shared through the same Redis, and without it
+    each worker would keep its own.
+    """
+    backend = config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = config.get('SOCKETIO_CHANNEL', 'fleetflow')
+    if not backend:
+        return {}
+    if backend == 'memory':
+        return {'client_manager': InProcessQueueManager(channel=channel)}
+    url = shared_redis_url(config)
+    if url is None:
+        raise ValueError(f"SOCKETIO_MESSAGE_QUEUE must be 'redis' or a redis:// URL, not {backend!r}")
+    return {'message_queue': url, 'channel': channel}
+
+def shared_redis_url(config):
+    """Get the Redis URL shared by all workers, or None for one process."""
+    backend = config.get('SOCKETIO_MESSAGE_QUEUE')
+    if backend == 'redis':
+        return config['REDIS_URL']
+    if backend and backend.startswith(('redis://', 'rediss://')):
+        return backend
+    return None
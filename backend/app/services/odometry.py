@@ -0,0 +1,75 @@
+from flask import current_app
+from sqlalchemy import func
+from app.models.trip import Trip
+from app.utils.geo import haversine_meters
+
+class _OdometerState:
+    """Anchor fix of the active trip of a bus."""
+    __slots__ = ('trip_id', 'anchor_lat', 'anchor_lng', 'anchor_at')
+
+    def __init__(self, trip_id):
+        self.trip_id = trip_id
+        self.anchor_lat = None
+        self.anchor_lng = None
+        self.anchor_at = None
+
+class TripOdometer:
+    """Accumulate great-circle distance per active trip from live fixes.
+
+    Distance is measured from an anchor fix that only moves once the bus
+    has clearly left it, so GPS jitter while parked does not add up and a
+    slow crawl is still counted. Fixes with poor accuracy or an implied
+    speed no bus can reach are ignored.
+
+    Each counted step is added to Trip.total_distance in the ingest
+    transaction, so the total survives restarts and can be read by any
+    worker; only the anchor is kept in memory.
+    """
+
+    def __init__(self):
+        self._states = {}
+
+    def process(self, fix, context):
+        """Add the distance since the anchor fix to the trip total."""
+        if not context.trip_id:
+            return
+
+        state = self._states.get(fix.bus_id)
+        if state is None or state.trip_id != context.trip_id:
+            state = _OdometerState(context.trip_id)
+            self._states[fix.bus_id] = state
+
+        config = current_app.config
+        if fix.accuracy is not None and fix.accuracy > config.get('ODOMETRY_MAX_ACCURACY_METERS', 50):
+            return
+
+        if state.anchor_at is None:
+            self._anchor(state, fix)
+            return
+
+        elapsed = (fix.timestamp - state.anchor_at).total_seconds()
+        if elapsed <= 0:
+            return
+
+        step = haversine_meters(state.anchor_lat, state.anchor_lng, fix.latitude, fix.longitude)
+        if step < max(config.get('ODOMETRY_MIN_STEP_METERS', 15), fix.accuracy or 0):
+            return
+        if step / elapsed * 3.6 > config.get('ODOMETRY_MAX_SPEED_KMPH', 120):
+            return
+
+        Trip.query.filter_by(id=state.trip_id).update({
+            'total_distance': func.coalesce(Trip.total_distance, 0) + step / 1000
+        }, synchronize_session=False)
+        self._anchor(state, fix)
+
+    def _anchor(self, state, fix):
+        """Measure the next step from this fix."""
+        state.anchor_lat = fix.latitude
+        state.anchor_lng = fix.longitude
+        state.anchor_at = fix.timestamp
+
+    def reset(self, bus_id):
+        """Forget the anchor of a bus once its trip ends."""
+        self._states.pop(bus_id, None)
+
+trip_odometer = TripOdometer()
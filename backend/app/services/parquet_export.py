@@ -0,0 +1,159 @@
+import json
+import os
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import types
+from app import db
+from app.models.attendance import Attendance
+from app.models.bus_location import BusLocation
+from app.models.fee import Fee
+from app.models.trip import Trip
+from app.services.trends import next_bucket
+
+# Table name -> (model, column whose month places a row in a partition)
+EXPORT_TABLES = {
+    'trips': (Trip, Trip.trip_date),
+    'attendance': (Attendance, Attendance.date),
+    'fees': (Fee, None),  # billed month, from the year and month columns
+    'locations': (BusLocation, BusLocation.timestamp)
+}
+
+def _arrow_type(column_type):
+    """Get the Arrow type a SQLAlchemy column is written as."""
+    if isinstance(column_type, types.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, types.Integer):
+        return pa.int64()
+    if isinstance(column_type, types.Float):
+        return pa.float64()
+    if isinstance(column_type, types.Numeric):
+        return pa.decimal128(column_type.precision or 18, column_type.scale or 0)
+    if isinstance(column_type, types.DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, types.Date):
+        return pa.date32()
+    if isinstance(column_type, types.Time):
+        return pa.time64('us')
+    return pa.string()
+
+def _converter(column_type):
+    """Get a function turning a column value into what its Arrow type accepts."""
+    if isinstance(column_type, types.JSON):
+        return lambda value: None if value is None else json.dumps(value)
+    if _arrow_type(column_type) == pa.string() and not isinstance(column_type, types.String):
+        return lambda value: None if value is None else str(value)
+    return None
+
+def export_schema(model):
+    """Get the Arrow schema of a model's table."""
+    return pa.schema([(column.name, _arrow_type(column.type)) for column in model.__table__.columns])
+
+class _PartitionWriter:
+    """Rows of one month of one table, written to Parquet in row groups."""
+
+    def __init__(self, path, schema, row_group_size):
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.rows = []
+        self.count = 0
+        self._writer = None
+
+    def append(self, row):
+        """Buffer a row, writing a row group once enough are buffered."""
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as one row group."""
+        if not self.rows:
+            return
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._writer = pq.ParquetWriter(self.path + '.tmp', self.schema, compression='snappy')
+        columns = list(zip(*self.rows))
+        self._writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema
+        ))
+        self.count += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        """Finish the file and move it over any earlier export of the month."""
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.replace(self.path + '.tmp', self.path)
+
+    def discard(self):
+        """Drop a file left unfinished by a failed export."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.remove(self.path + '.tmp')
+
+def export_table(name, start_month, end_month, out_dir, chunk_size=10000):
+    """Write one table's rows for the months in range to Parquet.
+
+    Rows are streamed from a single scan in chunks of chunk_size and
+    written to out_dir/<name>/period=YYYY-MM/<name>-YYYY-MM.parquet, so
+    the directory reads back as a month-partitioned dataset. Exporting
+    a month again replaces its file. Returns {month: row count}.
+    """
+    model, time_column = EXPORT_TABLES[name]
+    table = model.__table__
+    schema = export_schema(model)
+    converters = [_converter(column.type) for column in table.columns]
+    last_day = next_bucket(end_month.replace(day=1), 'month')
+
+    query = db.select(table)
+    if time_column is None:
+        period = table.c.year * 12 + table.c.month
+        query = query.where(
+            period >= start_month.year * 12 + start_month.month,
+            period <= end_month.year * 12 + end_month.month
+        )
+        def month_of(row):
+            return row.year, row.month
+    else:
+        start = start_month.replace(day=1)
+        if isinstance(time_column.type, types.DateTime):
+            start = datetime.combine(start, datetime.min.time())
+            last_day = datetime.combine(last_day, datetime.min.time())
+        query = query.where(time_column >= start, time_column < last_day)
+        def month_of(row):
+            value = row._mapping[time_column.key]
+            return value.year, value.month
+
+    writers = {}
+    try:
+        result = db.session.execute(query.execution_options(yield_per=chunk_size))
+        for rows in result.partitions():
+            for row in rows:
+                month = month_of(row)
+                writer = writers.get(month)
+                if writer is None:
+                    label = f'{month[0]:04d}-{month[1]:02d}'
+                    writer = writers[month] = _PartitionWriter(
+                        os.path.join(out_dir, name, f'period={label}', f'{name}-{label}.parquet'),
+                        schema, chunk_size
+                    )
+                writer.append(tuple(
+                    convert(value) if convert else value for convert, value in zip(converters, row)
+                ))
+        for writer in writers.values():
+            writer.close()
+    except Exception:
+        for writer in writers.values():
+            writer.discard()
+        raise
+
+    return {f'{year:04d}-{month:02d}': writer.count for (year, month), writer in sorted(writers.items())}
+
+def export_tables(names, start_month, end_month, out_dir, chunk_size=10000):
+    """Export several tables; returns {table: {month: row count}}."""
+    return {name: export_table(name, start_month, end_month, out_dir, chunk_size) for name in names}
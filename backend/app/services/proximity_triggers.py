@@ -0,0 +1,159 @@
+import time
+from flask import current_app
+from app import db
+from app.models.bus import Bus
+from app.models.notification import Notification
+from app.models.route import RouteStop
+from app.models.student import Student
+from app.models.user import User
+from app.services.eta_engine import eta_engine
+from app.utils.sql import insert_ignoring_duplicates
+
+TEMPLATE_NAME = 'bus_approaching'
+
+class ProximityTriggerEngine:
+    """Notify parents when their bus is a few minutes from the pickup stop.
+
+    For each route, the stops that have subscribed students are indexed
+    once with their lead times. A fix is then only checked against the
+    cached ETA of its trip's upcoming subscribed stops, and a crossed
+    threshold inserts the notifications for all of that stop's students
+    in a single batch, at most once per trip.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self._fired = {}
+
+    def process(self, fix, context):
+        """Fire thresholds crossed by the latest ETA predictions."""
+        if not context.trip_id or not context.route_id:
+            self._fired.pop(fix.bus_id, None)
+            return
+
+        index = self._route_index(context.route_id)
+        if not index:
+            return
+
+        trip_id, fired = self._fired.get(fix.bus_id, (None, None))
+        if trip_id != context.trip_id:
+            fired = set()
+            self._fired[fix.bus_id] = (context.trip_id, fired)
+
+        for prediction in eta_engine.for_bus(fix.bus_id):
+            stop = index.get(prediction['stop_id'])
+            if not stop:
+                continue
+
+            crossed = [lead for lead in stop['lead_seconds']
+                       if prediction['seconds'] <= lead and (stop['stop_id'], lead) not in fired]
+            if not crossed:
+                continue
+
+            # Bus may first be seen inside several thresholds; notify once, with the nearest
+            fired.update((stop['stop_id'], lead) for lead in crossed)
+            self._enqueue(fix.bus_id, context.trip_id, stop, min(crossed), prediction)
+
+    def invalidate_route(self, route_id):
+        """Rebuild a route's subscriber index on next use."""
+        self._indexes.pop(route_id, None)
+
+    def _route_index(self, route_id):
+        """Get subscribed stops of a route, keyed by stop id."""
+        ttl = current_app.config.get('PROXIMITY_INDEX_TTL_SECONDS', 300)
+        cached = self._indexes.get(route_id)
+        if cached is None or time.monotonic() - cached[0] > ttl:
+            cached = (time.monotonic(), self._build_index(route_id))
+            self._indexes[route_id] = cached
+        return cached[1]
+
+    def _build_index(self, route_id):
+        """Group the parents of a route's active students by pickup stop."""
+        lead_seconds = sorted((minutes * 60 for minutes in
+                               current_app.config.get('PROXIMITY_LEAD_MINUTES', (10, 5))), reverse=True)
+
+        rows = db.session.query(Student, RouteStop.stop_name).join(
+            RouteStop, RouteStop.id == Student.pickup_stop_id
+        ).filter(
+            Student.route_id == route_id,
+            Student.is_active == True,
+            Student.transport_status == 'Active'
+        ).all()
+
+        # Parent accounts are matched on the student's parent email, as
+        # for live tracking subscriptions
+        emails = {student.parent_email for student, _ in rows if student.parent_email}
+        parents = {}
+        if emails:
+            for user in User.query.filter(User.role == 'parent', User.is_active == True,
+                                          User.email.in_(emails)):
+                parents.setdefault(user.email, []).append(user.id)
+
+        index = {}
+        for student, stop_name in rows:
+            # Without a parent account, SMS or email can still reach the parent
+            parent_ids = parents.get(student.parent_email) or (
+                [None] if student.parent_phone or student.parent_email else [])
+            if not parent_ids:
+                continue
+            stop = index.setdefault(student.pickup_stop_id, {
+                'stop_id': student.pickup_stop_id,
+                'stop_name': stop_name,
+                'lead_seconds': lead_seconds,
+                'subscribers': []
+            })
+            for parent_id in parent_ids:
+                stop['subscribers'].append({
+                    'student_id': student.id,
+                    'user_id': parent_id,
+                    'parent_phone': student.parent_phone,
+                    'parent_email': student.parent_email
+                })
+        return index
+
+    def _enqueue(self, bus_id, trip_id, stop, lead, prediction):
+        """Insert pending notifications for every subscriber of a stop."""
+        bus = Bus.query.get(bus_id)
+        bus_number = bus.bus_number if bus else bus_id
+        minutes = max(round(prediction['seconds'] / 60), 1)
+
+        rows = []
+        for subscriber in stop['subscribers']:
+            if subscriber['parent_phone']:
+                notification_type = 'SMS'
+            elif subscriber['parent_email']:
+                notification_type = 'Email'
+            else:
+                notification_type = 'In-App'
+
+            rows.append({
+                'user_id': subscriber['user_id'],
+                'title': 'Bus arriving soon',
+                'message': f"Bus {bus_number} is about {minutes} minutes from {stop['stop_name']}",
+                'notification_type': notification_type,
+                'category': 'General',
+                'target_type': 'Individual',
+                'target_id': subscriber['student_id'],
+                'recipient_phone': subscriber['parent_phone'],
+                'recipient_email': subscriber['parent_email'],
+                'status': 'Pending',
+                'priority': 'High',
+                'template_name': TEMPLATE_NAME,
+                'template_data': {
+                    'bus_id': bus_id,
+                    'bus_number': bus_number,
+                    'trip_id': trip_id,
+                    'stop_id': stop['stop_id'],
+                    'stop_name': stop['stop_name'],
+                    'lead_minutes': lead // 60,
+                    'eta': prediction['eta'].isoformat()
+                },
+                'dedupe_key': (f"approach:{trip_id}:{stop['stop_id']}:{lead}:"
+                               f"{subscriber['student_id']}:{subscriber['user_id'] or 0}")
+            })
+
+        # A second worker, or this one after a restart, may already have
+        # queued some of them; the unique dedupe_key drops those rows
+        insert_ignoring_duplicates(db.session, Notification.__table__, rows)
+
+proximity_trigger_engine = ProximityTriggerEngine()
@@ -0,0 +1,422 @@
+import json
+from datetime import date, timedelta
+import pandas as pd
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models.attendance_daily import UNASSIGNED_CLASS, AttendanceDaily
+from app.models.bus import Bus
+from app.models.driver import Driver
+from app.models.fee_monthly import FeeMonthly
+from app.models.maintenance import Maintenance
+from app.models.route import Route
+from app.models.student import Student
+from app.models.trip import Trip
+from app.models.user import User
+from app.services.attendance_rollup import attendance_rate, present_count, rollup_filters
+from app.services.driving_events import DRIVING_EVENT_TYPES, driving_event_summary
+from app.services.fee_ledger import ledger_dict, ledger_route, ledger_totals
+from app.services.trends import bucket_range, months_before
+
+# Maintenance types counted as incidents rather than planned work
+INCIDENT_MAINTENANCE_TYPES = ('Breakdown', 'Emergency')
+
+TRIP_COLUMNS = ('trip_id', 'trip_date', 'bus_id', 'route_id', 'driver_id', 'status',
+                'scheduled_start', 'scheduled_end', 'actual_start', 'actual_end',
+                'delay_minutes', 'distance', 'fuel', 'boarded', 'capacity')
+
+MAINTENANCE_COLUMNS = ('maintenance_id', 'bus_id', 'maintenance_type', 'status', 'day',
+                       'cost', 'downtime_hours', 'description')
+
+def _frame(rows, columns):
+    """Load query rows into a DataFrame with the given column names."""
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+def _rates(part, whole):
+    """Rounded percentages of two Series, 0 where whole is 0."""
+    return (part / whole.where(whole != 0) * 100).fillna(0).round(2)
+
+def _records(frame):
+    """Convert a DataFrame to JSON-friendly dicts (NaN becomes None)."""
+    return json.loads(frame.to_json(orient='records'))
+
+def _names(model, label, ids):
+    """Get {id: label} for the given ids of a model."""
+    ids = [int(i) for i in ids if pd.notna(i)]
+    if not ids:
+        return {}
+    return dict(db.session.query(model.id, label).filter(model.id.in_(ids)).all())
+
+def _trip_frame(start_date, end_date):
+    """Load one row per trip run in the period, with derived measures.
+
+    Adds actual and scheduled minutes, occupancy against bus capacity
+    and whether a completed trip ran within REPORTS_ON_TIME_MINUTES.
+    """
+    rows = db.session.query(
+        Trip.id, Trip.trip_date, Trip.bus_id, Trip.route_id, Trip.driver_id, Trip.status,
+        Trip.scheduled_start_time, Trip.scheduled_end_time, Trip.actual_start_time, Trip.actual_end_time,
+        Trip.delay_minutes,
+        func.coalesce(Trip.end_odometer - Trip.start_odometer, Trip.total_distance),
+        Trip.fuel_consumed, Trip.total_students_boarded, Bus.capacity
+    ).outerjoin(Bus, Bus.id == Trip.bus_id).filter(
+        Trip.trip_date >= start_date,
+        Trip.trip_date <= end_date,
+        Trip.status != 'Cancelled'
+    ).all()
+
+    trips = _frame(rows, TRIP_COLUMNS)
+    for column in ('delay_minutes', 'distance', 'fuel', 'boarded', 'capacity'):
+        trips[column] = pd.to_numeric(trips[column], errors='coerce')
+    trips['actual_minutes'] = (pd.to_datetime(trips.actual_end) - pd.to_datetime(trips.actual_start)).dt.total_seconds() / 60
+    trips['scheduled_minutes'] = (pd.to_datetime(trips.scheduled_end) - pd.to_datetime(trips.scheduled_start)).dt.total_seconds() / 60
+    trips['completed'] = trips.status == 'Completed'
+    on_time_minutes = current_app.config.get('REPORTS_ON_TIME_MINUTES', 5)
+    trips['on_time'] = trips.completed & (trips.delay_minutes.fillna(0) <= on_time_minutes)
+    trips['delayed'] = trips.completed & ~trips.on_time
+    trips['occupancy'] = trips.boarded / trips.capacity.where(trips.capacity > 0) * 100
+    return trips
+
+def _trip_stats(trips, key):
+    """Aggregate the trip frame per key into trip, distance, fuel and punctuality figures."""
+    stats = trips.groupby(key).agg(
+        total_trips=('trip_id', 'count'),
+        completed_trips=('completed', 'sum'),
+        on_time_trips=('on_time', 'sum'),
+        delayed_trips=('delayed', 'sum'),
+        total_distance=('distance', 'sum'),
+        fuel_consumed=('fuel', 'sum'),
+        average_occupancy=('occupancy', 'mean'),
+        average_trip_time=('actual_minutes', 'mean'),
+        scheduled_time=('scheduled_minutes', 'mean')
+    )
+    stats['on_time_percentage'] = _rates(stats.on_time_trips, stats.completed_trips)
+    stats['delay_frequency'] = _rates(stats.delayed_trips, stats.completed_trips)
+    stats['fuel_efficiency'] = (stats.total_distance / stats.fuel_consumed.where(stats.fuel_consumed > 0)).round(2)
+    return stats.round({'total_distance': 1, 'fuel_consumed': 1, 'average_occupancy': 1,
+                        'average_trip_time': 1, 'scheduled_time': 1})
+
+def _maintenance_frame(start_date, end_date):
+    """Load maintenance done (or scheduled) in the period, dated by when it happened."""
+    day = func.coalesce(Maintenance.actual_date, Maintenance.scheduled_date)
+    rows = db.session.query(
+        Maintenance.id, Maintenance.bus_id, Maintenance.maintenance_type, Maintenance.status, day,
+        Maintenance.total_cost, Maintenance.actual_duration, Maintenance.description
+    ).filter(day >= start_date, day <= end_date).all()
+
+    maintenance = _frame(rows, MAINTENANCE_COLUMNS)
+    maintenance['cost'] = pd.to_numeric(maintenance.cost, errors='coerce').fillna(0)
+    maintenance['downtime_hours'] = pd.to_numeric(maintenance.downtime_hours, errors='coerce')
+    maintenance['month'] = pd.to_datetime(maintenance.day).dt.strftime('%Y-%m')
+    maintenance['incident'] = maintenance.maintenance_type.isin(INCIDENT_MAINTENANCE_TYPES)
+    return maintenance
+
+def _bus_utilization(trips, maintenance):
+    """Per-bus trips, distance, occupancy, fuel efficiency and maintenance cost."""
+    buses = _frame(
+        db.session.query(Bus.id, Bus.bus_number, Bus.capacity).filter(Bus.is_active.is_(True)).all(),
+        ('bus_id', 'bus_number', 'capacity')
+    ).set_index('bus_id')
+    costs = maintenance.groupby('bus_id').agg(
+        maintenance_cost=('cost', 'sum'),
+        downtime_hours=('downtime_hours', 'sum')
+    )
+    utilization = buses.join(_trip_stats(trips, 'bus_id'), how='outer').join(costs, how='left')
+    counts = ['total_trips', 'completed_trips', 'on_time_trips', 'delayed_trips',
+              'total_distance', 'maintenance_cost', 'downtime_hours']
+    utilization[counts] = utilization[counts].fillna(0)
+    return utilization.reset_index().sort_values('bus_number', na_position='last')
+
+def attendance_report(start_date, end_date):
+    """Attendance over the period, overall and per month, class, route and bus.
+
+    Read from the attendance_daily rollup in one grouped query; the
+    breakdowns are pandas group-bys over that small frame.
+    """
+    rows = db.session.query(
+        AttendanceDaily.date, AttendanceDaily.class_name, AttendanceDaily.route_id, AttendanceDaily.bus_id,
+        present_count(), func.coalesce(func.sum(AttendanceDaily.record_count), 0)
+    ).filter(
+        *rollup_filters(start_date, end_date)
+    ).group_by(
+        AttendanceDaily.date, AttendanceDaily.class_name, AttendanceDaily.route_id, AttendanceDaily.bus_id
+    ).all()
+    attendance = _frame(rows, ('date', 'class_name', 'route_id', 'bus_id', 'present', 'total'))
+    attendance[['present', 'total']] = attendance[['present', 'total']].astype(int)
+    attendance['month'] = pd.to_datetime(attendance.date).dt.strftime('%Y-%m')
+
+    students = _frame(db.session.query(
+        Student.class_name, Student.route_id, Student.bus_id, func.count(Student.id)
+    ).filter(Student.is_active.is_(True)).group_by(
+        Student.class_name, Student.route_id, Student.bus_id
+    ).all(), ('class_name', 'route_id', 'bus_id', 'students'))
+    students['class_name'] = students.class_name.fillna(UNASSIGNED_CLASS)
+
+    def breakdown(key):
+        grouped = attendance.groupby(key)[['present', 'total']].sum().join(
+            students.groupby(key)['students'].sum().rename('total_students'), how='outer'
+        ).fillna(0)
+        grouped['average_attendance'] = _rates(grouped.present, grouped.total)
+        return grouped.rename(columns={'present': 'present_count', 'total': 'total_records'}).reset_index()
+
+    daily = attendance.groupby('date')[['present', 'total']].sum()
+    daily['rate'] = _rates(daily.present, daily.total)
+    present, total = int(daily.present.sum()), int(daily.total.sum())
+
+    monthly = attendance.groupby('month')[['present', 'total']].sum()
+    monthly['average_attendance'] = _rates(monthly.present, monthly.total)
+    monthly['school_days'] = attendance.groupby('month')['date'].nunique()
+
+    class_wise = breakdown('class_name').rename(columns={'class_name': 'class'})
+    route_wise = breakdown('route_id')
+    route_wise.insert(1, 'route', route_wise.route_id.map(_names(Route, Route.route_name, route_wise.route_id)))
+    bus_wise = breakdown('bus_id')
+    bus_wise.insert(1, 'bus_number', bus_wise.bus_id.map(_names(Bus, Bus.bus_number, bus_wise.bus_id)))
+
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'monthly_summary': {
+            'total_students': int(students.students.sum()),
+            'average_attendance': attendance_rate(present, total),
+            'total_school_days': len(daily),
+            'highest_attendance_day': daily.rate.idxmax().isoformat() if len(daily) else None,
+            'lowest_attendance_day': daily.rate.idxmin().isoformat() if len(daily) else None
+        },
+        'monthly': _records(monthly.reset_index().rename(columns={'present': 'present_count', 'total': 'total_records'})),
+        'class_wise': _records(class_wise),
+        'route_wise': _records(route_wise),
+        'bus_wise': _records(bus_wise)
+    }
+
+def bus_report(start_date, end_date):
+    """Per-bus utilization and a maintenance summary for the period."""
+    maintenance = _maintenance_frame(start_date, end_date)
+    utilization = _bus_utilization(_trip_frame(start_date, end_date), maintenance)
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'utilization': _records(utilization),
+        'maintenance_summary': {
+            'total_maintenance_cost': round(float(maintenance.cost.sum()), 2),
+            'scheduled_maintenance': int((maintenance.status == 'Scheduled').sum()),
+            'emergency_repairs': int(maintenance.incident.sum()),
+            'average_downtime': round(float(maintenance.downtime_hours.mean()), 1) if maintenance.downtime_hours.notna().any() else 0
+        }
+    }
+
+def financial_report(start_date, end_date):
+    """Fee collection against maintenance and payroll, per month and route.
+
+    Fees come from the fee_monthly ledger. Payroll is the monthly salary
+    of active drivers, counted once per month of the period.
+    """
+    months = bucket_range(start_date, end_date, 'month')
+    periods = [(month.year, month.month) for month in months]
+    labels = [month.strftime('%Y-%m') for month in months]
+
+    totals = ledger_dict(ledger_totals(periods=periods)[0])
+    ledger = _frame([
+        (f'{row.year:04d}-{row.month:02d}', float(row.collected_amount), float(row.billed_amount))
+        for row in ledger_totals((FeeMonthly.year, FeeMonthly.month), periods=periods)
+    ], ('month', 'income', 'billed')).set_index('month')
+    by_route = [dict(ledger_dict(row), route_id=row.route_id)
+                for row in ledger_totals((ledger_route,), periods=periods)]
+    route_names = _names(Route, Route.route_name, [row['route_id'] for row in by_route])
+    for row in by_route:
+        row['route'] = route_names.get(row['route_id'])
+
+    maintenance = _maintenance_frame(start_date, end_date)
+    payroll = float(db.session.query(func.coalesce(func.sum(Driver.salary), 0)).filter(
+        Driver.is_active.is_(True)
+    ).scalar())
+
+    monthly = pd.DataFrame(index=pd.Index(labels, name='month')).join(ledger).join(
+        maintenance.groupby('month')['cost'].sum().rename('maintenance_cost')
+    ).fillna(0)
+    monthly['driver_salary'] = payroll
+    monthly['expenses'] = monthly.maintenance_cost + monthly.driver_salary
+    monthly['profit'] = monthly.income - monthly.expenses
+    monthly['profit_margin'] = _rates(monthly.profit, monthly.income)
+    monthly = monthly.round(2)
+
+    total_income = float(monthly.income.sum())
+    total_expenses = float(monthly.expenses.sum())
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'fee_collection': {
+            'total_fees_due': totals['billed_amount'],
+            'total_collected': totals['collected_amount'],
+            'collection_rate': totals['collection_rate'],
+            'pending_amount': totals['outstanding_amount'],
+            'overdue_amount': totals['overdue_amount']
+        },
+        'expenses': {
+            'maintenance_cost': round(float(monthly.maintenance_cost.sum()), 2),
+            'driver_salary': round(float(monthly.driver_salary.sum()), 2),
+            'total_expenses': round(total_expenses, 2)
+        },
+        'monthly_breakdown': _records(monthly.reset_index()),
+        'route_wise': by_route,
+        'yearly_summary': {
+            'total_income': round(total_income, 2),
+            'total_expenses': round(total_expenses, 2),
+            'net_profit': round(total_income - total_expenses, 2),
+            'average_monthly_profit': round(float(monthly.profit.mean()), 2) if len(monthly) else 0,
+            'best_month': monthly.profit.idxmax() if len(monthly) else None,
+            'worst_month': monthly.profit.idxmin() if len(monthly) else None
+        }
+    }
+
+def performance_report(start_date, end_date):
+    """Driver, route and bus performance from the period's trips and driving events."""
+    trips = _trip_frame(start_date, end_date)
+
+    drivers = _frame(db.session.query(
+        Driver.id, User.first_name + ' ' + User.last_name, Driver.rating
+    ).join(User, User.id == Driver.user_id).filter(Driver.is_active.is_(True)).all(),
+        ('driver_id', 'driver_name', 'rating')).set_index('driver_id')
+    events = _frame(
+        [(row['id'], row['count']) for row in driving_event_summary(start_date, end_date, 'driver')],
+        ('driver_id', 'driving_events')
+    ).groupby('driver_id')['driving_events'].sum()
+    driver_performance = drivers.join(_trip_stats(trips, 'driver_id'), how='outer').join(events, how='left')
+    driver_performance[['total_trips', 'driving_events']] = driver_performance[['total_trips', 'driving_events']].fillna(0)
+    driver_performance['events_per_100_km'] = (
+        driver_performance.driving_events / driver_performance.total_distance.where(driver_performance.total_distance > 0) * 100
+    ).round(2)
+
+    routes = _frame(db.session.query(Route.id, Route.route_name, Route.estimated_duration).all(),
+                    ('route_id', 'route_name', 'estimated_duration')).set_index('route_id')
+    route_efficiency = routes.join(_trip_stats(trips, 'route_id'), how='inner')
+    scheduled = route_efficiency.scheduled_time.fillna(route_efficiency.estimated_duration)
+    route_efficiency['scheduled_time'] = scheduled
+    route_efficiency['efficiency_score'] = _rates(scheduled, route_efficiency.average_trip_time).clip(upper=100)
+    route_efficiency = route_efficiency.rename(columns={'average_occupancy': 'student_capacity_utilization'})
+
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'driver_performance': _records(driver_performance.reset_index().sort_values('total_trips', ascending=False)),
+        'route_efficiency': _records(route_efficiency.reset_index()),
+        'bus_utilization': _records(_bus_utilization(trips, _maintenance_frame(start_date, end_date)))
+    }
+
+def _trend(current, previous):
+    """Compare a measure between two periods."""
+    change = round((current - previous) / previous * 100, 1) if previous else 0
+    return {
+        'current_month': current,
+        'previous_month': previous,
+        'trend': 'increasing' if change > 0 else 'decreasing' if change < 0 else 'stable',
+        'change_percentage': change
+    }
+
+def analytics_report(start_date, end_date):
+    """Month-on-month trends up to end_date and upcoming maintenance.
+
+    The current month runs from the first of end_date's month to
+    end_date; it is compared with the whole previous month.
+    """
+    current_start = end_date.replace(day=1)
+    previous_start = months_before(end_date, 1)
+
+    attendance = {}
+    for label, first, last in (('current', current_start, end_date),
+                               ('previous', previous_start, current_start - timedelta(days=1))):
+        present, total = db.session.query(
+            present_count(), func.coalesce(func.sum(AttendanceDaily.record_count), 0)
+        ).filter(*rollup_filters(first, last)).one()
+        attendance[label] = attendance_rate(int(present), int(total))
+
+    trips = _trip_frame(previous_start, end_date)
+    trips['period'] = (pd.to_datetime(trips.trip_date) >= pd.Timestamp(current_start)).map({True: 'current', False: 'previous'})
+    stats = _trip_stats(trips, 'period').reindex(['current', 'previous'])
+
+    def measure(column, period):
+        value = stats.at[period, column]
+        return round(float(value), 2) if pd.notna(value) else 0
+
+    upcoming = db.session.query(
+        Maintenance.bus_id, Bus.bus_number, Maintenance.next_maintenance_date, Maintenance.maintenance_type
+    ).join(Bus, Bus.id == Maintenance.bus_id).filter(
+        Maintenance.next_maintenance_date >= end_date,
+        Maintenance.next_maintenance_date <= end_date + timedelta(days=30)
+    ).order_by(Maintenance.next_maintenance_date).all()
+
+    return {
+        'start_date': previous_start.isoformat(),
+        'end_date': end_date.isoformat(),
+        'trends': {
+            'attendance_trend': _trend(attendance['current'], attendance['previous']),
+            'fuel_efficiency_trend': _trend(measure('fuel_efficiency', 'current'), measure('fuel_efficiency', 'previous')),
+            'on_time_performance': _trend(measure('on_time_percentage', 'current'), measure('on_time_percentage', 'previous')),
+            'average_occupancy': _trend(measure('average_occupancy', 'current'), measure('average_occupancy', 'previous'))
+        },
+        'maintenance_alerts': [{
+            'bus_id': bus_id,
+            'bus_number': bus_number,
+            'predicted_maintenance_date': due.isoformat(),
+            'type': maintenance_type
+        } for bus_id, bus_number, due, maintenance_type in upcoming]
+    }
+
+def safety_report(start_date, end_date):
+    """Incidents, driving events and document compliance for the period."""
+    trips = _trip_frame(start_date, end_date)
+    maintenance = _maintenance_frame(start_date, end_date)
+    incidents = maintenance[maintenance.incident].sort_values('day', ascending=False)
+
+    events = _frame(
+        [(row['id'], row['event_type'], row['count']) for row in driving_event_summary(start_date, end_date, 'bus')],
+        ('bus_id', 'event_type', 'count')
+    )
+    by_bus = events.groupby(['bus_id', 'event_type'])['count'].sum().unstack(fill_value=0).reindex(
+        columns=list(DRIVING_EVENT_TYPES), fill_value=0
+    )
+    by_bus['total_events'] = by_bus.sum(axis=1)
+    distance = trips.groupby('bus_id')['distance'].sum()
+    by_bus['events_per_100_km'] = (by_bus.total_events / distance.reindex(by_bus.index).where(lambda d: d > 0) * 100).round(2)
+    by_bus.insert(0, 'bus_number', by_bus.index.map(_names(Bus, Bus.bus_number, by_bus.index)))
+    by_bus.columns.name = None
+
+    bus_numbers = _names(Bus, Bus.bus_number, incidents.bus_id.unique())
+    last_incident = db.session.query(func.max(func.coalesce(Maintenance.actual_date, Maintenance.scheduled_date))).filter(
+        Maintenance.maintenance_type.in_(INCIDENT_MAINTENANCE_TYPES),
+        func.coalesce(Maintenance.actual_date, Maintenance.scheduled_date) <= end_date
+    ).scalar()
+    total_distance = float(trips.distance.sum())
+    today = date.today()
+
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'incident_summary': {
+            'total_incidents': len(incidents),
+            'breakdowns': int((incidents.maintenance_type == 'Breakdown').sum()),
+            'emergencies': int((incidents.maintenance_type == 'Emergency').sum()),
+            'incidents_per_1000_trips': round(len(incidents) / len(trips) * 1000, 2) if len(trips) else 0,
+            'days_since_last_incident': (end_date - last_incident).days if last_incident else None
+        },
+        'driving_events': {event_type: int(by_bus[event_type].sum()) for event_type in DRIVING_EVENT_TYPES},
+        'safety_metrics': {
+            'events_per_100_km': round(float(by_bus.total_events.sum()) / total_distance * 100, 2) if total_distance else 0,
+            'drivers_with_expired_license': Driver.query.filter(
+                Driver.is_active.is_(True), Driver.license_expiry < today
+            ).count(),
+            'buses_with_expired_documents': Bus.query.filter(
+                Bus.is_active.is_(True),
+                (Bus.insurance_expiry < today) | (Bus.fitness_certificate_expiry < today) | (Bus.permit_expiry < today)
+            ).count()
+        },
+        'incident_details': [{
+            'date': row.day.isoformat() if row.day else None,
+            'type': row.maintenance_type,
+            'bus_number': bus_numbers.get(row.bus_id),
+            'description': row.description,
+            'cost': round(float(row.cost), 2),
+            'status': row.status
+        } for row in incidents.itertuples()],
+        'bus_wise': _records(by_bus.reset_index())
+    }
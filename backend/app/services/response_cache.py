@@ -0,0 +1,193 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+import redis
+from blinker import Namespace
+from flask import current_app, request
+
+# Sent with the tags a successful write invalidated
+tags_invalidated = Namespace().signal('tags-invalidated')
+
+class LocalResponseStore:
+    """Cached responses and tag versions held in this process.
+
+    Stands in for Redis while it is unreachable; invalidations only
+    reach this process, so entries rely on their TTL to converge.
+    """
+
+    def __init__(self, max_entries=1000):
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def lookup(self, key, tags):
+        """Get (payload or None, current versions of tags)."""
+        with self._lock:
+            versions = [self._versions.get(tag, 0) for tag in tags]
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, versions
+            expires_at, entry_versions, payload = entry
+            if expires_at < time.monotonic() or entry_versions != versions:
+                del self._entries[key]
+                return None, versions
+            self._entries.move_to_end(key)
+            return payload, versions
+
+    def store(self, key, versions, payload, ttl):
+        """Keep a payload computed while tags were at versions."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, versions, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump(self, tags):
+        """Invalidate every entry depending on any of tags."""
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+class RedisResponseStore:
+    """Cached responses and tag versions shared through Redis.
+
+    An entry records the version of each of its tags when it was
+    computed; bumping a tag makes those entries stale without scanning
+    for them. A lookup fetches the entry and the versions in one round
+    trip.
+    """
+
+    def __init__(self, client, prefix='fleetflow:cache'):
+        self.client = client
+        self.prefix = prefix
+
+    def _tag_key(self, tag):
+        return f'{self.prefix}:tag:{tag}'
+
+    def lookup(self, key, tags):
+        """Get (payload or None, current versions of tags)."""
+        pipe = self.client.pipeline()
+        pipe.get(f'{self.prefix}:{key}')
+        pipe.mget([self._tag_key(tag) for tag in tags])
+        raw, versions = pipe.execute()
+        versions = [int(version or 0) for version in versions]
+        if raw is None:
+            return None, versions
+        entry = json.loads(raw)
+        if entry['versions'] != versions:
+            return None, versions
+        return entry['payload'], versions
+
+    def store(self, key, versions, payload, ttl):
+        """Keep a payload computed while tags were at versions."""
+        self.client.set(f'{self.prefix}:{key}', json.dumps({'versions': versions, 'payload': payload}), ex=ttl)
+
+    def bump(self, tags):
+        """Invalidate every entry depending on any of tags."""
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(self._tag_key(tag))
+        pipe.execute()
+
+class ResponseCache:
+    """Serialized responses of read endpoints, invalidated by dependency tags.
+
+    Redis is shared by every worker; when it fails, the cache falls
+    back to an in-process store and tries Redis again after
+    RESPONSE_CACHE_RETRY_SECONDS.
+    """
+
+    def __init__(self):
+        self.redis_store = None
+        self.local_store = LocalResponseStore()
+        self.enabled = True
+        self.default_ttl = 60
+        self.retry_seconds = 30
+        self._redis_down_until = 0
+        self._logger = None
+
+    def init_app(self, app, client=None):
+        """Read settings from config and share the app's Redis client."""
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.default_ttl = app.config.get('RESPONSE_CACHE_TTL_SECONDS', 60)
+        self.retry_seconds = app.config.get('RESPONSE_CACHE_RETRY_SECONDS', 30)
+        self.local_store = LocalResponseStore(app.config.get('RESPONSE_CACHE_LOCAL_MAX_ENTRIES', 1000))
+        self.redis_store = RedisResponseStore(client) if client is not None else None
+        self._logger = app.logger
+
+    def _redis_call(self, method, *args):
+        """Run a store method on Redis, returning (ran, result); ran is False while Redis is down."""
+        if self.redis_store is None or time.monotonic() < self._redis_down_until:
+            return False, None
+        try:
+            return True, getattr(self.redis_store, method)(*args)
+        except redis.RedisError as e:
+            self._redis_down_until = time.monotonic() + self.retry_seconds
+            self._logger.warning(f'Response cache falling back to memory: {e}')
+            return False, None
+
+    def _call(self, method, *args):
+        """Run a store method on Redis, or locally while Redis is down."""
+        ok, result = self._redis_call(method, *args)
+        return result if ok else getattr(self.local_store, method)(*args)
+
+    def invalidate(self, *tags):
+        """Drop cached responses depending on any of tags.
+
+        The local store is bumped too, so entries it served during an
+        outage do not outlive the write.
+        """
+        self.local_store.bump(tags)
+        self._redis_call('bump', tags)
+        tags_invalidated.send(self, tags=tags)
+
+    def cached(self, tags, ttl=None):
+        """Decorate a read endpoint so successful responses are cached.
+
+        Responses are keyed by endpoint, path and query string; place
+        the decorator below authentication so only authorized requests
+        reach the cache.
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if not self.enabled:
+                    return f(*args, **kwargs)
+
+                key = 'resp:' + hashlib.sha1(
+                    f'{request.endpoint}:{request.full_path}'.encode()
+                ).hexdigest()
+                payload, versions = self._call('lookup', key, tags)
+                if payload is not None:
+                    response = current_app.response_class(payload['body'], status=200, mimetype=payload['mimetype'])
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self._call('store', key, versions, {
+                        'body': response.get_data(as_text=True),
+                        'mimetype': response.mimetype
+                    }, ttl or self.default_ttl)
+                    response.headers['X-Cache'] = 'MISS'
+                return response
+            return decorated_function
+        return decorator
+
+    def invalidates(self, *tags):
+        """Decorate a write endpoint so a successful write invalidates tags."""
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code < 400:
+                    self.invalidate(*tags)
+                return response
+            return decorated_function
+        return decorator
+
+response_cache = ResponseCache()
@@ -0,0 +1,150 @@
+import math
+import time
+from flask import current_app
+from app.models.route import RouteStop
+from app.utils.geo import EARTH_RADIUS_METERS
+
+_geometry_cache = {}
+
+class RouteGeometry:
+    """Ordered, geocoded stops of a route, prepared once for per-fix checks.
+
+    Stops are projected onto a local plane in meters and the polyline
+    joining them is indexed in a uniform grid, so matching a fix to the
+    route only inspects the segments near it.
+    """
+
+    def __init__(self, route_id, stops, cell_size=250.0):
+        self.route_id = route_id
+        self.stop_ids = [stop.id for stop in stops]
+        self.stop_orders = [stop.stop_order for stop in stops]
+        self.latitudes = [stop.latitude for stop in stops]
+        self.longitudes = [stop.longitude for stop in stops]
+        self.dwell_seconds = [(stop.stop_duration or 0) * 60 for stop in stops]
+        self.loaded_at = time.monotonic()
+
+        self.origin_lat = self.latitudes[0] if stops else 0.0
+        self.origin_lng = self.longitudes[0] if stops else 0.0
+        self._x_scale = math.radians(1) * EARTH_RADIUS_METERS * math.cos(math.radians(self.origin_lat))
+        self._y_scale = math.radians(1) * EARTH_RADIUS_METERS
+
+        points = [self.project(lat, lng) for lat, lng in zip(self.latitudes, self.longitudes)]
+        self.xs = [x for x, _ in points]
+        self.ys = [y for _, y in points]
+
+        # Distance along the polyline at each stop
+        self.cumulative = [0.0]
+        for i in range(1, len(points)):
+            self.cumulative.append(self.cumulative[-1] + math.hypot(self.xs[i] - self.xs[i - 1], self.ys[i] - self.ys[i - 1]))
+
+        self.cell_size = cell_size
+        self._grid = {}
+        for i in range(self.segment_count):
+            min_cx = int(math.floor(min(self.xs[i], self.xs[i + 1]) / cell_size))
+            max_cx = int(math.floor(max(self.xs[i], self.xs[i + 1]) / cell_size))
+            min_cy = int(math.floor(min(self.ys[i], self.ys[i + 1]) / cell_size))
+            max_cy = int(math.floor(max(self.ys[i], self.ys[i + 1]) / cell_size))
+            for cx in range(min_cx, max_cx + 1):
+                for cy in range(min_cy, max_cy + 1):
+                    self._grid.setdefault((cx, cy), []).append(i)
+
+    @property
+    def stop_count(self):
+        """Get number of geocoded stops."""
+        return len(self.stop_ids)
+
+    @property
+    def segment_count(self):
+        """Get number of stop-to-stop segments."""
+        return max(len(self.stop_ids) - 1, 0)
+
+    @property
+    def total_length(self):
+        """Get polyline length in meters."""
+        return self.cumulative[-1] if self.cumulative else 0.0
+
+    def index_of(self, stop_id):
+        """Get position of a stop in the ordered stop list."""
+        try:
+            return self.stop_ids.index(stop_id)
+        except ValueError:
+            return None
+
+    def project(self, lat, lng):
+        """Project a coordinate onto the route's local plane in meters."""
+        return (lng - self.origin_lng) * self._x_scale, (lat - self.origin_lat) * self._y_scale
+
+    def segment_distance(self, index, x, y):
+        """Get cross-track distance and along-segment offset of a point."""
+        ax, ay = self.xs[index], self.ys[index]
+        dx, dy = self.xs[index + 1] - ax, self.ys[index + 1] - ay
+        length_sq = dx * dx + dy * dy
+        t = 0.0
+        if length_sq > 0:
+            t = max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / length_sq))
+        px, py = ax + t * dx, ay + t * dy
+        return math.hypot(x - px, y - py), t * math.sqrt(length_sq)
+
+    def match(self, lat, lng, max_distance, hint=None):
+        """Match a fix to the nearest segment within max_distance.
+
+        Returns (segment index, cross-track meters, meters along route),
+        or None when no segment lies within max_distance. Segments next
+        to the hint are tried first, which is the common case for a bus
+        that has not moved far since its previous fix.
+        """
+        if not self.segment_count:
+            return None
+
+        x, y = self.project(lat, lng)
+
+        if hint is not None:
+            best = self._best_of(range(max(hint - 1, 0), min(hint + 2, self.segment_count)), x, y)
+            if best and best[1] <= max_distance:
+                return best
+
+        reach = int(math.ceil(max_distance / self.cell_size))
+        cx, cy = int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+        candidates = set()
+        for i in range(cx - reach, cx + reach + 1):
+            for j in range(cy - reach, cy + reach + 1):
+                candidates.update(self._grid.get((i, j), ()))
+
+        best = self._best_of(candidates, x, y)
+        if best and best[1] <= max_distance:
+            return best
+        return None
+
+    def _best_of(self, segments, x, y):
+        """Pick the closest of the given segments to a projected point."""
+        best = None
+        for index in segments:
+            distance, offset = self.segment_distance(index, x, y)
+            if best is None or distance < best[1]:
+                best = (index, distance, self.cumulative[index] + offset)
+        return best
+
+def load_route_geometry(route_id):
+    """Build geometry for a route from its geocoded stops."""
+    stops = RouteStop.query.filter(
+        RouteStop.route_id == route_id,
+        RouteStop.latitude.isnot(None),
+        RouteStop.longitude.isnot(None)
+    ).order_by(RouteStop.stop_order).all()
+    return RouteGeometry(route_id, stops, current_app.config.get('ROUTE_INDEX_CELL_METERS', 250.0))
+
+def get_route_geometry(route_id):
+    """Get cached geometry for a route, rebuilding it when stale."""
+    if not route_id:
+        return None
+
+    ttl = current_app.config.get('ROUTE_GEOMETRY_TTL_SECONDS', 600)
+    geometry = _geometry_cache.get(route_id)
+    if geometry is None or time.monotonic() - geometry.loaded_at > ttl:
+        geometry = load_route_geometry(route_id)
+        _geometry_cache[route_id] = geometry
+    return geometry
+
+def invalidate_route_geometry(route_id):
+    """Drop cached geometry after a route's stops change."""
+    _geometry_cache.pop(route_id, None)
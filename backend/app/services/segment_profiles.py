@@ -0,0 +1,160 @@
+from datetime import datetime, date, timedelta
+from sqlalchemy.orm.attributes import flag_modified
+from app import db
+from app.models.route import Route, RouteStop
+from app.models.trip import Trip
+from app.models.trip_stop_visit import TripStopVisit
+from app.utils.helpers import to_school_time
+
+PROFILE_VERSION = 2  # 2: buckets in school time rather than UTC
+BIN_SECONDS = 15
+PERCENTILES = [10, 25, 50, 75, 90]
+MAX_SEGMENT_SECONDS = 2 * 60 * 60  # longer gaps are lost GPS, not travel
+
+def segment_key(from_stop_id, to_stop_id):
+    """Key of a stop-to-stop segment in a traffic pattern."""
+    return f'{from_stop_id}>{to_stop_id}'
+
+def bucket_key(weekday, hour):
+    """Key of a weekday/hour bucket in a traffic pattern, in school time."""
+    return f'{weekday}:{hour}'
+
+def empty_profile():
+    """Create an empty traffic pattern document."""
+    return {
+        'version': PROFILE_VERSION,
+        'bin_seconds': BIN_SECONDS,
+        'percentiles': PERCENTILES,
+        'refreshed_through': None,
+        'segments': {}
+    }
+
+def histogram_percentiles(histogram, percentiles=PERCENTILES):
+    """Get percentile travel times in seconds from a sparse histogram."""
+    bins = sorted((int(b), count) for b, count in histogram.items())
+    total = sum(count for _, count in bins)
+    if not total:
+        return []
+
+    values = []
+    for p in percentiles:
+        target = total * p / 100.0
+        seen = 0
+        for b, count in bins:
+            seen += count
+            if seen >= target:
+                values.append((b + 0.5) * BIN_SECONDS)
+                break
+    return values
+
+def merge_histograms(histograms):
+    """Sum sparse histograms."""
+    merged = {}
+    for histogram in histograms:
+        for b, count in histogram.items():
+            merged[b] = merged.get(b, 0) + count
+    return merged
+
+def _segment_samples(route, start, end):
+    """Yield (from stop, to stop, departure, seconds) for visits in [start, end)."""
+    stop_ids = [stop_id for stop_id, in db.session.query(RouteStop.id).filter_by(
+        route_id=route.id
+    ).order_by(RouteStop.stop_order).all()]
+    next_stop = dict(zip(stop_ids, stop_ids[1:]))
+
+    visits = TripStopVisit.query.join(Trip, Trip.id == TripStopVisit.trip_id).filter(
+        Trip.route_id == route.id,
+        TripStopVisit.arrival_time >= start,
+        TripStopVisit.arrival_time < end
+    ).order_by(TripStopVisit.trip_id, TripStopVisit.stop_order).yield_per(5000)
+
+    previous = None
+    for visit in visits:
+        if (previous is not None and previous.trip_id == visit.trip_id and
+                previous.departure_time and next_stop.get(previous.route_stop_id) == visit.route_stop_id):
+            seconds = (visit.arrival_time - previous.departure_time).total_seconds()
+            if 0 < seconds <= MAX_SEGMENT_SECONDS:
+                yield previous.route_stop_id, visit.route_stop_id, previous.departure_time, seconds
+        previous = visit
+
+def refresh_route_profile(route, through_date):
+    """Fold stop visits up to through_date into the route's traffic pattern.
+
+    Each weekday/hour bucket keeps a sparse histogram of travel times, so
+    new days are added without re-reading old ones; the percentile array
+    of every touched bucket is then recomputed from its histogram. Buckets
+    are in school time, so they line up with route start times.
+    """
+    profile = route.traffic_pattern
+    if not profile or profile.get('version') != PROFILE_VERSION:
+        profile = empty_profile()
+
+    if profile['refreshed_through']:
+        start_date = date.fromisoformat(profile['refreshed_through']) + timedelta(days=1)
+    else:
+        first_visit = db.session.query(db.func.min(TripStopVisit.arrival_time)).join(
+            Trip, Trip.id == TripStopVisit.trip_id
+        ).filter(Trip.route_id == route.id).scalar()
+        start_date = first_visit.date() if first_visit else through_date + timedelta(days=1)
+
+    if start_date > through_date:
+        return 0
+
+    start = datetime.combine(start_date, datetime.min.time())
+    end = datetime.combine(through_date + timedelta(days=1), datetime.min.time())
+
+    touched = set()
+    samples = 0
+    for from_stop_id, to_stop_id, departed_at, seconds in _segment_samples(route, start, end):
+        segment = segment_key(from_stop_id, to_stop_id)
+        departed_at = to_school_time(departed_at)
+        bucket = bucket_key(departed_at.weekday(), departed_at.hour)
+        entry = profile['segments'].setdefault(segment, {}).setdefault(bucket, {'n': 0, 'h': {}, 'p': []})
+        b = str(int(seconds // BIN_SECONDS))
+        entry['h'][b] = entry['h'].get(b, 0) + 1
+        entry['n'] += 1
+        touched.add((segment, bucket))
+        samples += 1
+
+    for segment, bucket in touched:
+        entry = profile['segments'][segment][bucket]
+        entry['p'] = histogram_percentiles(entry['h'])
+
+    profile['refreshed_through'] = through_date.isoformat()
+    route.traffic_pattern = profile
+    flag_modified(route, 'traffic_pattern')
+    return samples
+
+def refresh_all_profiles(through_date=None):
+    """Refresh traffic patterns of every active route, by default through yesterday."""
+    through_date = through_date or date.today() - timedelta(days=1)
+    from app.services.eta_engine import eta_engine
+    samples = 0
+    for route in Route.query.filter_by(is_active=True).all():
+        samples += refresh_route_profile(route, through_date)
+        eta_engine.invalidate_profile(route.id)
+    db.session.commit()
+    return samples
+
+def segment_percentile(profile, from_stop_id, to_stop_id, weekday, hour, percentile=50):
+    """Look up a segment travel time in seconds, or None without history.
+
+    weekday and hour are in school time. Falls back to the same hour on any weekday when the exact bucket has
+    no samples.
+    """
+    if not profile or profile.get('version') != PROFILE_VERSION or percentile not in profile.get('percentiles', ()):
+        return None
+    buckets = profile['segments'].get(segment_key(from_stop_id, to_stop_id))
+    if not buckets:
+        return None
+
+    index = profile['percentiles'].index(percentile)
+    entry = buckets.get(bucket_key(weekday, hour))
+    if entry and entry['p']:
+        return entry['p'][index]
+
+    same_hour = [e['h'] for k, e in buckets.items() if k.endswith(f':{hour}')]
+    if same_hour:
+        values = histogram_percentiles(merge_histograms(same_hour), [percentile])
+        return values[0] if values else None
+    return None
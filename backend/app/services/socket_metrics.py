@@ -0,0 +1,190 @@
+import bisect
+import threading
+import time
+import redis
+from app import socketio
+from app.services.message_queue import shared_redis_url
+
+# Upper bounds of emit latency buckets in milliseconds
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+# Sorted set of lagging sids of every worker, scored by when the entry lapses
+LAGGING_KEY = 'fleetflow:socket:lagging'
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations in milliseconds."""
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def to_dict(self):
+        return {
+            'buckets': {
+                **{f'le_{bound}': count for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)},
+                'le_inf': self.counts[-1]
+            },
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0,
+            'max_ms': round(self.max_ms, 3)
+        }
+
+class SocketMetrics:
+    """Fan-out instrumentation and slow-consumer policy for this process.
+
+    Emit latencies are recorded by the code that emits; room sizes and
+    outbound queue depths are read from the Socket.IO and Engine.IO
+    servers on demand. A monitor task checks every client's queue once
+    the backlog passes SOCKET_MAX_QUEUE_DEPTH and either disconnects the
+    client or, with the 'drop' policy, marks it lagging: location frames
+    skip it until its queue is half drained, and it resumes from the seq
+    gap. Packets already queued are never touched, so a binary event is
+    always delivered whole. One stalled phone then cannot hold memory or
+    writer time that other subscribers need.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._task = None
+        self.max_queue_depth = 200
+        self.policy = 'disconnect'
+        self.interval = 5
+        self.evicted = 0
+        self.lagged = 0
+        self._lagging = set()
+        self._redis = None
+        self._logger = None
+
+    def init_app(self, app):
+        """Read limits from config; the monitor starts with the first client."""
+        self.max_queue_depth = app.config.get('SOCKET_MAX_QUEUE_DEPTH', 200)
+        self.policy = app.config.get('SOCKET_SLOW_CONSUMER_POLICY', 'disconnect')
+        self.interval = app.config.get('SOCKET_MONITOR_INTERVAL_SECONDS', 5)
+        self._logger = app.logger
+        # The worker emitting frames must also skip clients lagging on other workers
+        url = shared_redis_url(app.config)
+        self._redis = redis.from_url(url) if url else None
+
+    def timed_emit(self, event, data, room, skip_sid=None):
+        """Emit to a room and record how long the emit took."""
+        started = time.perf_counter()
+        socketio.emit(event, data, room=room, skip_sid=skip_sid)
+        self.observe_emit(event, (time.perf_counter() - started) * 1000)
+
+    def observe_emit(self, event, ms):
+        """Record the duration of one emit."""
+        with self._lock:
+            histogram = self._histograms.get(event)
+            if histogram is None:
+                histogram = self._histograms[event] = LatencyHistogram()
+            histogram.observe(ms)
+
+    def ensure_monitor(self):
+        """Start the slow-consumer monitor once per process."""
+        if self._task is None:
+            with self._lock:
+                if self._task is None:
+                    self._task = socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                self.enforce()
+            except Exception as e:
+                self._logger.warning(f'Socket monitor failed: {e}')
+
+    def _sockets(self):
+        """Get (sid, engine.io socket) of every client connected here."""
+        manager = socketio.server.manager
+        eio_sockets = socketio.server.eio.sockets
+        for sid, eio_sid in list(manager.rooms.get('/', {}).get(None, {}).items()):
+            eio_socket = eio_sockets.get(eio_sid)
+            if eio_socket is not None:
+                yield sid, eio_socket
+
+    def queue_depths(self):
+        """Get outbound packets waiting for each client."""
+        return {sid: eio_socket.queue.qsize() for sid, eio_socket in self._sockets()}
+
+    def enforce(self):
+        """Apply the slow-consumer policy to clients over the limit."""
+        lagging = set()
+        for sid, eio_socket in self._sockets():
+            depth = eio_socket.queue.qsize()
+            if self.policy == 'drop':
+                # Keep skipping until half the backlog is gone, so a client does not flap
+                if depth > self.max_queue_depth or (sid in self._lagging and depth > self.max_queue_depth // 2):
+                    lagging.add(sid)
+            elif depth > self.max_queue_depth:
+                socketio.server.disconnect(sid)
+                self.evicted += 1
+
+        recovered = self._lagging - lagging
+        self.lagged += len(lagging - self._lagging)
+        self._lagging = lagging
+        if self._redis is not None and (lagging or recovered):
+            now = time.time()
+            pipe = self._redis.pipeline()
+            if recovered:
+                pipe.zrem(LAGGING_KEY, *recovered)
+            if lagging:
+                pipe.zadd(LAGGING_KEY, {sid: now + self.interval * 3 for sid in lagging})
+            pipe.zremrangebyscore(LAGGING_KEY, '-inf', now)
+            pipe.execute()
+
+    def lagging_sids(self):
+        """Get clients, on any worker, that location frames should skip."""
+        if self.policy != 'drop':
+            return []
+        if self._redis is None:
+            return list(self._lagging)
+        try:
+            return [sid.decode() for sid in self._redis.zrangebyscore(LAGGING_KEY, time.time(), '+inf')]
+        except redis.RedisError as e:
+            self._logger.warning(f'Reading lagging clients failed: {e}')
+            return list(self._lagging)
+
+    def room_sizes(self):
+        """Get subscriber counts of the named rooms on this process."""
+        rooms = socketio.server.manager.rooms.get('/', {})
+        sids = rooms.get(None, {})
+        return {
+            room: len(members) for room, members in rooms.items()
+            if room is not None and room not in sids
+        }
+
+    def snapshot(self):
+        """Get every metric for this process."""
+        depths = self.queue_depths()
+        with self._lock:
+            latencies = {event: histogram.to_dict() for event, histogram in self._histograms.items()}
+        return {
+            'connected_clients': len(depths),
+            'rooms': self.room_sizes(),
+            'emit_latency_ms': latencies,
+            'queue_depth': {
+                'max': max(depths.values(), default=0),
+                'over_limit': sum(1 for depth in depths.values() if depth > self.max_queue_depth),
+                'limit': self.max_queue_depth,
+                'clients': dict(sorted(depths.items(), key=lambda item: -item[1])[:20])
+            },
+            'slow_consumers': {
+                'policy': self.policy,
+                'evicted': self.evicted,
+                'lagged': self.lagged,
+                'lagging': len(self._lagging)
+            }
+        }
+
+socket_metrics = SocketMetrics()
@@ -0,0 +1,122 @@
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models.trip_stop_visit import TripStopVisit
+from app.utils.geo import fast_distance_meters
+from app.utils.sql import insert_ignoring_duplicates
+
+class _StopState:
+    """Constant-size detection state kept for each bus."""
+    __slots__ = ('trip_id', 'next_index', 'inside_index', 'arrived_at', 'last_inside_at')
+
+    def __init__(self, trip_id, next_index):
+        self.trip_id = trip_id
+        self.next_index = next_index
+        self.inside_index = None
+        self.arrived_at = None
+        self.last_inside_at = None
+
+class StopDetector:
+    """Detect arrival, departure and dwell at route stops from live fixes.
+
+    Only the stop the bus is currently inside and a short window of
+    upcoming stops are checked, so the cost per fix does not grow with
+    the length of the route.
+    """
+
+    def __init__(self):
+        self._states = {}
+
+    def process(self, fix, context):
+        """Advance stop detection for one fix."""
+        geometry = context.geometry
+        if not context.trip_id or not geometry or not geometry.stop_count:
+            self._states.pop(fix.bus_id, None)
+            return
+
+        state = self._states.get(fix.bus_id)
+        if state is not None and state.next_index > geometry.stop_count:
+            state = None
+        if state is None or state.trip_id != context.trip_id:
+            state = _StopState(context.trip_id, self._initial_index(context.trip_id, geometry, fix))
+            self._states[fix.bus_id] = state
+
+        radius = current_app.config.get('STOP_GEOFENCE_RADIUS_METERS', 60)
+
+        if state.inside_index is not None and state.inside_index >= geometry.stop_count:
+            state.inside_index = None
+        if state.inside_index is not None:
+            distance = fast_distance_meters(
+                fix.latitude, fix.longitude,
+                geometry.latitudes[state.inside_index], geometry.longitudes[state.inside_index]
+            )
+            # Hysteresis keeps GPS jitter at the fence edge from splitting a visit
+            if distance <= radius * 1.5:
+                state.last_inside_at = fix.timestamp
+                return
+            self._record_departure(state, geometry)
+
+        lookahead = current_app.config.get('STOP_LOOKAHEAD', 3)
+        end = min(state.next_index + lookahead, geometry.stop_count)
+        for index in range(state.next_index, end):
+            distance = fast_distance_meters(
+                fix.latitude, fix.longitude,
+                geometry.latitudes[index], geometry.longitudes[index]
+            )
+            if distance <= radius:
+                self._record_arrival(state, geometry, index, fix)
+                break
+
+    def reset(self, bus_id):
+        """Forget detection state for a bus."""
+        self._states.pop(bus_id, None)
+
+    def _initial_index(self, trip_id, geometry, fix):
+        """Resume after the last recorded visit, or at the nearest stop."""
+        last_order = db.session.query(func.max(TripStopVisit.stop_order)).filter(
+            TripStopVisit.trip_id == trip_id
+        ).scalar()
+        if last_order is not None:
+            for index, order in enumerate(geometry.stop_orders):
+                if order > last_order:
+                    return index
+            return geometry.stop_count
+
+        distances = [
+            fast_distance_meters(fix.latitude, fix.longitude, lat, lng)
+            for lat, lng in zip(geometry.latitudes, geometry.longitudes)
+        ]
+        return distances.index(min(distances))
+
+    def _record_arrival(self, state, geometry, index, fix):
+        """Open a visit at the stop the bus just entered."""
+        state.inside_index = index
+        state.arrived_at = fix.timestamp
+        state.last_inside_at = fix.timestamp
+
+        # The visit may already exist after a restart or a bus switching
+        # workers; keep the first arrival rather than failing the fix
+        insert_ignoring_duplicates(db.session, TripStopVisit.__table__, [{
+            'trip_id': state.trip_id,
+            'route_stop_id': geometry.stop_ids[index],
+            'bus_id': fix.bus_id,
+            'stop_order': geometry.stop_orders[index],
+            'arrival_time': fix.timestamp
+        }])
+
+    def _record_departure(self, state, geometry):
+        """Close the open visit using the last fix seen inside the fence."""
+        departed_at = state.last_inside_at
+        dwell = int((departed_at - state.arrived_at).total_seconds())
+
+        TripStopVisit.query.filter_by(
+            trip_id=state.trip_id,
+            route_stop_id=geometry.stop_ids[state.inside_index]
+        ).update({'departure_time': departed_at, 'dwell_seconds': dwell})
+
+        state.next_index = state.inside_index + 1
+        state.inside_index = None
+        state.arrived_at = None
+        state.last_inside_at = None
+
+stop_detector = StopDetector()
@@ -0,0 +1,115 @@
+import threading
+from flask import current_app
+from flask_jwt_extended import decode_token
+from app.models.user import User
+from app.models.student import Student
+from app.models.trip import Trip
+
+ROOM_TYPES = ('bus', 'route', 'trip')
+FLEET_ROOM = 'tracking'
+FLEET_ROLES = ('admin', 'staff', 'driver', 'conductor')
+
+def room_name(room_type, target_id):
+    """Get the socket room carrying updates for one bus, route or trip."""
+    return f'{room_type}_{target_id}'
+
+def fix_rooms(context):
+    """Get every room a fix should be published to."""
+    rooms = [FLEET_ROOM, room_name('bus', context.bus_id)]
+    if context.route_id:
+        rooms.append(room_name('route', context.route_id))
+    if context.trip_id:
+        rooms.append(room_name('trip', context.trip_id))
+    return rooms
+
+def socket_user_id(token):
+    """Resolve the user id of a connecting client from its access token."""
+    claims = decode_token(token)
+    return claims[current_app.config.get('JWT_IDENTITY_CLAIM', 'sub')]
+
+def _riders(user):
+    """Get active students a student or parent account may follow."""
+    query = Student.query.filter_by(is_active=True)
+    if user.role == 'student':
+        return query.filter_by(user_id=user.id).all()
+    return query.filter_by(parent_email=user.email).all()
+
+def can_subscribe(user, room_type, target_id):
+    """Check whether a user may follow a bus, route or trip.
+
+    Staff roles may follow anything; students and parents only the
+    buses, routes and trips their own students ride.
+    """
+    if not user or not user.is_active:
+        return False
+    if user.role in FLEET_ROLES:
+        return True
+    if user.role not in ('student', 'parent'):
+        return False
+
+    riders = _riders(user)
+    bus_ids = {student.bus_id for student in riders if student.bus_id}
+    route_ids = {student.route_id for student in riders if student.route_id}
+
+    if room_type == 'bus':
+        return target_id in bus_ids
+    if room_type == 'route':
+        return target_id in route_ids
+    if room_type == 'trip':
+        trip = Trip.query.get(target_id)
+        return bool(trip) and (trip.bus_id in bus_ids or trip.route_id in route_ids)
+    return False
+
+class SubscriptionRegistry:
+    """Reference-counted room membership of connected clients.
+
+    A client may subscribe to the same room from several views; it joins
+    the room on the first subscription and leaves on the last, so one
+    view closing does not cut off the others.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def connect(self, sid, user_id):
+        """Remember who a client authenticated as."""
+        with self._lock:
+            self._users[sid] = user_id
+
+    def user(self, sid):
+        """Get the user a client authenticated as, if any."""
+        user_id = self._users.get(sid)
+        return User.query.get(user_id) if user_id is not None else None
+
+    def add(self, sid, room):
+        """Count a subscription; returns True when the client must join."""
+        with self._lock:
+            rooms = self._counts.setdefault(sid, {})
+            rooms[room] = rooms.get(room, 0) + 1
+            return rooms[room] == 1
+
+    def remove(self, sid, room):
+        """Drop a subscription; returns True when the client must leave."""
+        with self._lock:
+            rooms = self._counts.get(sid, {})
+            if room not in rooms:
+                return False
+            rooms[room] -= 1
+            if rooms[room] > 0:
+                return False
+            del rooms[room]
+            return True
+
+    def rooms(self, sid):
+        """Get the rooms a client is subscribed to."""
+        return list(self._counts.get(sid, {}))
+
+    def disconnect(self, sid):
+        """Forget a client; Socket.IO removes it from its rooms itself."""
+        with self._lock:
+            self._users.pop(sid, None)
+            self._counts.pop(sid, None)
+
+subscriptions = SubscriptionRegistry()
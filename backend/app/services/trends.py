@@ -0,0 +1,149 @@
+from datetime import date, timedelta
+from sqlalchemy import func
+from app import db
+from app.models.attendance_daily import AttendanceDaily
+from app.models.fee_monthly import FeeMonthly
+from app.services.attendance_rollup import attendance_rate, present_count
+from app.services.fee_ledger import LEDGER_COLUMNS, LedgerTotals, ledger_dict, ledger_route
+
+GRANULARITIES = ('day', 'week', 'month')
+
+def bucket_start(day, granularity):
+    """Get the first day of the bucket containing day (weeks start on Monday)."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start, granularity):
+    """Get the first day of the bucket after the one starting at start."""
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return start + timedelta(days=1)
+
+def months_before(day, months):
+    """Get the first day of the month some months before the month of day."""
+    index = day.year * 12 + day.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+def bucket_range(start_date, end_date, granularity):
+    """Get the start of every bucket overlapping [start_date, end_date]."""
+    buckets = []
+    current = bucket_start(start_date, granularity)
+    while current <= end_date:
+        buckets.append(current)
+        current = next_bucket(current, granularity)
+    return buckets
+
+class AttendanceTrend:
+    """Attendance counts over time, read from attendance_daily."""
+    granularities = GRANULARITIES
+    dimensions = {
+        'route': AttendanceDaily.route_id,
+        'bus': AttendanceDaily.bus_id,
+        'class': AttendanceDaily.class_name
+    }
+    columns = ('present_count', 'total_count')
+
+    def rows(self, start_date, end_date, group_by, filters):
+        """Get (day, *dimension values, *columns) grouped per day."""
+        keys = [AttendanceDaily.date] + [self.dimensions[name] for name in group_by]
+        query = db.session.query(
+            *keys,
+            present_count(),
+            func.coalesce(func.sum(AttendanceDaily.record_count), 0)
+        ).filter(
+            AttendanceDaily.date >= start_date,
+            AttendanceDaily.date <= end_date
+        )
+        for name, value in filters.items():
+            query = query.filter(self.dimensions[name] == value)
+        return query.group_by(*keys).all()
+
+    def values(self, totals):
+        """Get the figures reported for one bucket."""
+        present, total = (int(value) for value in totals)
+        return {'present_count': present, 'total_count': total, 'attendance_rate': attendance_rate(present, total)}
+
+class FeeTrend:
+    """Fee amounts per billing month, read from fee_monthly."""
+    granularities = ('month',)
+    dimensions = {
+        'route': ledger_route,
+        'academic_year': FeeMonthly.academic_year
+    }
+    columns = LEDGER_COLUMNS
+
+    def rows(self, start_date, end_date, group_by, filters):
+        """Get (first day of month, *dimension values, *columns) grouped per month."""
+        period = FeeMonthly.year * 12 + FeeMonthly.month
+        keys = [FeeMonthly.year, FeeMonthly.month] + [self.dimensions[name] for name in group_by]
+        query = db.session.query(*keys, *[
+            func.coalesce(func.sum(getattr(FeeMonthly, column)), 0) for column in self.columns
+        ]).filter(
+            period >= start_date.year * 12 + start_date.month,
+            period <= end_date.year * 12 + end_date.month
+        )
+        for name, value in filters.items():
+            query = query.filter(self.dimensions[name] == value)
+        return [(date(year, month, 1),) + tuple(rest) for year, month, *rest in query.group_by(*keys).all()]
+
+    def values(self, totals):
+        """Get the figures reported for one bucket."""
+        return ledger_dict(LedgerTotals(*totals))
+
+TREND_METRICS = {
+    'attendance': AttendanceTrend(),
+    'fees': FeeTrend()
+}
+
+def trend_series(metric, start_date, end_date, granularity='day', group_by=(), filters=None):
+    """Get a metric per time bucket, one series per combination of group_by values.
+
+    Answered from the metric's rollup in one query; buckets without
+    data are filled with zeros so every series has the same periods.
+    Raises ValueError for an unknown metric, granularity or dimension.
+    """
+    trend = TREND_METRICS.get(metric)
+    if trend is None:
+        raise ValueError(f"Unknown metric. Must be one of: {', '.join(TREND_METRICS)}")
+    if granularity not in trend.granularities:
+        raise ValueError(f"Granularity for {metric} must be one of: {', '.join(trend.granularities)}")
+    filters = filters or {}
+    for name in list(group_by) + list(filters):
+        if name not in trend.dimensions:
+            raise ValueError(f"Dimension for {metric} must be one of: {', '.join(trend.dimensions)}")
+    if start_date > end_date:
+        raise ValueError("start_date must not be after end_date")
+
+    buckets = bucket_range(start_date, end_date, granularity)
+    width = len(group_by)
+    series = {}
+    for row in trend.rows(start_date, end_date, group_by, filters):
+        group = tuple(row[1:1 + width])
+        bucket = bucket_start(row[0], granularity)
+        totals = series.setdefault(group, {}).setdefault(bucket, [0] * len(trend.columns))
+        for i, value in enumerate(row[1 + width:]):
+            totals[i] += value or 0
+
+    if not group_by and not series:
+        series[()] = {}
+
+    empty = [0] * len(trend.columns)
+    return {
+        'metric': metric,
+        'granularity': granularity,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'group_by': list(group_by),
+        'series': [{
+            'group': dict(zip(group_by, group)),
+            'points': [
+                dict(trend.values(totals.get(bucket, empty)), period=bucket.isoformat())
+                for bucket in buckets
+            ]
+        } for group, totals in sorted(series.items(), key=lambda item: tuple(str(v) for v in item[0]))]
+    }
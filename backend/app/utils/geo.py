@@ -0,0 +1,17 @@
+from math import radians, cos, sin, asin, sqrt
+
+EARTH_RADIUS_METERS = 6371000.0
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two coordinates in meters."""
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    return 2 * EARTH_RADIUS_METERS * asin(sqrt(a))
+
+def fast_distance_meters(lat1, lon1, lat2, lon2):
+    """Equirectangular distance in meters, accurate at city scale."""
+    x = radians(lon2 - lon1) * cos(radians((lat1 + lat2) / 2))
+    y = radians(lat2 - lat1)
+    return EARTH_RADIUS_METERS * sqrt(x * x + y * y)
@@ -1,7 +1,8 @@
 import re
 import uuid
-from datetime import datetime, date
-from flask import jsonify
+from datetime import datetime, date, timezone
+from zoneinfo import ZoneInfo
+from flask import current_app, jsonify
 
 def validate_email(email):
     """Validate email format."""
@@ -153,6 +154,11 @@ def format_time(time_obj):
         return time_obj.strftime('%H:%M')
     return None
 
+def to_school_time(moment):
+    """Convert a naive UTC datetime to the school's local time, still naive."""
+    zone = ZoneInfo(current_app.config.get('SCHOOL_TIMEZONE', 'UTC'))
+    return moment.replace(tzinfo=timezone.utc).astimezone(zone).replace(tzinfo=None)
+
 def get_next_working_day():
     """Get next working day (Monday-Saturday)."""
     today = date.today()
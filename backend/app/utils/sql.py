@@ -0,0 +1,49 @@
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+_DIALECT_INSERTS = {
+    'mysql': mysql.insert,
+    'mariadb': mysql.insert,
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+def _dialect_insert(dialect, table):
+    """Get an INSERT for a database, with its conflict clauses."""
+    if dialect.name not in _DIALECT_INSERTS:
+        raise NotImplementedError(f'No conflict-aware INSERT for {dialect.name}')
+    return dialect.name, _DIALECT_INSERTS[dialect.name](table)
+
+def insert_ignoring_duplicates(session, table, rows):
+    """Insert rows, skipping those that collide with a unique key.
+
+    A duplicate is never raised, so the caller's transaction stays
+    usable.
+    """
+    if not rows:
+        return
+    name, stmt = _dialect_insert(session.get_bind().dialect, table)
+    if name in ('mysql', 'mariadb'):
+        key = table.primary_key.columns.values()[0]
+        stmt = stmt.on_duplicate_key_update({key.name: key})
+    else:
+        stmt = stmt.on_conflict_do_nothing()
+    session.execute(stmt, rows)
+
+def insert_adding_counts(connection, table, rows, key_columns, count_columns):
+    """Insert rows, adding their counts to any row already holding the key.
+
+    One atomic upsert per row, so concurrent writers never lose counts
+    or collide on the unique key_columns.
+    """
+    if not rows:
+        return
+    name, stmt = _dialect_insert(connection.dialect, table)
+    if name in ('mysql', 'mariadb'):
+        stmt = stmt.on_duplicate_key_update({
+            column: table.c[column] + stmt.inserted[column] for column in count_columns
+        })
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=key_columns, set_={
+            column: table.c[column] + stmt.excluded[column] for column in count_columns
+        })
+    connection.execute(stmt, rows)
@@ -0,0 +1,172 @@
+"""Compare dashboard stats queries as attendance and fee history grows.
+
+Builds an SQLite database holding the columns the dashboard reads,
+with a fixed number of attendance rows per school day and fee rows per
+month, then grows the history and times two query shapes:
+
+    rows     loads today's attendance and this month's fees and sums
+             them in Python, filtering on a computed date (the shape
+             the endpoint used before)
+    single   one round trip of indexed SQL aggregates, as
+             app.services.dashboard_stats.compute_dashboard_stats does
+
+Only today's and this month's rows are read by either shape, so the
+single-pass latency should stay flat while the history grows.
+
+    python benchmarks/dashboard_stats.py --sizes 100000 1000000 3000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import (Column, Date, DateTime, Index, Integer, MetaData, Numeric, String, Table,
+                        case, create_engine, func, select, true)
+
+metadata = MetaData()
+
+attendance = Table(
+    'attendance', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('student_id', Integer, nullable=False),
+    Column('date', Date, nullable=False),
+    Column('boarding_time', DateTime),
+    Column('status', String(20), nullable=False),
+    Index('idx_attendance_date_status', 'date', 'status')
+)
+
+fees = Table(
+    'fees', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('student_id', Integer, nullable=False),
+    Column('month', Integer, nullable=False),
+    Column('year', Integer, nullable=False),
+    Column('final_amount', Numeric(10, 2), nullable=False),
+    Column('paid_amount', Numeric(10, 2)),
+    Column('status', String(20), nullable=False),
+    Index('idx_fee_period_status', 'year', 'month', 'status')
+)
+
+ATTENDANCE_STATUSES = ('Present', 'Present', 'Present', 'Late', 'Absent', 'Left Early')
+FEE_STATUSES = ('Paid', 'Paid', 'Pending', 'Partial', 'Overdue')
+
+def populate(conn, students, attendance_rows, fee_rows, today):
+    """Insert history ending today: students rows per day and per month."""
+    rng = random.Random(7)
+    days = max(attendance_rows // students, 1)
+    months = max(fee_rows // students, 1)
+
+    batch = []
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        morning = datetime(day.year, day.month, day.day, 7, 30)
+        for student_id in range(1, students + 1):
+            batch.append({
+                'student_id': student_id,
+                'date': day,
+                'boarding_time': morning,
+                'status': rng.choice(ATTENDANCE_STATUSES)
+            })
+            if len(batch) >= 50000:
+                conn.execute(attendance.insert(), batch)
+                batch = []
+    if batch:
+        conn.execute(attendance.insert(), batch)
+
+    batch = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        for student_id in range(1, students + 1):
+            amount = rng.choice((1500, 2000, 2500))
+            status = rng.choice(FEE_STATUSES)
+            batch.append({
+                'student_id': student_id,
+                'month': month,
+                'year': year,
+                'final_amount': amount,
+                'paid_amount': amount // 2 if status == 'Partial' else (amount if status == 'Paid' else 0),
+                'status': status
+            })
+        if len(batch) >= 50000:
+            conn.execute(fees.insert(), batch)
+            batch = []
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    if batch:
+        conn.execute(fees.insert(), batch)
+
+def stats_rows(conn, today):
+    """Load the period's rows and aggregate them in Python."""
+    rows = conn.execute(
+        select(attendance.c.status).where(func.date(attendance.c.boarding_time) == today.isoformat())
+    ).all()
+    present = len([row for row in rows if row.status in ('Present', 'Late', 'Left Early')])
+    attendance_rate = round(present / len(rows) * 100, 2) if rows else 0
+
+    monthly = conn.execute(
+        select(fees.c.final_amount, fees.c.paid_amount, fees.c.status)
+        .where(fees.c.month == today.month, fees.c.year == today.year)
+    ).all()
+    total = sum(float(row.final_amount) for row in monthly)
+    collected = sum(float(row.final_amount) if row.status == 'Paid' else float(row.paid_amount or 0)
+                    for row in monthly if row.status in ('Paid', 'Partial'))
+    return attendance_rate, total, collected
+
+def stats_single(conn, today):
+    """Aggregate the period in SQL, one round trip for every figure."""
+    present = case((attendance.c.status.in_(('Present', 'Late', 'Left Early')), 1), else_=0)
+    collected = case(
+        (fees.c.status == 'Paid', fees.c.final_amount),
+        (fees.c.status == 'Partial', fees.c.paid_amount),
+        else_=0
+    )
+    daily = select(
+        func.count(attendance.c.id).label('total'),
+        func.coalesce(func.sum(present), 0).label('present')
+    ).where(attendance.c.date == today).subquery()
+    monthly = select(
+        func.coalesce(func.sum(fees.c.final_amount), 0).label('total'),
+        func.coalesce(func.sum(collected), 0).label('collected')
+    ).where(fees.c.year == today.year, fees.c.month == today.month).subquery()
+
+    row = conn.execute(
+        select(daily.c.total, daily.c.present, monthly.c.total.label('fees_total'), monthly.c.collected)
+        .select_from(daily).join(monthly, true())
+    ).one()
+    attendance_rate = round(row.present / row.total * 100, 2) if row.total else 0
+    return attendance_rate, float(row.fees_total), float(row.collected)
+
+def time_query(fn, conn, today, repeat):
+    """Get the median latency of fn in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(conn, today)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000],
+                        help='rows of attendance and of fees in each run')
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    today = date.today()
+    print(f'{"rows":>10} {"rows ms":>10} {"single ms":>10}')
+    for size in args.sizes:
+        engine = create_engine('sqlite://')
+        metadata.create_all(engine)
+        with engine.begin() as conn:
+            populate(conn, args.students, size, size, today)
+        with engine.connect() as conn:
+            assert stats_rows(conn, today) == stats_single(conn, today)
+            rows_ms = time_query(stats_rows, conn, today, args.repeat)
+            single_ms = time_query(stats_single, conn, today, args.repeat)
+        print(f'{size:>10} {rows_ms:>10.2f} {single_ms:>10.2f}')
+        engine.dispose()
+
+if __name__ == '__main__':
+    main()
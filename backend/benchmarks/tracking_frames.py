@@ -0,0 +1,109 @@
+"""Compare live tracking payloads: per-fix JSON, batched JSON and binary frames.
+
+Simulates BUSES buses reporting once a second, flushed every TICK ms to
+SUBSCRIBERS clients in one room, and prints bytes per second on the wire
+and server CPU spent encoding. Socket.IO encodes a room emit once and
+writes the same bytes to every client, so wire bytes scale with the
+subscriber count while encoding CPU does not.
+
+    python benchmarks/tracking_frames.py --buses 1000 --subscribers 1000
+"""
+import argparse
+import calendar
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.frame_codec import FrameEncoder, decode_frame
+
+Fix = namedtuple('Fix', 'bus_id latitude longitude speed heading timestamp')
+
+def location_payload(fix):
+    """Same shape as app.services.broadcaster.location_payload."""
+    return {
+        'bus_id': fix.bus_id,
+        'latitude': fix.latitude,
+        'longitude': fix.longitude,
+        'speed': fix.speed,
+        'heading': fix.heading,
+        'timestamp': fix.timestamp.isoformat()
+    }
+
+def simulate(buses, seconds, tick_ms):
+    """Yield one list of fixes per tick for buses driving at city speeds."""
+    rng = random.Random(42)
+    positions = [[12.9 + rng.random() * 0.2, 77.5 + rng.random() * 0.2, rng.random() * 360] for _ in range(buses)]
+    start = datetime(2026, 1, 5, 7, 0)
+    ticks_per_second = 1000 // tick_ms
+    for tick in range(seconds * ticks_per_second):
+        now = start + timedelta(milliseconds=tick * tick_ms)
+        batch = []
+        # Each bus reports once a second, spread evenly over the ticks
+        for bus_id in range(tick % ticks_per_second, buses, ticks_per_second):
+            position = positions[bus_id]
+            speed = max(0.0, rng.gauss(25, 10))
+            position[2] = (position[2] + rng.gauss(0, 10)) % 360
+            step = speed / 3.6 / 111195
+            position[0] += step * math.cos(math.radians(position[2]))
+            position[1] += step * math.sin(math.radians(position[2]))
+            batch.append(Fix(bus_id + 1, position[0], position[1], round(speed, 1), round(position[2]), now))
+        yield batch
+
+def measure(name, batches, encode, subscribers, seconds):
+    """Encode every batch and report client sends, wire bytes and CPU per second."""
+    payload_bytes = 0
+    messages = 0
+    started = time.process_time()
+    for batch in batches:
+        for payload in encode(batch):
+            payload_bytes += len(payload)
+            messages += 1
+    cpu = time.process_time() - started
+    print(f'{name:<16} {messages * subscribers / seconds:>12.0f} {payload_bytes / seconds / 1024:>12.1f} '
+          f'{payload_bytes * subscribers / seconds / 1024 / 1024:>14.1f} {cpu / seconds * 1000:>10.2f}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buses', type=int, default=1000)
+    parser.add_argument('--subscribers', type=int, default=1000)
+    parser.add_argument('--seconds', type=int, default=30)
+    parser.add_argument('--tick-ms', type=int, default=500)
+    args = parser.parse_args()
+
+    batches = list(simulate(args.buses, args.seconds, args.tick_ms))
+
+    def per_fix_json(batch):
+        return [json.dumps(location_payload(fix)).encode() for fix in batch]
+
+    def batched_json(batch):
+        return [json.dumps({'updates': [location_payload(fix) for fix in batch],
+                            'sent_at': batch[0].timestamp.isoformat()}).encode()]
+
+    encoder = FrameEncoder()
+
+    def binary_delta(batch):
+        return [encoder.encode(batch, calendar.timegm(batch[0].timestamp.utctimetuple()))]
+
+    print(f'{args.buses} buses at 1 Hz, {args.subscribers} subscribers, {args.tick_ms} ms tick, {args.seconds} s')
+    print(f'{"format":<16} {"sends/s":>12} {"KiB/s/client":>12} {"MiB/s total":>14} {"cpu ms/s":>10}')
+    measure('per-fix json', batches, per_fix_json, args.subscribers, args.seconds)
+    measure('batched json', batches, batched_json, args.subscribers, args.seconds)
+    measure('binary delta', batches, binary_delta, args.subscribers, args.seconds)
+
+    # Round-trip check: a client following every frame ends at the true positions
+    check, state = FrameEncoder(), {}
+    for batch in batches:
+        frame = check.encode(batch, calendar.timegm(batch[0].timestamp.utctimetuple()))
+        decoded = decode_frame(frame, state)[2]
+    error = max(abs(update['latitude'] - fix.latitude) for update, fix in zip(decoded, batches[-1]))
+    print(f'max decoded latitude error: {error:.6f} degrees')
+
+if __name__ == '__main__':
+    main()
@@ -18,12 +18,81 @@ class Config:
     # Redis configuration
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Socket.IO fan-out across worker processes: empty for a single
+    # process, 'redis' to use REDIS_URL, or 'memory' in tests. Location
+    # ingest keeps per-bus state, so each bus's fixes must reach one worker
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = 'fleetflow'
+    
+    # Local time zone of the school. Timestamps are stored in UTC;
+    # schedules such as route start times are local
+    SCHOOL_TIMEZONE = os.environ.get('SCHOOL_TIMEZONE') or 'UTC'
+    
+    # Live tracking pipeline
+    TRACKING_CONTEXT_TTL_SECONDS = int(os.environ.get('TRACKING_CONTEXT_TTL_SECONDS') or 60)
+    ROUTE_GEOMETRY_TTL_SECONDS = int(os.environ.get('ROUTE_GEOMETRY_TTL_SECONDS') or 600)
+    STOP_GEOFENCE_RADIUS_METERS = float(os.environ.get('STOP_GEOFENCE_RADIUS_METERS') or 60)
+    STOP_LOOKAHEAD = 3  # upcoming stops checked per fix
+    ROUTE_INDEX_CELL_METERS = 250.0
+    ROUTE_DEVIATION_THRESHOLD_METERS = float(os.environ.get('ROUTE_DEVIATION_THRESHOLD_METERS') or 150)
+    ROUTE_DEVIATION_MIN_DISTANCE_METERS = float(os.environ.get('ROUTE_DEVIATION_MIN_DISTANCE_METERS') or 300)
+    ROUTE_DEVIATION_MIN_SECONDS = int(os.environ.get('ROUTE_DEVIATION_MIN_SECONDS') or 60)
+    IDLE_SPEED_KMPH = 3.0
+    IDLE_MIN_SECONDS = int(os.environ.get('IDLE_MIN_SECONDS') or 180)
+    OVERSPEED_LIMIT_KMPH = float(os.environ.get('OVERSPEED_LIMIT_KMPH') or 60)
+    OVERSPEED_MIN_SECONDS = 10
+    HARSH_SPEED_CHANGE_KMPH_PER_SECOND = 10.0  # roughly 0.28 g
+    HARSH_MAX_INTERVAL_SECONDS = 10  # wider gaps say nothing about harshness
+    ODOMETRY_MIN_STEP_METERS = 15.0  # smaller moves are treated as GPS jitter
+    ODOMETRY_MAX_ACCURACY_METERS = 50.0
+    ODOMETRY_MAX_SPEED_KMPH = 120.0  # faster implied moves are GPS jumps
+    ETA_MATCH_RADIUS_METERS = 300
+    ETA_DEFAULT_SPEED_KMPH = 20.0  # used when neither history nor live speed is known
+    ETA_LIVE_SPEED_WEIGHT = 0.5
+    ETA_SPEED_SMOOTHING = 0.3
+    ETA_MAX_AGE_SECONDS = 300
+    ETA_PROFILE_TTL_SECONDS = 3600
+    PROXIMITY_LEAD_MINUTES = (10, 5)  # "bus is N minutes away" thresholds
+    PROXIMITY_INDEX_TTL_SECONDS = 300
+    LOCATION_BROADCAST_INTERVAL_MS = int(os.environ.get('LOCATION_BROADCAST_INTERVAL_MS') or 500)
+    TRACKING_REPLAY_FRAMES = 120  # frames kept per room for resuming clients
+    SOCKET_MAX_QUEUE_DEPTH = 200  # outbound packets a client may fall behind by
+    SOCKET_SLOW_CONSUMER_POLICY = 'disconnect'  # or 'drop' to skip its frames until it catches up
+    SOCKET_MONITOR_INTERVAL_SECONDS = 5
+    BUS_SNAPSHOT_TTL_SECONDS = 600
+    BUS_SNAPSHOT_MAX_AGE_SECONDS = 2  # Cache-Control max-age of public snapshots
+    SHARE_TOKEN_MAX_AGE_SECONDS = int(os.environ.get('SHARE_TOKEN_MAX_AGE_SECONDS') or 86400)
+    HEATMAP_ZOOM_LEVELS = (12, 15, 18)
+    HEATMAP_FLUSH_SECONDS = 30
+    HEATMAP_FLUSH_SIZE = 5000  # buffered tiles before an early flush
+    
+    # Dashboard
+    DASHBOARD_STREAM_INTERVAL_SECONDS = 5
+    DASHBOARD_STREAM_KEEPALIVE_SECONDS = 15
+    TRENDS_MAX_RANGE_DAYS = 1096  # three years per trends request
+    
+    # Response cache
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_TTL_SECONDS = 60
+    RESPONSE_CACHE_RETRY_SECONDS = 30  # wait before retrying Redis after a failure
+    RESPONSE_CACHE_LOCAL_MAX_ENTRIES = 1000
+    
+    # Alerts
+    ALERTS_EVALUATE_INTERVAL_SECONDS = 60
+    ALERTS_DEBOUNCE_SECONDS = 2  # batch writes before re-evaluating their sources
+    ALERT_MAINTENANCE_LOOKAHEAD_DAYS = 7
+    ALERT_LOW_ATTENDANCE_PERCENT = 80
+    
+    # Reports
+    REPORTS_ON_TIME_MINUTES = 5  # delay a completed trip may have and still count as on time
+    
     # Celery configuration
     CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL') or 'redis://localhost:6379/0'
     CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND') or 'redis://localhost:6379/0'
     
     # File upload settings
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
+    EXPORT_FOLDER = os.environ.get('EXPORT_FOLDER') or 'exports'  # Parquet exports for analytics
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
     # External API keys
@@ -57,6 +126,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=1)
+    SOCKETIO_MESSAGE_QUEUE = 'memory'
+    RESPONSE_CACHE_ENABLED = False
 
 config = {
     'development': DevelopmentConfig,
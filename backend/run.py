@@ -155,6 +155,77 @@ def create_sample_data():
     db.session.commit()
     print('Sample data created successfully')
 
+@app.cli.command()
+@click.option('--date', 'day', default=None, help='Day to rebuild (YYYY-MM-DD), defaults to yesterday.')
+@with_appcontext
+def build_heatmap(day):
+    """Rebuild heatmap tiles for a day from bus locations."""
+    from datetime import datetime, timedelta
+    from app.services.heatmap import rebuild_heatmap_day
+    
+    day = datetime.strptime(day, '%Y-%m-%d').date() if day else datetime.utcnow().date() - timedelta(days=1)
+    try:
+        tiles = rebuild_heatmap_day(day)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f'Heatmap rebuilt for {day}: {tiles} tiles')
+
+@app.cli.command()
+@click.option('--through', default=None, help='Last day to include (YYYY-MM-DD), defaults to yesterday.')
+@with_appcontext
+def refresh_segment_profiles(through):
+    """Fold new stop visits into each route's segment travel-time profile."""
+    from datetime import datetime
+    from app.services.segment_profiles import refresh_all_profiles
+    
+    through_date = datetime.strptime(through, '%Y-%m-%d').date() if through else None
+    samples = refresh_all_profiles(through_date)
+    print(f'Segment profiles refreshed: {samples} new samples')
+
+@app.cli.command()
+@click.option('--start', default=None, help='First day to rebuild (YYYY-MM-DD), defaults to yesterday.')
+@click.option('--end', default=None, help='Last day to rebuild (YYYY-MM-DD), defaults to today.')
+@with_appcontext
+def rollup_attendance(start, end):
+    """Recompute the daily attendance rollup from attendance records."""
+    from datetime import datetime, date, timedelta
+    from app.services.attendance_rollup import rebuild_attendance_days
+    
+    end_date = datetime.strptime(end, '%Y-%m-%d').date() if end else date.today()
+    start_date = datetime.strptime(start, '%Y-%m-%d').date() if start else end_date - timedelta(days=1)
+    groups = rebuild_attendance_days(start_date, end_date)
+    print(f'Attendance rollup rebuilt for {start_date} to {end_date}: {groups} groups')
+
+@app.cli.command()
+@click.option('--academic-year', default=None, help='Academic year to rebuild (e.g. 2024-2025), defaults to all.')
+@with_appcontext
+def rollup_fees(academic_year):
+    """Recompute the monthly fee ledger from fee records."""
+    from app.services.fee_ledger import rebuild_fee_ledger
+    
+    groups = rebuild_fee_ledger(academic_year)
+    print(f'Fee ledger rebuilt for {academic_year or "all academic years"}: {groups} groups')
+
+@app.cli.command()
+@click.option('--since', required=True, help='First day to copy into the feed (YYYY-MM-DD).')
+@with_appcontext
+def backfill_activity(since):
+    """Seed the activity feed from existing trips, attendance and payments."""
+    from datetime import datetime
+    from app.services.activity_log import backfill_activity_events
+    
+    count = backfill_activity_events(datetime.strptime(since, '%Y-%m-%d').date())
+    print(f'Activity feed backfilled since {since}: {count} events')
+
+@app.cli.command()
+@with_appcontext
+def evaluate_alerts():
+    """Run every alert source and update the alerts table."""
+    from app.services.alerts import evaluate_alerts as evaluate
+    
+    raised, resolved = evaluate()
+    print(f'Alerts evaluated: {raised} active, {resolved} resolved')
+
 @app.cli.command()
 @with_appcontext
 def init_db():
@@ -162,5 +233,29 @@ def init_db():
     db.create_all()
     print('Database initialized')
 
+@app.cli.command()
+@click.option('--start', default=None, help='First month to export (YYYY-MM), defaults to the current month.')
+@click.option('--end', default=None, help='Last month to export (YYYY-MM), defaults to the current month.')
+@click.option('--tables', default='trips,attendance,fees,locations', help='Comma-separated tables to export.')
+@click.option('--out', default=None, help='Output directory, defaults to EXPORT_FOLDER.')
+@with_appcontext
+def export_parquet(start, end, tables, out):
+    """Export operational tables to Parquet, partitioned by table and month."""
+    from datetime import datetime, date
+    from app.services.parquet_export import EXPORT_TABLES, export_tables
+    
+    names = [name for name in tables.split(',') if name]
+    unknown = [name for name in names if name not in EXPORT_TABLES]
+    if unknown:
+        raise click.BadParameter(f"Unknown tables {', '.join(unknown)}. Choose from: {', '.join(EXPORT_TABLES)}")
+    
+    end_month = datetime.strptime(end, '%Y-%m').date() if end else date.today().replace(day=1)
+    start_month = datetime.strptime(start, '%Y-%m').date() if start else end_month
+    out_dir = out or app.config['EXPORT_FOLDER']
+    
+    for name, months in export_tables(names, start_month, end_month, out_dir).items():
+        print(f'{name}: {sum(months.values())} rows in {len(months)} monthly files')
+    print(f'Parquet export written to {out_dir}')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
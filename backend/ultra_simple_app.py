@@ -1168,7 +1168,7 @@ def get_attendance_report():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-# Reports endpoints
+# Reports endpoints (fixed demo data; the full app computes them in app/services/reports.py)
 @app.route('/api/reports/attendance', methods=['GET'])
 def get_attendance_reports():
     """Get attendance reports."""
@@ -4,6 +4,7 @@ import {
   Users, DollarSign, Clock, AlertTriangle, Award, Target,
   Calendar, FileText, PieChart, Activity
 } from 'lucide-react';
+import { reportsAPI } from '../services/api';
 
 const Reports = () => {
   const [activeTab, setActiveTab] = useState('overview');
@@ -23,21 +24,20 @@ const Reports = () => {
   const fetchReportData = async () => {
     try {
       setLoading(true);
-      // Simulate API calls
       const [attendanceRes, financialRes, performanceRes, analyticsRes, safetyRes] = await Promise.all([
-        fetch('/api/reports/attendance'),
-        fetch('/api/reports/financial'),
-        fetch('/api/reports/performance'),
-        fetch('/api/reports/analytics'),
-        fetch('/api/reports/safety')
+        reportsAPI.getAttendance(),
+        reportsAPI.getFinancial(),
+        reportsAPI.getPerformance(),
+        reportsAPI.getAnalytics(),
+        reportsAPI.getSafety()
       ]);
 
       setReportData({
-        attendance: await attendanceRes.json(),
-        financial: await financialRes.json(),
-        performance: await performanceRes.json(),
-        analytics: await analyticsRes.json(),
-        safety: await safetyRes.json()
+        attendance: attendanceRes.data,
+        financial: financialRes.data,
+        performance: performanceRes.data,
+        analytics: analyticsRes.data,
+        safety: safetyRes.data
       });
     } catch (error) {
       console.error('Error fetching report data:', error);
@@ -191,6 +191,16 @@ export const dashboardAPI = {
   getPerformanceMetrics: () => api.get('/dashboard/performance'),
 };
 
+// Reports API
+export const reportsAPI = {
+  getAttendance: (params = {}) => api.get('/reports/attendance', { params }),
+  getBuses: (params = {}) => api.get('/reports/buses', { params }),
+  getFinancial: (params = {}) => api.get('/reports/financial', { params }),
+  getPerformance: (params = {}) => api.get('/reports/performance', { params }),
+  getAnalytics: (params = {}) => api.get('/reports/analytics', { params }),
+  getSafety: (params = {}) => api.get('/reports/safety', { params }),
+};
+
 // Tracking API
 export const trackingAPI = {
   getLiveLocation: (busId) => api.get(`/tracking/live/${busId}`),